@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Benchmark /sweeping-times/batch against N individual /sweeping-times calls
+
+Runs fully offline: loads a synthetic, SF-shaped citation set into the API's
+cache and drives both endpoints through Flask's test client.
+
+Usage:
+python3 benchmark_batch_lookup.py --citations 200000 --queries 100 500
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import argparse
+import json
+import time
+import numpy as np
+import pandas as pd
+
+import street_sweeping_api as api
+
+def generate_synthetic_citations(count, seed=42):
+    """Generate citations on a grid of named streets with SF-like coordinates"""
+    rng = np.random.default_rng(seed)
+
+    # East-west numbered avenues and north-south named streets, ~100m per 100-block
+    streets = [(f"{n:02d}TH AVE", 'ew', 37.74 + n * 0.0022) for n in range(1, 41)]
+    streets += [(f"STREET{n} ST", 'ns', -122.50 + n * 0.0025) for n in range(1, 41)]
+
+    street_ids = rng.integers(0, len(streets), count)
+    numbers = rng.integers(1, 4000, count)
+    minutes = rng.integers(0, 365 * 24 * 60, count)
+
+    names, lats, lons = [], [], []
+    for street_id, number in zip(street_ids, numbers):
+        name, direction, position = streets[street_id]
+        offset = number / 100 * 0.0011
+        if direction == 'ew':
+            lat, lon = position, -122.51 + offset
+        else:
+            lat, lon = 37.70 + offset, position
+        names.append(name)
+        lats.append(lat + rng.normal(0, 0.00005))
+        lons.append(lon + rng.normal(0, 0.00005))
+
+    df = pd.DataFrame({
+        'citation_location': [f"{number} {name}" for number, name in zip(numbers, names)],
+        'citation_issued_datetime': pd.Timestamp('2025-07-01') - pd.to_timedelta(minutes, unit='m'),
+        'latitude': lats,
+        'longitude': lons
+    })
+    return api.prepare_citations(df.sort_values('citation_issued_datetime', ascending=False).reset_index(drop=True))
+
+def load_api_cache(citations_df):
+    """Install a citation set into the API's module-level cache"""
+    api.citations_cache = citations_df
+    api.build_cached_block_index()
+    api.update_dataset_version()
+    api.cache_timestamp = time.time()
+
+def benchmark(client, citations_df, query_count, seed=7):
+    """Time N single GET calls vs one batch POST for the same mix of addresses and coordinates"""
+    sample = citations_df.sample(query_count, random_state=seed)
+    addresses = list(sample['citation_location'][: query_count // 2])
+    coordinates = [
+        {"latitude": lat, "longitude": lon}
+        for lat, lon in zip(sample['latitude'][query_count // 2:], sample['longitude'][query_count // 2:])
+    ]
+
+    # The single endpoint only takes addresses, so resolve coordinates to their block first
+    nearest = api.block_spatial_index.nearest_blocks(
+        [c['latitude'] for c in coordinates], [c['longitude'] for c in coordinates]
+    )
+    single_addresses = addresses + [f"{key[1]} {key[0]}" for key, _ in nearest if key]
+
+    # Individual calls; clear the response cache so every call does the work
+    api.response_cache.clear()
+    start = time.perf_counter()
+    for address in single_addresses:
+        client.get('/sweeping-times', query_string={'address': address})
+    single_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    response = client.post('/sweeping-times/batch', json={'queries': addresses + coordinates})
+    lines = response.get_data(as_text=True).splitlines()
+    batch_seconds = time.perf_counter() - start
+
+    return {
+        'queries': query_count,
+        'single_calls_seconds': round(single_seconds, 4),
+        'batch_seconds': round(batch_seconds, 4),
+        'speedup': round(single_seconds / batch_seconds, 1) if batch_seconds > 0 else None,
+        'batch_results': len(lines),
+        'batch_resolved': sum(1 for line in lines if 'error' not in json.loads(line))
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark batch vs single sweeping-time lookups')
+    parser.add_argument('--citations', type=int, default=200000, help='Number of synthetic citations')
+    parser.add_argument('--queries', type=int, nargs='+', default=[100, 500, 1000], help='Batch sizes to test')
+    parser.add_argument('--output', help='Optional JSON file for results')
+    args = parser.parse_args()
+
+    print(f"Generating {args.citations:,} synthetic citations...")
+    citations_df = generate_synthetic_citations(args.citations)
+    load_api_cache(citations_df)
+    client = api.app.test_client()
+
+    results = []
+    for query_count in args.queries:
+        result = benchmark(client, citations_df, min(query_count, api.MAX_BATCH_SIZE))
+        results.append(result)
+        print(f"{result['queries']:>5} queries: single {result['single_calls_seconds']:.3f}s, "
+              f"batch {result['batch_seconds']:.3f}s ({result['speedup']}x), "
+              f"{result['batch_resolved']}/{result['batch_results']} resolved")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'citations': args.citations, 'results': results}, f, indent=2)
+        print(f"Results saved to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,14 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response
 import pandas as pd
 import requests
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 import numpy as np
 import re
 from functools import lru_cache
+from collections import OrderedDict
+import hashlib
+import json
+import math
 import threading
 import time
 
@@ -12,8 +16,83 @@ app = Flask(__name__)
 
 # Global variables for cached data
 citations_cache = None
+block_index = None
+block_spatial_index = None
 cache_timestamp = None
 CACHE_DURATION = 3600  # 1 hour in seconds
+BLOCK_INDEX_SIZE = 100  # Granularity of the precomputed block index
+RESPONSE_CACHE_SIZE = 2048  # Max rendered responses kept in memory
+RESPONSE_CACHE_TTL = 900  # 15 minutes in seconds
+MAX_BATCH_SIZE = 1000  # Max queries per /sweeping-times/batch request
+BLOCK_MATCH_DISTANCE = 200  # Max meters from a coordinate to a block centroid
+MAX_BATCH_DISTANCE = 1000  # Upper bound on a batch request's max_distance (search cost grows with its square)
+
+# Citation columns the responses are built from (street name/number and weekday derive from these)
+VERSIONED_COLUMNS = ['citation_location', 'citation_issued_datetime', 'weight', 'latitude', 'longitude']
+
+# Version of the loaded citation data; cached responses from other versions are discarded
+dataset_version = None
+dataset_modified = None
+
+class ResponseCache:
+    """Thread-safe LRU cache with a per-entry TTL for rendered API responses"""
+    
+    def __init__(self, max_entries=RESPONSE_CACHE_SIZE, ttl_seconds=RESPONSE_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+    
+    def get(self, key, version):
+        """Return the cached entry for key, or None if missing, expired or from another dataset version"""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                if entry['version'] == version and time.time() - entry['stored_at'] <= self.ttl_seconds:
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+                    return entry
+                del self.entries[key]
+                self.expirations += 1
+            self.misses += 1
+            return None
+    
+    def put(self, key, version, body, etag):
+        """Store a rendered response, evicting the least recently used entries when full"""
+        entry = {'version': version, 'body': body, 'etag': etag, 'stored_at': time.time()}
+        with self.lock:
+            self.entries[key] = entry
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+        return entry
+    
+    def clear(self):
+        """Drop all cached responses (e.g. after the dataset changes)"""
+        with self.lock:
+            self.entries.clear()
+    
+    def stats(self):
+        """Summarize cache usage for /cache/status"""
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self.entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 3) if lookups else None,
+                "evictions": self.evictions,
+                "expirations": self.expirations
+            }
+
+response_cache = ResponseCache()
 
 def get_all_citations(limit=1000000):
     """Get all street cleaning citations and store as temp table"""
@@ -25,8 +104,13 @@ def get_all_citations(limit=1000000):
         '$order': 'citation_issued_datetime DESC'
     }
     response = requests.get(url, params=params)
-    df = pd.DataFrame(response.json())
+    df = prepare_citations(pd.DataFrame(response.json()))
     
+    print(f"Loaded {len(df)} citations")
+    return df
+
+def prepare_citations(df):
+    """Add parsed time, address, location and age-weight columns to raw citation records"""
     if not df.empty:
         # Convert datetime and add day of week
         df['citation_issued_datetime'] = pd.to_datetime(df['citation_issued_datetime'])
@@ -37,13 +121,18 @@ def get_all_citations(limit=1000000):
         df['street_number'] = pd.to_numeric(df['citation_location'].str.extract(r'^(\d+)', expand=False), errors='coerce')
         df['street_name'] = df['citation_location'].str.replace(r'^\d+\s*', '', regex=True).str.upper()
         
+        # Pull coordinates out of the GeoJSON point when the feed includes one
+        if 'the_geom' in df.columns and 'latitude' not in df.columns:
+            points = [geom.get('coordinates') if isinstance(geom, dict) else None for geom in df['the_geom']]
+            df['longitude'] = [point[0] if point else np.nan for point in points]
+            df['latitude'] = [point[1] if point else np.nan for point in points]
+        
         # Add age weighting (more recent = higher weight)
         max_date = df['citation_issued_datetime'].max()
         df['days_ago'] = (max_date - df['citation_issued_datetime']).dt.days
         # Exponential decay: weight = e^(-days_ago/365) so 1 year ago = ~0.37 weight
         df['weight'] = np.exp(-df['days_ago'] / 365)
     
-    print(f"Loaded {len(df)} citations")
     return df
 
 def load_citations_cache():
@@ -59,11 +148,203 @@ def load_citations_cache():
         
         print("Loading/refreshing citations cache...")
         citations_cache = get_all_citations()
+        build_cached_block_index()
+        update_dataset_version()
         cache_timestamp = current_time
         print("Cache loaded successfully")
     
     return citations_cache
 
+def build_cached_block_index():
+    """Rebuild the global block index and block spatial index from the current citations cache"""
+    global block_index, block_spatial_index
+    
+    start = time.time()
+    block_index = build_block_index(citations_cache)
+    block_spatial_index = BlockSpatialIndex.from_citations(citations_cache)
+    print(f"Built block index with {len(block_index)} blocks "
+          f"({len(block_spatial_index)} located) in {time.time() - start:.1f}s")
+    return block_index
+
+def update_dataset_version():
+    """Fingerprint the citations cache and drop cached responses if the data changed"""
+    global dataset_version, dataset_modified
+    
+    if citations_cache is None or citations_cache.empty:
+        fingerprint = b"empty"
+    else:
+        # Hash the content responses are built from, so corrected records change the version too
+        columns = [column for column in VERSIONED_COLUMNS if column in citations_cache.columns]
+        fingerprint = pd.util.hash_pandas_object(citations_cache[columns], index=False).values.tobytes()
+    version = hashlib.sha1(fingerprint).hexdigest()[:16]
+    
+    if version != dataset_version:
+        dataset_version = version
+        # Aware UTC: werkzeug formats a naive Last-Modified as if it were UTC
+        dataset_modified = datetime.now(timezone.utc).replace(microsecond=0)
+        response_cache.clear()
+        print(f"Dataset version is now {dataset_version}")
+    return dataset_version
+
+def normalize_cache_key(address, days_filter, block_size):
+    """Build the response cache key so equivalent queries share an entry"""
+    address_key = ' '.join(address.upper().split())
+    days_key = tuple(sorted(set(days_filter))) if days_filter else ()
+    return address_key, days_key, block_size
+
+def build_block_index(citations_df, block_size=BLOCK_INDEX_SIZE):
+    """
+    Pre-aggregate citations by (street name, block start) so a lookup becomes a dict access.
+    
+    Each entry maps weekday -> weighted statistics, an hourly histogram and the
+    five most recent citations, which is everything find_street_sweeping_times needs.
+    """
+    index = {}
+    if citations_df is None or citations_df.empty:
+        return index
+    
+    df = citations_df[citations_df['street_number'].notna() & citations_df['street_name'].notna()]
+    issued = df['citation_issued_datetime'].dt
+    minutes = issued.hour * 60 + issued.minute
+    df = df.assign(
+        block_start=(df['street_number'] // block_size * block_size).astype(int),
+        hour=issued.hour,
+        seconds=minutes * 60 + issued.second,
+        weighted_minutes=minutes * df['weight']
+    )
+    keys = ['street_name', 'block_start', 'day_of_week']
+    
+    stats = df.groupby(keys, sort=False).agg(
+        citation_count=('weight', 'size'),
+        total_weight=('weight', 'sum'),
+        weighted_minutes=('weighted_minutes', 'sum'),
+        earliest_seconds=('seconds', 'min'),
+        latest_seconds=('seconds', 'max'),
+        first_date=('citation_issued_datetime', 'min'),
+        last_date=('citation_issued_datetime', 'max')
+    )
+    
+    for (street, block, day), row in zip(stats.index, stats.itertuples(index=False)):
+        index.setdefault((street, block), {})[day] = {
+            'citation_count': int(row.citation_count),
+            'total_weight': float(row.total_weight),
+            'weighted_minutes': float(row.weighted_minutes),
+            'earliest_seconds': int(row.earliest_seconds),
+            'latest_seconds': int(row.latest_seconds),
+            'first_date': row.first_date,
+            'last_date': row.last_date,
+            'hourly_histogram': [0] * 24,
+            'recent': []
+        }
+    
+    # Hour-of-day histogram per block and weekday
+    for (street, block, day, hour), count in df.groupby(keys + ['hour'], sort=False).size().items():
+        index[(street, block)][day]['hourly_histogram'][hour] = int(count)
+    
+    # Five most recent citations per block and weekday (newest first)
+    recent = df.sort_values('citation_issued_datetime', ascending=False).groupby(keys, sort=False).head(5)
+    for street, block, day, issued_at, location in zip(
+            recent['street_name'], recent['block_start'], recent['day_of_week'],
+            recent['citation_issued_datetime'], recent['citation_location']):
+        index[(street, block)][day]['recent'].append((issued_at, location))
+    
+    return index
+
+class BlockSpatialIndex:
+    """
+    Grid index over block centroids for resolving many coordinates at once.
+    
+    Centroids are sorted by grid cell code so the cell neighbourhood within
+    max_distance of every query point can be gathered with searchsorted, and the nearest block for a
+    whole batch is found in a single set of array operations.
+    """
+    
+    def __init__(self, keys, lats, lons, cell_size_meters=BLOCK_MATCH_DISTANCE):
+        self.cell_size_meters = cell_size_meters
+        self.origin_lat = float(np.mean(lats)) if len(lats) else 37.76
+        self.lon_scale = 111000 * np.cos(np.radians(self.origin_lat))
+        
+        x, y = self._project(np.asarray(lats, dtype=float), np.asarray(lons, dtype=float))
+        codes = self._cell_codes(np.floor(x / cell_size_meters), np.floor(y / cell_size_meters))
+        order = np.argsort(codes, kind='stable')
+        self.keys = [keys[i] for i in order]
+        self.x = x[order]
+        self.y = y[order]
+        self.codes = codes[order]
+    
+    @classmethod
+    def from_citations(cls, citations_df, block_size=BLOCK_INDEX_SIZE):
+        """Locate each (street name, block start) at the mean position of its citations"""
+        if citations_df is None or citations_df.empty or 'latitude' not in citations_df.columns:
+            return cls([], np.array([]), np.array([]))
+        
+        located = citations_df[
+            citations_df['street_number'].notna() & citations_df['street_name'].notna() &
+            citations_df['latitude'].notna() & citations_df['longitude'].notna()
+        ]
+        located = located.assign(
+            block_start=(located['street_number'] // block_size * block_size).astype(int),
+            latitude=pd.to_numeric(located['latitude'], errors='coerce'),
+            longitude=pd.to_numeric(located['longitude'], errors='coerce')
+        )
+        centroids = located.groupby(['street_name', 'block_start'], sort=False)[['latitude', 'longitude']].mean().dropna()
+        return cls(list(centroids.index), centroids['latitude'].values, centroids['longitude'].values)
+    
+    def __len__(self):
+        return len(self.keys)
+    
+    def _project(self, lats, lons):
+        """Project lat/lon to local meters (equirectangular, accurate at city scale)"""
+        return (lons + 122.4) * self.lon_scale, (lats - self.origin_lat) * 111000
+    
+    def _cell_codes(self, cell_x, cell_y):
+        return (cell_x.astype(np.int64) << 32) + (cell_y.astype(np.int64) & 0xFFFFFFFF)
+    
+    def nearest_blocks(self, lats, lons, max_distance=BLOCK_MATCH_DISTANCE):
+        """Return (block key or None, distance in meters) for every query point"""
+        lats = np.asarray(lats, dtype=float)
+        lons = np.asarray(lons, dtype=float)
+        results = [(None, None)] * len(lats)
+        if not len(self.keys) or not len(lats):
+            return results
+        
+        qx, qy = self._project(lats, lons)
+        cell_x = np.floor(qx / self.cell_size_meters)
+        cell_y = np.floor(qy / self.cell_size_meters)
+        
+        # Gather (query, centroid) candidate pairs from every cell that can hold a block within max_distance
+        ring = max(1, int(np.ceil(max_distance / self.cell_size_meters)))
+        query_parts, position_parts = [], []
+        for dx in range(-ring, ring + 1):
+            for dy in range(-ring, ring + 1):
+                codes = self._cell_codes(cell_x + dx, cell_y + dy)
+                lo = np.searchsorted(self.codes, codes, side='left')
+                counts = np.searchsorted(self.codes, codes, side='right') - lo
+                total = counts.sum()
+                if not total:
+                    continue
+                query_parts.append(np.repeat(np.arange(len(lats)), counts))
+                starts = np.repeat(lo - (np.cumsum(counts) - counts), counts)
+                position_parts.append(starts + np.arange(total))
+        
+        if not query_parts:
+            return results
+        
+        queries = np.concatenate(query_parts)
+        positions = np.concatenate(position_parts)
+        distances = np.hypot(qx[queries] - self.x[positions], qy[queries] - self.y[positions])
+        
+        # Closest candidate per query: sort by (query, distance) and take the first of each run
+        order = np.lexsort((distances, queries))
+        queries, positions, distances = queries[order], positions[order], distances[order]
+        first = np.ones(len(queries), dtype=bool)
+        first[1:] = queries[1:] != queries[:-1]
+        
+        for query, position, distance in zip(queries[first], positions[first], distances[first]):
+            if distance <= max_distance:
+                results[query] = (self.keys[position], float(distance))
+        return results
+
 def parse_address(address_input):
     """Parse an address like '1530 Broderick St' into number and street name"""
     try:
@@ -90,18 +371,8 @@ def get_block_range(street_number, block_size=100):
     block_end = block_start + block_size - 1
     return block_start, block_end
 
-def find_street_sweeping_times(address, citations_df, days_filter=None, block_size=100):
-    """Find estimated street sweeping times for a given address"""
-    
-    # Parse the address
-    street_number, street_name = parse_address(address)
-    if not street_number or not street_name:
-        return {"error": "Could not parse address. Please use format like '1530 Broderick St'"}
-    
-    # Get block range
-    block_start, block_end = get_block_range(street_number, block_size)
-    
-    # Create variations of street name for fuzzy matching
+def get_street_name_variants(street_name):
+    """Create variations of a street name for fuzzy matching (e.g., 'BRODERICK ST' -> 'BRODERICK')"""
     possible_street_matches = [
         street_name,
         street_name.replace(' ST', ''),
@@ -115,7 +386,28 @@ def find_street_sweeping_times(address, citations_df, days_filter=None, block_si
     
     # Remove duplicates while preserving order
     seen = set()
-    possible_street_matches = [x for x in possible_street_matches if not (x in seen or seen.add(x))]
+    return [x for x in possible_street_matches if not (x in seen or seen.add(x))]
+
+def find_street_sweeping_times(address, citations_df, days_filter=None, block_size=100, block_index=None):
+    """Find estimated street sweeping times for a given address"""
+    
+    # Parse the address
+    street_number, street_name = parse_address(address)
+    if not street_number or not street_name:
+        return {"error": "Could not parse address. Please use format like '1530 Broderick St'"}
+    
+    # Get block range
+    block_start, block_end = get_block_range(street_number, block_size)
+    
+    # Create variations of street name for fuzzy matching
+    possible_street_matches = get_street_name_variants(street_name)
+    
+    # Fast path: merge the precomputed per-block aggregates
+    if block_index is not None and block_size % BLOCK_INDEX_SIZE == 0:
+        return find_sweeping_times_from_index(
+            address, street_number, street_name, block_start, block_end,
+            possible_street_matches, block_index, days_filter
+        )
     
     # Filter citations for this block
     street_mask = citations_df['street_name'].isin(possible_street_matches)
@@ -170,6 +462,9 @@ def find_street_sweeping_times(address, citations_df, days_filter=None, block_si
         earliest_time = day_citations['hour_time'].min()
         latest_time = day_citations['hour_time'].max()
         
+        # Citations per hour of day, as in the block index
+        hourly_histogram = np.bincount(day_citations['citation_issued_datetime'].dt.hour, minlength=24).tolist()
+        
         # Get recent citation examples
         recent_citations = day_citations.nlargest(5, 'citation_issued_datetime')
         examples = []
@@ -186,6 +481,7 @@ def find_street_sweeping_times(address, citations_df, days_filter=None, block_si
             "citation_count": len(day_citations),
             "total_weight": round(total_weight, 2),
             "confidence": "high" if total_weight > 50 else "medium" if total_weight > 10 else "low",
+            "hourly_histogram": hourly_histogram,
             "recent_examples": examples
         }
     
@@ -199,6 +495,99 @@ def find_street_sweeping_times(address, citations_df, days_filter=None, block_si
         "sweeping_schedule": results_by_day
     }
 
+def find_sweeping_times_from_index(address, street_number, street_name, block_start, block_end,
+                                   possible_street_matches, block_index, days_filter=None):
+    """Answer a block query by merging precomputed block index entries"""
+    day_names = [day.title() for day in days_filter] if days_filter else None
+    
+    # Look up every (street variant, 100-block) pair covered by the requested range
+    found_any = False
+    merged_days = {}
+    street_names_matched = set()
+    for street in possible_street_matches:
+        for start in range(block_start, block_end + 1, BLOCK_INDEX_SIZE):
+            entry = block_index.get((street, start))
+            if not entry:
+                continue
+            found_any = True
+            
+            for day, stats in entry.items():
+                if day_names and day not in day_names:
+                    continue
+                street_names_matched.add(street)
+                
+                merged = merged_days.get(day)
+                if merged is None:
+                    merged_days[day] = {
+                        **stats,
+                        'hourly_histogram': list(stats['hourly_histogram']),
+                        'recent': list(stats['recent'])
+                    }
+                    continue
+                
+                merged['citation_count'] += stats['citation_count']
+                merged['total_weight'] += stats['total_weight']
+                merged['weighted_minutes'] += stats['weighted_minutes']
+                merged['earliest_seconds'] = min(merged['earliest_seconds'], stats['earliest_seconds'])
+                merged['latest_seconds'] = max(merged['latest_seconds'], stats['latest_seconds'])
+                merged['first_date'] = min(merged['first_date'], stats['first_date'])
+                merged['last_date'] = max(merged['last_date'], stats['last_date'])
+                merged['hourly_histogram'] = [a + b for a, b in zip(merged['hourly_histogram'], stats['hourly_histogram'])]
+                merged['recent'] = sorted(merged['recent'] + stats['recent'], key=lambda r: r[0], reverse=True)[:5]
+    
+    if not found_any:
+        return {
+            "address": address,
+            "parsed_address": f"{street_number} {street_name}",
+            "block_range": f"{block_start}-{block_end}",
+            "message": "No street sweeping citations found for this block",
+            "tried_street_names": possible_street_matches
+        }
+    
+    def format_seconds(seconds):
+        return f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}"
+    
+    # Most recently cited days first, matching the order of the citation feed
+    results_by_day = {}
+    for day, stats in sorted(merged_days.items(), key=lambda item: item[1]['last_date'], reverse=True):
+        total_weight = stats['total_weight']
+        if total_weight == 0:
+            continue
+        
+        weighted_avg_minutes = stats['weighted_minutes'] / total_weight
+        avg_hour = int(weighted_avg_minutes // 60)
+        avg_minute = int(weighted_avg_minutes % 60)
+        
+        results_by_day[day] = {
+            "estimated_time": f"{avg_hour:02d}:{avg_minute:02d}",
+            "time_range": f"{format_seconds(stats['earliest_seconds'])} - {format_seconds(stats['latest_seconds'])}",
+            "citation_count": stats['citation_count'],
+            "total_weight": round(total_weight, 2),
+            "confidence": "high" if total_weight > 50 else "medium" if total_weight > 10 else "low",
+            "hourly_histogram": stats['hourly_histogram'],
+            "recent_examples": [
+                {
+                    "location": location,
+                    "date": issued_at.strftime('%Y-%m-%d'),
+                    "time": issued_at.strftime('%H:%M')
+                }
+                for issued_at, location in stats['recent']
+            ]
+        }
+    
+    first_date = min((stats['first_date'] for stats in merged_days.values()), default=None)
+    last_date = max((stats['last_date'] for stats in merged_days.values()), default=None)
+    
+    return {
+        "address": address,
+        "parsed_address": f"{street_number} {street_name}",
+        "block_range": f"{block_start}-{block_end}",
+        "street_names_matched": list(street_names_matched),
+        "total_citations": sum(stats['citation_count'] for stats in merged_days.values()),
+        "date_range": f"{first_date.strftime('%Y-%m-%d')} to {last_date.strftime('%Y-%m-%d')}" if first_date is not None else None,
+        "sweeping_schedule": results_by_day
+    }
+
 @app.route('/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
@@ -231,13 +620,135 @@ def get_sweeping_times():
         # Load citations data
         citations_df = load_citations_cache()
         
-        # Find sweeping times
-        result = find_street_sweeping_times(address, citations_df, days_filter, block_size)
+        # Serve repeated queries from the rendered response cache
+        cache_key = normalize_cache_key(address, days_filter, block_size)
+        cached = response_cache.get(cache_key, dataset_version)
+        if cached is None:
+            # Find sweeping times
+            result = find_street_sweeping_times(address, citations_df, days_filter, block_size, block_index)
+            body = jsonify(result).get_data()
+            etag = hashlib.sha1(dataset_version.encode() + body).hexdigest()
+            cached = response_cache.put(cache_key, dataset_version, body, etag)
         
-        return jsonify(result)
+        response = app.response_class(cached['body'], mimetype='application/json')
+        response.set_etag(cached['etag'])
+        response.last_modified = dataset_modified
+        response.cache_control.max_age = RESPONSE_CACHE_TTL
         
+        # Answers If-None-Match / If-Modified-Since with 304 Not Modified
+        return response.make_conditional(request)
+        
+    except Exception as e:
+        return jsonify({"error": f"Internal server error: {str(e)}"}), 500
+
+def parse_batch_query(query):
+    """Split a batch entry into (address, latitude, longitude); returns None for unusable entries"""
+    if isinstance(query, str):
+        return query, None, None
+    if isinstance(query, (list, tuple)) and len(query) == 2:
+        return None, query[0], query[1]
+    if isinstance(query, dict):
+        if query.get('address'):
+            return query['address'], None, None
+        lat = query.get('latitude', query.get('lat'))
+        lon = query.get('longitude', query.get('lon'))
+        if lat is not None and lon is not None:
+            return None, lat, lon
+    return None
+
+def resolve_batch_queries(queries, days_filter=None, block_size=100, max_distance=BLOCK_MATCH_DISTANCE):
+    """Resolve a list of addresses and/or coordinates against the block indexes in one pass"""
+    parsed = [parse_batch_query(query) for query in queries]
+    
+    # Resolve all coordinate queries together through the spatial index
+    coordinate_slots = []
+    for i, entry in enumerate(parsed):
+        if entry and entry[0] is None:
+            try:
+                coordinate_slots.append((i, float(entry[1]), float(entry[2])))
+            except (TypeError, ValueError):
+                parsed[i] = None
+    
+    located = {}
+    if coordinate_slots:
+        spatial_index = block_spatial_index if block_spatial_index is not None else BlockSpatialIndex([], [], [])
+        nearest = spatial_index.nearest_blocks(
+            [lat for _, lat, _ in coordinate_slots], [lon for _, _, lon in coordinate_slots], max_distance
+        )
+        located = {slot[0]: match for slot, match in zip(coordinate_slots, nearest)}
+    
+    for i, (query, entry) in enumerate(zip(queries, parsed)):
+        if entry is None:
+            result = {"error": "Each query must be an address string, {'address': ...} or {'latitude': ..., 'longitude': ...}"}
+        elif entry[0] is not None:
+            result = find_street_sweeping_times(entry[0], citations_cache, days_filter, block_size, block_index)
+        else:
+            block_key, distance = located[i]
+            if block_key is None:
+                result = {"error": f"No known block within {max_distance}m of this location"}
+            else:
+                street_name, block_start = block_key
+                # Block 0 (numbers 1-99) has no house number 0, which the address parser rejects
+                result = find_street_sweeping_times(
+                    f"{max(block_start, 1)} {street_name}", citations_cache, days_filter, block_size, block_index
+                )
+                result["resolved_block"] = f"{block_start} {street_name}"
+                result["distance_meters"] = round(distance, 1)
+        yield {"index": i, "query": query, **result}
+
+@app.route('/sweeping-times/batch', methods=['POST'])
+def get_sweeping_times_batch():
+    """
+    Get estimated street sweeping times for many locations in one request
+    
+    JSON body:
+    - queries (required): List of addresses ("1530 Broderick St"), {"address": ...}
+      objects, {"latitude": ..., "longitude": ...} objects or [lat, lon] pairs
+    - days (optional): List or comma-separated string of days to filter
+    - block_size (optional): Block size for range calculation (default: 100)
+    - max_distance (optional): Max meters from a coordinate to a block (default: 200, at most 1000)
+    
+    Streams one JSON object per line (NDJSON) in the order of the queries.
+    """
+    payload = request.get_json(silent=True) or {}
+    queries = payload.get('queries')
+    
+    if not isinstance(queries, list) or not queries:
+        return jsonify({"error": "JSON body with a non-empty 'queries' list is required"}), 400
+    if len(queries) > MAX_BATCH_SIZE:
+        return jsonify({"error": f"At most {MAX_BATCH_SIZE} queries per batch"}), 400
+    
+    days_filter = payload.get('days')
+    if isinstance(days_filter, str):
+        days_filter = days_filter.split(',')
+    if days_filter:
+        days_filter = [day.strip().lower() for day in days_filter]
+    
+    # Validate everything before streaming starts; errors inside generate() would truncate the response
+    try:
+        block_size = int(payload.get('block_size', 100))
+    except (TypeError, ValueError):
+        return jsonify({"error": "'block_size' must be an integer"}), 400
+    if block_size <= 0:
+        return jsonify({"error": "'block_size' must be positive"}), 400
+    
+    try:
+        max_distance = float(payload.get('max_distance', BLOCK_MATCH_DISTANCE))
+    except (TypeError, ValueError):
+        return jsonify({"error": "'max_distance' must be a number"}), 400
+    if not math.isfinite(max_distance) or not 0 < max_distance <= MAX_BATCH_DISTANCE:
+        return jsonify({"error": f"'max_distance' must be greater than 0 and at most {MAX_BATCH_DISTANCE} meters"}), 400
+    
+    try:
+        load_citations_cache()
     except Exception as e:
         return jsonify({"error": f"Internal server error: {str(e)}"}), 500
+    
+    def generate():
+        for result in resolve_batch_queries(queries, days_filter, block_size, max_distance):
+            yield json.dumps(result, default=str) + "\n"
+    
+    return Response(generate(), mimetype='application/x-ndjson')
 
 @app.route('/cache/refresh', methods=['POST'])
 def refresh_cache():
@@ -247,6 +758,8 @@ def refresh_cache():
     try:
         print("Manually refreshing cache...")
         citations_cache = get_all_citations()
+        build_cached_block_index()
+        update_dataset_version()
         cache_timestamp = time.time()
         
         return jsonify({
@@ -266,14 +779,18 @@ def cache_status():
         return jsonify({
             "status": "not_loaded",
             "citation_count": 0,
-            "last_updated": None
+            "last_updated": None,
+            "response_cache": response_cache.stats()
         })
     
     return jsonify({
         "status": "loaded",
         "citation_count": len(citations_cache),
+        "indexed_blocks": len(block_index) if block_index is not None else 0,
+        "dataset_version": dataset_version,
         "last_updated": datetime.fromtimestamp(cache_timestamp).isoformat() if cache_timestamp else None,
-        "cache_age_seconds": time.time() - cache_timestamp if cache_timestamp else None
+        "cache_age_seconds": time.time() - cache_timestamp if cache_timestamp else None,
+        "response_cache": response_cache.stats()
     })
 
 @app.route('/', methods=['GET'])
@@ -292,7 +809,19 @@ def home():
                     "days": "Optional. Comma-separated days to filter (e.g., 'monday,tuesday')",
                     "block_size": "Optional. Block size for range calculation (default: 100)"
                 },
-                "example": "/sweeping-times?address=1530 Broderick St&days=tuesday,thursday"
+                "example": "/sweeping-times?address=1530 Broderick St&days=tuesday,thursday",
+                "caching": "Responses carry ETag/Last-Modified headers; send If-None-Match to get 304 Not Modified"
+            },
+            "/sweeping-times/batch": {
+                "method": "POST",
+                "description": "Get estimated street sweeping times for many addresses or coordinates, streamed as NDJSON",
+                "body": {
+                    "queries": "Required. List of addresses, {'address': ...}, {'latitude': ..., 'longitude': ...} or [lat, lon]",
+                    "days": "Optional. Days to filter (list or comma-separated string)",
+                    "block_size": "Optional. Block size for range calculation (default: 100)",
+                    "max_distance": f"Optional. Max meters from a coordinate to a block (default: 200, at most {MAX_BATCH_DISTANCE})"
+                },
+                "example": {"queries": ["1530 Broderick St", {"latitude": 37.7849, "longitude": -122.4410}]}
             },
             "/cache/refresh": {
                 "method": "POST",
@@ -300,7 +829,7 @@ def home():
             },
             "/cache/status": {
                 "method": "GET", 
-                "description": "Get cache status information"
+                "description": "Get cache status information, including response cache hit ratio"
             },
             "/health": {
                 "method": "GET",
@@ -0,0 +1,336 @@
+#!/usr/bin/env python3
+"""
+Pipeline Benchmark Suite
+
+Times each stage of the citation → schedule pipeline on deterministic synthetic
+data (see synthetic_data.py) and writes machine-readable results, so runs can be
+compared over time. Runs fully offline: no SF Open Data or Census API calls.
+
+Benchmarks:
+- clean_schedules   - DaySpecificScheduleDataCleaner on raw schedule records
+- geocode_planning  - Loading citations and planning unique-address geocode batches
+- geocode_validation - validate_geocoding_result over every (address, returned address) pair
+- match_index / match - DaySpecificHybridMatcher index build and matching (sampled, with per-step stats)
+- aggregate         - MatchBasedAggregator on a synthetic matches file
+- api_index / api_lookup - street_sweeping_api block index build and single/batch lookups
+- load_tables       - bare pd.read_csv vs typed data_loader.read_table: load time and in-memory size per table
+
+Usage:
+python3 run_benchmarks.py --scale 10k
+python3 run_benchmarks.py --scale 100k 1m --match-sample 20000
+python3 run_benchmarks.py --scale 100k --compare ../output/benchmarks/benchmark_100k_OLD.json
+"""
+
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'core'))
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'exploration', 'citation_analysis_experiments'))
+
+import argparse
+import contextlib
+import io
+import json
+import logging
+import platform
+import resource
+import subprocess
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# Keep stage modules from attaching their INFO log handlers; benchmark progress is printed instead
+logging.basicConfig(level=logging.WARNING)
+
+from synthetic_data import generate_dataset
+from stage_profiler import max_rss_mb
+from clean_schedule_data_day_specific import DaySpecificScheduleDataCleaner
+from production_citation_processor import CitationGeocodingProcessor, score_geocoding_result
+from production_hybrid_matcher_day_specific import DaySpecificHybridMatcher
+from aggregate_schedules_from_matches import MatchBasedAggregator
+from data_loader import read_table, frame_memory_mb
+
+# Scale name -> (citations, raw schedule rows); SF has ~37k raw schedule rows and ~468k citations a year
+SCALES = {
+    '10k': (10_000, 5_000),
+    '100k': (100_000, 37_000),
+    '365d': (468_000, 37_000),
+    '1m': (1_000_000, 37_000)
+}
+
+def timed(function, repeats: int = 1):
+    """Best wall time over `repeats` calls, and the last result"""
+    best = float('inf')
+    result = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = function()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+def benchmark_entry(seconds: float, rows: int, **extra) -> dict:
+    return {
+        'seconds': round(seconds, 4),
+        'rows': rows,
+        'rows_per_second': round(rows / seconds, 1) if seconds > 0 else None,
+        'peak_rss_mb': max_rss_mb(resource.getrusage(resource.RUSAGE_SELF)),
+        **extra
+    }
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+class PipelineBenchmark:
+    def __init__(self, scale: str, seed: int = 42, match_sample: int = 20000, api_queries: int = 1000,
+                 max_distance: float = 200, work_dir: Path = None):
+        self.scale = scale
+        self.citation_count, self.schedule_count = SCALES[scale]
+        self.seed = seed
+        self.match_sample = match_sample
+        self.api_queries = api_queries
+        self.max_distance = max_distance
+        self.work_dir = Path(work_dir)
+        self.results = {}
+
+    def log(self, name: str):
+        entry = self.results[name]
+        if entry.get('skipped'):
+            print(f"   {name:<19} skipped ({entry['skipped']})")
+            return
+        print(f"   {name:<19} {entry['seconds']:>9.3f}s  {entry['rows']:>10,} rows  "
+              f"{entry['rows_per_second'] or 0:>12,.0f} rows/s")
+
+    def run(self) -> dict:
+        print(f"📊 Benchmark scale {self.scale}: {self.citation_count:,} citations, ~{self.schedule_count:,} schedules")
+
+        seconds, (raw_schedules, raw_citations, geocoded) = timed(
+            lambda: generate_dataset(self.citation_count, self.schedule_count, self.seed))
+        self.results['generate_data'] = benchmark_entry(seconds, len(raw_schedules) + len(geocoded))
+        self.log('generate_data')
+
+        raw_schedules_file = self.work_dir / 'synthetic_schedules_raw.csv'
+        raw_citations_file = self.work_dir / 'synthetic_citations_raw.csv'
+        geocoded_file = self.work_dir / 'synthetic_citations_geocoded.csv'
+        raw_schedules.to_csv(raw_schedules_file, index=False)
+        raw_citations.to_csv(raw_citations_file, index=False)
+        geocoded.to_csv(geocoded_file, index=False)
+
+        cleaned = self.bench_clean(raw_schedules_file)
+        self.bench_geocode(raw_citations_file, geocoded)
+        self.bench_match(cleaned, geocoded)
+        self.bench_aggregate(cleaned)
+        self.bench_api(geocoded)
+        self.bench_load({
+            'schedule_raw': raw_schedules_file,
+            'schedule_clean': self.work_dir / 'synthetic_schedules_cleaned.csv',
+            'citations_raw': raw_citations_file,
+            'citations_geocoded': geocoded_file
+        })
+
+        return {
+            'suite': 'pipeline',
+            'scale': self.scale,
+            'created': datetime.now().isoformat(timespec='seconds'),
+            'git_commit': git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'parameters': {
+                'citations': self.citation_count,
+                'raw_schedules': len(raw_schedules),
+                'seed': self.seed,
+                'match_sample': min(self.match_sample, self.citation_count),
+                'api_queries': self.api_queries,
+                'max_distance': self.max_distance
+            },
+            'benchmarks': self.results
+        }
+
+    def bench_clean(self, raw_schedules_file: Path) -> pd.DataFrame:
+        cleaner = DaySpecificScheduleDataCleaner(str(raw_schedules_file), self.work_dir)
+        with contextlib.redirect_stdout(io.StringIO()):
+            cleaner.load_data()
+            seconds, _ = timed(cleaner.clean_schedule_data_day_specific)
+        self.results['clean_schedules'] = benchmark_entry(seconds, len(cleaner.df), rows_out=len(cleaner.cleaned_df))
+        self.log('clean_schedules')
+        return cleaner.cleaned_df
+
+    def bench_geocode(self, raw_citations_file: Path, geocoded: pd.DataFrame):
+        processor = CitationGeocodingProcessor(output_dir=str(self.work_dir), use_database=False)
+
+        def plan():
+            citations = processor.load_citations_from_file(str(raw_citations_file))
+            unique_addresses = {citation['citation_location'] for citation in citations}
+            batches = (len(unique_addresses) + processor.batch_size - 1) // processor.batch_size
+            return len(citations), len(unique_addresses), batches
+
+        seconds, (rows, unique_addresses, batches) = timed(plan)
+        self.results['geocode_planning'] = benchmark_entry(seconds, rows, unique_addresses=unique_addresses,
+                                                           batches=batches)
+        self.log('geocode_planning')
+
+        pairs = list(zip(geocoded['address'], geocoded['returned_address']))
+        score_geocoding_result.cache_clear()
+        seconds, scores = timed(lambda: [processor.validate_geocoding_result(original, returned)
+                                         for original, returned in pairs])
+        self.results['geocode_validation'] = benchmark_entry(
+            seconds, len(pairs), high_confidence=sum(1 for _, confidence in scores if confidence == 'HIGH'))
+        self.log('geocode_validation')
+
+    def bench_match(self, cleaned: pd.DataFrame, geocoded: pd.DataFrame):
+        matcher = DaySpecificHybridMatcher(max_distance_meters=self.max_distance, output_dir=str(self.work_dir),
+                                           collect_stats=True)
+        seconds, _ = timed(lambda: matcher.build_hybrid_index(cleaned.copy()))
+        self.results['match_index'] = benchmark_entry(seconds, len(cleaned), grid_cells=len(matcher.spatial_grid),
+                                                       geometries=len(matcher.geometries))
+        self.log('match_index')
+
+        sample = geocoded.sample(min(self.match_sample, len(geocoded)), random_state=self.seed)
+        seconds, matches_df = timed(lambda: matcher.process_all_citations(sample))
+        report = matcher.stats.report(matcher.spatial_grid)
+        self.results['match'] = benchmark_entry(
+            seconds, len(sample),
+            matches=len(matches_df),
+            citations_matched=report['citations_matched'],
+            extrapolated_full_seconds=round(seconds * len(geocoded) / len(sample), 1),
+            step_seconds={step: stats['total_seconds'] for step, stats in report['steps'].items()},
+            grid_occupancy=report['grid_occupancy']['geometries_per_cell']
+        )
+        self.log('match')
+
+    def bench_aggregate(self, cleaned: pd.DataFrame):
+        # One synthetic match per citation, timed inside its schedule's window
+        rng = np.random.default_rng(self.seed)
+        picks = rng.integers(0, len(cleaned), self.citation_count)
+        from_hour = cleaned['scheduled_from_hour'].to_numpy()[picks].astype(float)
+        window = (cleaned['scheduled_to_hour'].to_numpy()[picks] - from_hour) % 24
+        matches = pd.DataFrame({
+            'citation_id': 900000000 + np.arange(self.citation_count),
+            'schedule_id': cleaned['schedule_id'].to_numpy()[picks],
+            'citation_time': np.round(from_hour + rng.uniform(0, 1, self.citation_count) * window, 4)
+        })
+        matches_file = self.work_dir / 'synthetic_matches.csv'
+        schedules_file = self.work_dir / 'synthetic_schedules_cleaned.csv'
+        matches.to_csv(matches_file, index=False)
+        cleaned.to_csv(schedules_file, index=False)
+
+        aggregator = MatchBasedAggregator(str(matches_file), str(schedules_file),
+                                          str(self.work_dir / 'synthetic_app_ready.csv'))
+        seconds, result_df = timed(aggregator.aggregate_from_matches)
+        self.results['aggregate'] = benchmark_entry(seconds, len(matches), rows_out=len(result_df))
+        self.log('aggregate')
+
+    def bench_api(self, geocoded: pd.DataFrame):
+        try:
+            import street_sweeping_api as api
+        except ImportError as e:
+            self.results['api_index'] = self.results['api_lookup'] = {'skipped': f"API dependencies missing: {e}"}
+            self.log('api_lookup')
+            return
+
+        citations_df = api.prepare_citations(pd.DataFrame({
+            'citation_location': geocoded['address'],
+            'citation_issued_datetime': geocoded['datetime'],
+            'latitude': geocoded['latitude'],
+            'longitude': geocoded['longitude']
+        }))
+
+        def build():
+            return api.build_block_index(citations_df), api.BlockSpatialIndex.from_citations(citations_df)
+
+        seconds, (block_index, spatial_index) = timed(build)
+        self.results['api_index'] = benchmark_entry(seconds, len(citations_df), blocks=len(block_index))
+        self.log('api_index')
+
+        sample = citations_df.sample(min(self.api_queries, len(citations_df)), random_state=self.seed)
+        addresses = list(sample['citation_location'])
+        seconds, results = timed(lambda: [api.find_street_sweeping_times(address, citations_df, block_index=block_index)
+                                          for address in addresses])
+        batch_seconds, nearest = timed(lambda: spatial_index.nearest_blocks(sample['latitude'].to_numpy(),
+                                                                            sample['longitude'].to_numpy()))
+        self.results['api_lookup'] = benchmark_entry(
+            seconds, len(addresses),
+            ms_per_address_lookup=round(seconds / len(addresses) * 1000, 3),
+            found=sum(1 for result in results if result and 'error' not in result),
+            batch_coordinate_seconds=round(batch_seconds, 4),
+            batch_coordinates_resolved=sum(1 for key, _ in nearest if key)
+        )
+        self.log('api_lookup')
+
+    def bench_load(self, tables: dict):
+        per_table = {}
+        for table, path in tables.items():
+            bare_seconds, bare = timed(lambda: pd.read_csv(path))
+            seconds, typed = timed(lambda: read_table(path, table))
+            per_table[table] = {
+                'rows': len(typed),
+                'bare_seconds': round(bare_seconds, 4),
+                'seconds': round(seconds, 4),
+                'bare_mb': round(frame_memory_mb(bare), 1),
+                'typed_mb': round(frame_memory_mb(typed), 1)
+            }
+            del bare, typed
+
+        self.results['load_tables'] = benchmark_entry(
+            sum(entry['seconds'] for entry in per_table.values()),
+            sum(entry['rows'] for entry in per_table.values()),
+            bare_seconds=round(sum(entry['bare_seconds'] for entry in per_table.values()), 4),
+            bare_mb=round(sum(entry['bare_mb'] for entry in per_table.values()), 1),
+            typed_mb=round(sum(entry['typed_mb'] for entry in per_table.values()), 1),
+            tables=per_table
+        )
+        self.log('load_tables')
+        for table, entry in per_table.items():
+            print(f"     {table:<22} {entry['bare_mb']:>8.1f} MB → {entry['typed_mb']:>7.1f} MB in memory, "
+                  f"{entry['bare_seconds']:.2f}s → {entry['seconds']:.2f}s to load")
+
+def compare(previous: dict, current: dict):
+    """Print per-benchmark time ratios against an earlier results file"""
+    print(f"\n📈 vs {previous.get('git_commit')} ({previous.get('created')}):")
+    for name, entry in current['benchmarks'].items():
+        before = previous.get('benchmarks', {}).get(name, {})
+        if 'seconds' not in entry or 'seconds' not in before:
+            continue
+        ratio = entry['seconds'] / before['seconds'] if before['seconds'] else float('inf')
+        marker = '🔴' if ratio > 1.1 else '🟢' if ratio < 0.9 else '  '
+        print(f"   {marker} {name:<24} {before['seconds']:>9.3f}s → {entry['seconds']:>9.3f}s  ({ratio:.2f}x)")
+
+def main():
+    parser = argparse.ArgumentParser(description='Offline benchmark suite for the citation → schedule pipeline')
+    parser.add_argument('--scale', nargs='+', choices=list(SCALES), default=['10k'],
+                        help='Dataset scales to run (default: 10k)')
+    parser.add_argument('--seed', type=int, default=42, help='Synthetic data seed (default: 42)')
+    parser.add_argument('--match-sample', type=int, default=20000,
+                        help='Citations to run through the matcher; full-run time is extrapolated (default: 20000)')
+    parser.add_argument('--api-queries', type=int, default=1000, help='Address lookups for the API benchmark (default: 1000)')
+    parser.add_argument('--output-dir', default=os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'output', 'benchmarks'),
+                        help='Directory for results JSON (default: production/output/benchmarks)')
+    parser.add_argument('--compare', help='Earlier results JSON to compare against')
+    args = parser.parse_args()
+
+    output_dir = Path(args.output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+
+    for scale in args.scale:
+        with tempfile.TemporaryDirectory(prefix=f"benchmark_{scale}_") as work_dir:
+            results = PipelineBenchmark(scale, args.seed, args.match_sample, args.api_queries,
+                                        work_dir=work_dir).run()
+
+        results_file = output_dir / f"benchmark_{scale}_{timestamp}.json"
+        with open(results_file, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"📄 Results saved to {results_file}")
+
+        if args.compare:
+            with open(args.compare) as f:
+                compare(json.load(f), results)
+
+if __name__ == "__main__":
+    main()
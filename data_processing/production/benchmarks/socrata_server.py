@@ -0,0 +1,372 @@
+#!/usr/bin/env python3
+"""
+Offline SF Open Data (Socrata) Stand-In
+
+Serves /resource/<dataset>.json with the SoQL subset the pipeline's fetch
+steps use, so fetch_schedule_data, fetch_citation_data and fetch_citations
+can run and be timed without data.sfgov.org (point them at it with --api-base):
+- $limit (default 1000) and $offset
+- $order: comma-separated columns, each optionally ASC/DESC
+- $where: comparisons (= != <> > >= < <=) of a column with a 'string' or
+  number literal, joined by AND
+
+Like Socrata, values are served as strings (null fields omitted) and compared
+as numbers or timestamps when every value of the column is one. Anything
+outside the subset is a 400 with a Socrata-style error body.
+
+Data comes from one of:
+- synthetic (default): synthetic_data.py schedules (yhqp-riqs) and raw citations
+  (ab4h-6ztd), with timestamps moved by whole weeks so the newest is near today
+- --fixtures DIR: <dataset>.json (array of records) or <dataset>.csv files
+- --replay DIR: exact responses saved by --record; unrecorded requests are 404s
+- --record DIR: proxy to --upstream, saving each response for --replay
+
+Replay matches requests exactly, and the fetch steps' $where holds a start date
+counted back from today, so a recording replays for the same --days on the day
+it was made; --write-fixtures turns served data into date-independent fixtures.
+
+--latency-ms/--jitter-ms delay every response and --error-rate answers that
+share of requests with one of --error-codes instead.
+
+Usage:
+python3 socrata_server.py --citations 468000 --port 8089 --latency-ms 300 --error-rate 0.05
+python3 socrata_server.py --record recordings/ --port 8089
+python3 socrata_server.py --replay recordings/ --port 8089
+python3 ../core/full_pipeline_processor.py --days 365 --api-base http://127.0.0.1:8089
+"""
+
+import argparse
+import ast
+import hashlib
+import json
+import logging
+import operator
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+import pandas as pd
+import requests
+
+from synthetic_data import REFERENCE_DATE, generate_dataset
+
+SCHEDULES_DATASET = 'yhqp-riqs'
+CITATIONS_DATASET = 'ab4h-6ztd'
+DEFAULT_LIMIT = 1000
+SUPPORTED_PARAMS = {'$limit', '$offset', '$where', '$order'}
+WHERE_TOKEN = re.compile(r"\s*(?:(?P<string>'(?:[^']|'')*')|(?P<number>-?\d+(?:\.\d+)?)|"
+                         r"(?P<op>!=|<>|>=|<=|=|>|<)|(?P<word>[A-Za-z_][A-Za-z0-9_]*))")
+COMPARISONS = {'=': operator.eq, '!=': operator.ne, '>': operator.gt, '>=': operator.ge,
+               '<': operator.lt, '<=': operator.le}
+ISO_DATE = re.compile(r'\d{4}-\d{2}-\d{2}')
+
+class SoqlError(ValueError):
+    """Query outside the supported SoQL subset (answered with a 400)"""
+
+def parse_where(where: str) -> List[Tuple[str, str, object]]:
+    """`col op literal [AND ...]` → [(column, op, literal)], literal a str or float"""
+    tokens = []
+    position = 0
+    while position < len(where.rstrip()):
+        match = WHERE_TOKEN.match(where, position)
+        if not match:
+            raise SoqlError(f"Unsupported $where syntax at: {where[position:]!r}")
+        kind = match.lastgroup
+        value = match.group(kind)
+        if kind == 'string':
+            value = value[1:-1].replace("''", "'")
+        elif kind == 'number':
+            value = float(value)
+        tokens.append((kind, value))
+        position = match.end()
+
+    conditions = []
+    for start in range(0, len(tokens), 4):
+        clause = tokens[start:start + 3]
+        if len(clause) < 3 or clause[0][0] != 'word' or clause[1][0] != 'op' or clause[2][0] not in ('string', 'number'):
+            raise SoqlError(f"Unsupported $where clause: {where!r} (expected `column op literal` joined by AND)")
+        conditions.append((clause[0][1], '!=' if clause[1][1] == '<>' else clause[1][1], clause[2][1]))
+        if start + 3 < len(tokens) and (tokens[start + 3][0] != 'word' or tokens[start + 3][1].upper() != 'AND'):
+            raise SoqlError(f"Only AND is supported in $where: {where!r}")
+    return conditions
+
+def parse_order(order: str) -> List[Tuple[str, bool]]:
+    """`col [ASC|DESC], ...` → [(column, ascending)]"""
+    keys = []
+    for part in order.split(','):
+        words = part.split()
+        if not words or len(words) > 2 or (len(words) == 2 and words[1].upper() not in ('ASC', 'DESC')):
+            raise SoqlError(f"Unsupported $order: {order!r}")
+        keys.append((words[0], len(words) == 1 or words[1].upper() == 'ASC'))
+    return keys
+
+def socrata_value(value):
+    """Socrata serves numbers and text as strings and geometry as GeoJSON objects"""
+    if isinstance(value, str) and value.startswith("{'type':"):
+        return ast.literal_eval(value)
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return value if isinstance(value, (dict, list)) else str(value)
+
+class Dataset:
+    """One resource's records plus typed columns for filtering and ordering"""
+
+    def __init__(self, records: List[Dict]):
+        self.records = records
+        self.frame = pd.DataFrame.from_records(records)
+        self.typed = {}
+        self.queries = {}
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> 'Dataset':
+        columns = list(df.columns)
+        records = [{column: socrata_value(value) for column, value in zip(columns, row) if not pd.isna(value)}
+                   for row in df.itertuples(index=False, name=None)]
+        return cls(records)
+
+    def column(self, name: str) -> pd.Series:
+        """Column as numbers or timestamps when every value parses as one, else text"""
+        if name not in self.typed:
+            if name not in self.frame:
+                raise SoqlError(f"No such column: {name}")
+            values = self.frame[name]
+            present = values.dropna()
+            numbers = pd.to_numeric(present, errors='coerce')
+            if len(present) and numbers.notna().all():
+                values = pd.to_numeric(values, errors='coerce')
+            elif len(present) and present.astype(str).str.match(ISO_DATE).all():
+                values = pd.to_datetime(values, format='ISO8601', errors='coerce')
+            self.typed[name] = values
+        return self.typed[name]
+
+    def select(self, where: Optional[str], order: Optional[str]) -> List[int]:
+        """Positions of matching records in order (cached: pages of one query share it)"""
+        key = (where, order)
+        with self.lock:
+            if key in self.queries:
+                return self.queries[key]
+            mask = pd.Series(True, index=self.frame.index)
+            for name, op, literal in parse_where(where) if where else []:
+                values = self.column(name)
+                try:
+                    if pd.api.types.is_datetime64_any_dtype(values):
+                        literal = pd.Timestamp(literal)
+                    elif pd.api.types.is_numeric_dtype(values):
+                        literal = float(literal)
+                    else:
+                        values = values.astype(str)
+                        literal = str(literal)
+                except ValueError:
+                    raise SoqlError(f"Cannot compare {name} with {literal!r}")
+                mask &= COMPARISONS[op](values, literal).fillna(False)
+            selected = self.frame.index[mask.to_numpy(dtype=bool)]
+            if order:
+                keys = parse_order(order)
+                sort_frame = pd.DataFrame({f'k{i}': self.column(name)[selected] for i, (name, _) in enumerate(keys)})
+                selected = sort_frame.sort_values([f'k{i}' for i in range(len(keys))],
+                                                  ascending=[ascending for _, ascending in keys],
+                                                  kind='stable', na_position='last').index
+            self.queries[key] = selected.tolist()
+            return self.queries[key]
+
+def synthetic_datasets(citations: int, schedules: int, seed: int = 42) -> Dict[str, Dataset]:
+    """Synthetic schedules and raw citations, timestamps moved to end near today"""
+    schedule_df, raw_citations, _ = generate_dataset(citations, schedules, seed)
+    weeks = (pd.Timestamp.now().normalize() - REFERENCE_DATE).days // 7
+    issued = pd.to_datetime(raw_citations['citation_issued_datetime']) + pd.Timedelta(weeks=weeks)
+    raw_citations['citation_issued_datetime'] = issued.dt.strftime('%Y-%m-%dT%H:%M:%S.000')
+    return {SCHEDULES_DATASET: Dataset.from_frame(schedule_df), CITATIONS_DATASET: Dataset.from_frame(raw_citations)}
+
+def fixture_datasets(fixture_dir) -> Dict[str, Dataset]:
+    """<dataset>.json (array of records) or <dataset>.csv files in fixture_dir"""
+    datasets = {}
+    for path in sorted(Path(fixture_dir).iterdir()):
+        if path.suffix == '.json':
+            datasets[path.stem] = Dataset(json.loads(path.read_text()))
+        elif path.suffix == '.csv':
+            datasets[path.stem] = Dataset.from_frame(pd.read_csv(path, dtype=str))
+    if not datasets:
+        raise FileNotFoundError(f"No <dataset>.json or <dataset>.csv fixtures in {fixture_dir}")
+    return datasets
+
+def recording_name(dataset: str, params: List[Tuple[str, str]]) -> str:
+    """File name for one request, independent of parameter order"""
+    query = urlencode(sorted(params))
+    return f"{dataset}_{hashlib.sha256(query.encode('utf-8')).hexdigest()[:16]}.json"
+
+class SocrataStandIn:
+    """Answers resource requests from datasets, a recording, or an upstream proxy, with injected latency/errors"""
+
+    def __init__(self, datasets: Dict[str, Dataset] = None, replay_dir: str = None, record_dir: str = None,
+                 upstream: str = 'https://data.sfgov.org', latency_ms: float = 0, jitter_ms: float = 0,
+                 error_rate: float = 0, error_codes: List[int] = (429, 500, 503), seed: int = 42):
+        self.datasets = datasets or {}
+        self.replay_dir = Path(replay_dir) if replay_dir else None
+        self.record_dir = Path(record_dir) if record_dir else None
+        if self.record_dir:
+            self.record_dir.mkdir(parents=True, exist_ok=True)
+        self.upstream = upstream.rstrip('/')
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.error_codes = list(error_codes)
+        self.random = random.Random(seed)
+        self.random_lock = threading.Lock()
+        self.stats = {'requests': 0, 'rows_served': 0, 'injected_errors': 0, 'bad_requests': 0}
+        self.logger = logging.getLogger(__name__)
+
+    def handle(self, path: str, params: List[Tuple[str, str]]) -> Tuple[int, object]:
+        """(status, JSON body) for GET path?params"""
+        with self.random_lock:
+            self.stats['requests'] += 1
+            delay = self.latency_ms + self.random.uniform(0, self.jitter_ms)
+            inject_error = self.random.random() < self.error_rate
+            error_code = self.random.choice(self.error_codes)
+        if delay:
+            time.sleep(delay / 1000)
+        if inject_error:
+            with self.random_lock:
+                self.stats['injected_errors'] += 1
+            return error_code, {'error': True, 'code': 'injected', 'message': f'Injected {error_code} from the stand-in'}
+
+        match = re.fullmatch(r'/resource/([A-Za-z0-9-]+)\.json', path)
+        if not match:
+            return 404, {'error': True, 'code': 'not_found', 'message': f'Unknown path {path}'}
+        dataset = match.group(1)
+        try:
+            if self.replay_dir:
+                return self.replay(dataset, params)
+            if self.record_dir:
+                return self.record(path, dataset, params)
+            return self.query(dataset, params)
+        except SoqlError as e:
+            with self.random_lock:
+                self.stats['bad_requests'] += 1
+            return 400, {'error': True, 'code': 'query.soql.invalid', 'message': str(e)}
+
+    def query(self, dataset: str, params: List[Tuple[str, str]]) -> Tuple[int, object]:
+        if dataset not in self.datasets:
+            return 404, {'error': True, 'code': 'not_found', 'message': f'Unknown dataset {dataset}'}
+        query = dict(params)
+        unsupported = set(query) - SUPPORTED_PARAMS
+        if unsupported:
+            raise SoqlError(f"Unsupported parameters: {', '.join(sorted(unsupported))}")
+        try:
+            limit = int(query.get('$limit', DEFAULT_LIMIT))
+            offset = int(query.get('$offset', 0))
+        except ValueError:
+            raise SoqlError("$limit and $offset must be integers")
+
+        data = self.datasets[dataset]
+        positions = data.select(query.get('$where'), query.get('$order'))[offset:offset + limit]
+        rows = [data.records[position] for position in positions]
+        with self.random_lock:
+            self.stats['rows_served'] += len(rows)
+        return 200, rows
+
+    def replay(self, dataset: str, params: List[Tuple[str, str]]) -> Tuple[int, object]:
+        path = self.replay_dir / recording_name(dataset, params)
+        if not path.exists():
+            return 404, {'error': True, 'code': 'not_recorded', 'message': f'No recording for {dataset}?{urlencode(params)}'}
+        recording = json.loads(path.read_text())
+        return recording['status'], recording['body']
+
+    def record(self, path: str, dataset: str, params: List[Tuple[str, str]]) -> Tuple[int, object]:
+        response = requests.get(self.upstream + path, params=params, timeout=120)
+        body = response.json()
+        recording = {'path': path, 'params': params, 'status': response.status_code, 'body': body}
+        (self.record_dir / recording_name(dataset, params)).write_text(json.dumps(recording))
+        return response.status_code, body
+
+def make_handler(stand_in: SocrataStandIn):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            start = time.perf_counter()
+            url = urlsplit(self.path)
+            status, body = stand_in.handle(url.path, parse_qsl(url.query, keep_blank_values=True))
+            payload = json.dumps(body).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json; charset=utf-8')
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+            rows = f"{len(body):,} rows" if isinstance(body, list) else body.get('message', '')
+            stand_in.logger.info(f"   {status} {url.path} {dict(parse_qsl(url.query))} → {rows} "
+                                 f"({(time.perf_counter() - start) * 1000:.0f} ms)")
+
+        def log_message(self, format, *args):
+            # Requests are logged once above, through the module logger
+            pass
+
+    return Handler
+
+def start_server(stand_in: SocrataStandIn, host: str = '127.0.0.1', port: int = 0) -> Tuple[ThreadingHTTPServer, str]:
+    """Serve in a background thread; returns the server and its base URL (for --api-base)"""
+    server = ThreadingHTTPServer((host, port), make_handler(stand_in))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+def main():
+    parser = argparse.ArgumentParser(description='Offline SF Open Data (Socrata) stand-in for the pipeline fetch steps')
+    parser.add_argument('--host', default='127.0.0.1', help='Address to listen on (default: 127.0.0.1)')
+    parser.add_argument('--port', type=int, default=8089, help='Port to listen on (default: 8089)')
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument('--fixtures', metavar='DIR', help='Serve <dataset>.json / <dataset>.csv files from DIR')
+    source.add_argument('--replay', metavar='DIR', help='Serve responses recorded with --record')
+    source.add_argument('--record', metavar='DIR', help='Proxy to --upstream and record every response to DIR')
+    parser.add_argument('--upstream', default='https://data.sfgov.org', help='API proxied by --record')
+    parser.add_argument('--citations', type=int, default=100000, help='Synthetic citations (default: 100000)')
+    parser.add_argument('--schedules', type=int, default=37000, help='Synthetic raw schedule rows (default: 37000)')
+    parser.add_argument('--seed', type=int, default=42, help='Synthetic data and error injection seed (default: 42)')
+    parser.add_argument('--write-fixtures', metavar='DIR', help='Write the served datasets as <dataset>.json fixtures and exit')
+    parser.add_argument('--latency-ms', type=float, default=0, help='Delay added to every response (default: 0)')
+    parser.add_argument('--jitter-ms', type=float, default=0, help='Extra uniform random delay up to this (default: 0)')
+    parser.add_argument('--error-rate', type=float, default=0, help='Share of requests answered with an error (default: 0)')
+    parser.add_argument('--error-codes', type=int, nargs='+', default=[429, 500, 503],
+                        help='Status codes for injected errors (default: 429 500 503)')
+
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    logger = logging.getLogger(__name__)
+
+    datasets = {}
+    if args.fixtures:
+        datasets = fixture_datasets(args.fixtures)
+    elif not args.replay and not args.record:
+        datasets = synthetic_datasets(args.citations, args.schedules, args.seed)
+    for name, dataset in datasets.items():
+        logger.info(f"📦 {name}: {len(dataset.records):,} records")
+
+    if args.write_fixtures:
+        output_dir = Path(args.write_fixtures)
+        output_dir.mkdir(parents=True, exist_ok=True)
+        for name, dataset in datasets.items():
+            (output_dir / f"{name}.json").write_text(json.dumps(dataset.records))
+        logger.info(f"💾 Wrote {len(datasets)} fixtures to {output_dir}")
+        return
+
+    stand_in = SocrataStandIn(datasets, args.replay, args.record, args.upstream, args.latency_ms, args.jitter_ms,
+                              args.error_rate, args.error_codes, args.seed)
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(stand_in))
+    server.daemon_threads = True
+    mode = 'replaying ' + args.replay if args.replay else 'recording ' + args.upstream if args.record else 'serving'
+    logger.info(f"🚀 Socrata stand-in {mode} on http://{args.host}:{args.port} "
+                f"(latency {args.latency_ms:g}+{args.jitter_ms:g} ms, error rate {args.error_rate:g})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        logger.info(f"📊 {stand_in.stats}")
+
+if __name__ == "__main__":
+    main()
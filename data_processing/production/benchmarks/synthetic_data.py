@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+Deterministic Synthetic SF-Like Data for Benchmarks
+
+Generates a street grid roughly the size of San Francisco and, from it:
+- Raw schedule records in the SF Open Data (yhqp-riqs) column layout, with
+  LineString geometry stored as a dict repr like the pipeline's raw CSV
+- Raw citations in the SF Open Data (ab4h-6ztd) layout
+- Geocoded citations in the production_citation_processor.py output layout
+
+Citations are placed beside a scheduled block, with addresses numbered along the
+street and timestamps mostly inside the block's sweeping window, so every stage
+sees realistic candidate counts. The same seed always produces the same data.
+
+Usage:
+python3 synthetic_data.py --citations 100000 --schedules 37000 --output-dir synthetic/
+"""
+
+import argparse
+import math
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+ORIGIN_LAT = 37.708
+ORIGIN_LON = -122.505
+BLOCK_LAT_STEP = 0.0009   # ~100m between east-west streets
+BLOCK_LON_STEP = 0.00136  # ~120m between north-south streets
+METERS_PER_DEGREE_LAT = 111320.0
+METERS_PER_DEGREE_LON = METERS_PER_DEGREE_LAT * math.cos(math.radians(37.76))
+
+# Reference "now" so generated timestamps don't depend on when the benchmark runs
+REFERENCE_DATE = pd.Timestamp('2025-07-01')
+
+STREET_NAMES = [
+    'Mission', 'Valencia', 'Guerrero', 'Dolores', 'Church', 'Sanchez', 'Noe', 'Castro', 'Diamond', 'Douglass',
+    'Folsom', 'Harrison', 'Bryant', 'Potrero', 'Hampshire', 'York', 'Florida', 'Alabama', 'Shotwell', 'Capp',
+    'Fillmore', 'Steiner', 'Pierce', 'Scott', 'Divisadero', 'Broderick', 'Baker', 'Lyon', 'Central', 'Masonic',
+    'Clement', 'Geary', 'Anza', 'Balboa', 'Cabrillo', 'Fulton', 'Lincoln', 'Irving', 'Judah', 'Kirkham',
+    'Lawton', 'Moraga', 'Noriega', 'Ortega', 'Pacheco', 'Quintara', 'Rivera', 'Santiago', 'Taraval', 'Ulloa',
+    'Vicente', 'Wawona', 'Sloat', 'Ocean', 'Holloway', 'Cayuga', 'Alemany', 'Persia', 'Russia', 'Brazil'
+]
+STREET_SUFFIXES = [('St', 'ST'), ('Ave', 'AVE'), ('Way', 'WAY'), ('Blvd', 'BLVD'), ('Ter', 'TER')]
+
+RAW_WEEKDAYS = ['Mon', 'Tues', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun']
+WEEKDAY_WEIGHTS = [0.17, 0.17, 0.17, 0.17, 0.17, 0.08, 0.07]
+SWEEP_WINDOWS = [(0, 2), (2, 4), (2, 6), (5, 6), (6, 8), (8, 10), (9, 11), (10, 12), (12, 14), (22, 0)]
+WEEK_PATTERNS = [((1, 1, 1, 1, 1), 0.7), ((1, 0, 1, 0, 1), 0.15), ((0, 1, 0, 1, 0), 0.15)]
+
+def ordinal(n: int) -> str:
+    suffix = 'th' if 10 <= n % 100 <= 20 else {1: 'st', 2: 'nd', 3: 'rd'}.get(n % 10, 'th')
+    return f"{n:02d}{suffix}"
+
+def grid_size_for(schedule_rows: int) -> int:
+    """Streets per direction so that ~1.5 schedule rows per block side add up to schedule_rows"""
+    return max(4, int(round(math.sqrt(schedule_rows / 6))))
+
+def build_street_grid(streets_per_direction: int):
+    """North-south named streets and east-west numbered avenues as (corridor, address_name) pairs"""
+    ns_names = []
+    for i in range(streets_per_direction):
+        name = STREET_NAMES[i % len(STREET_NAMES)]
+        corridor_suffix, address_suffix = STREET_SUFFIXES[(i // len(STREET_NAMES)) % len(STREET_SUFFIXES)]
+        repeat = i // (len(STREET_NAMES) * len(STREET_SUFFIXES))
+        name = f"{name} {repeat + 1}" if repeat else name
+        ns_names.append((f"{name} {corridor_suffix}", f"{name.upper()} {address_suffix}"))
+    ew_names = [(f"{ordinal(j + 1)} Ave", f"{ordinal(j + 1).upper()} AVE") for j in range(streets_per_direction)]
+    return ns_names, ew_names
+
+def generate_blocks(streets_per_direction: int, rng: np.random.Generator) -> pd.DataFrame:
+    """One row per street segment between two cross streets, with a jittered polyline"""
+    ns_names, ew_names = build_street_grid(streets_per_direction)
+    blocks = []
+
+    for i, (corridor, address_name) in enumerate(ns_names):
+        lon = ORIGIN_LON + i * BLOCK_LON_STEP
+        for j in range(streets_per_direction - 1):
+            blocks.append((corridor, address_name, f"{ew_names[j][0]}  -  {ew_names[j + 1][0]}",
+                           ORIGIN_LAT + j * BLOCK_LAT_STEP, lon, ORIGIN_LAT + (j + 1) * BLOCK_LAT_STEP, lon,
+                           j, ('West', 'East')))
+    for j, (corridor, address_name) in enumerate(ew_names):
+        lat = ORIGIN_LAT + j * BLOCK_LAT_STEP
+        for i in range(streets_per_direction - 1):
+            blocks.append((corridor, address_name, f"{ns_names[i][0]}  -  {ns_names[i + 1][0]}",
+                           lat, ORIGIN_LON + i * BLOCK_LON_STEP, lat, ORIGIN_LON + (i + 1) * BLOCK_LON_STEP,
+                           i, ('North', 'South')))
+
+    df = pd.DataFrame(blocks, columns=['corridor', 'address_name', 'limits', 'start_lat', 'start_lon',
+                                       'end_lat', 'end_lon', 'block_number', 'sides'])
+    df['cnn'] = 1000000 + np.arange(len(df)) * 1000
+
+    # 1-3 interior vertices per block, jittered up to ~3m off the straight line
+    lines = []
+    for row in df.itertuples():
+        interior = rng.integers(1, 4)
+        fractions = np.sort(rng.uniform(0.15, 0.85, interior))
+        points = [(row.start_lon, row.start_lat)]
+        for fraction in fractions:
+            points.append((
+                row.start_lon + fraction * (row.end_lon - row.start_lon) + rng.normal(0, 3 / METERS_PER_DEGREE_LON),
+                row.start_lat + fraction * (row.end_lat - row.start_lat) + rng.normal(0, 3 / METERS_PER_DEGREE_LAT)
+            ))
+        points.append((row.end_lon, row.end_lat))
+        lines.append(str({'type': 'LineString', 'coordinates': [[round(float(lon), 12), round(float(lat), 12)] for lon, lat in points]}))
+    df['line'] = lines
+    return df
+
+def generate_schedules(blocks: pd.DataFrame, target_rows: int, rng: np.random.Generator) -> pd.DataFrame:
+    """Raw schedule records (one per block side and day) in the SF Open Data layout"""
+    rows = []
+    pattern_weights = [weight for _, weight in WEEK_PATTERNS]
+
+    for block in blocks.itertuples():
+        for side_code, side_name in zip(('L', 'R'), block.sides):
+            day_count = rng.choice([1, 1, 2, 2, 3])
+            days = rng.choice(len(RAW_WEEKDAYS), size=day_count, replace=False, p=WEEKDAY_WEIGHTS)
+            from_hour, to_hour = SWEEP_WINDOWS[rng.integers(len(SWEEP_WINDOWS))]
+            weeks = WEEK_PATTERNS[rng.choice(len(WEEK_PATTERNS), p=pattern_weights)][0]
+            for day in sorted(days):
+                weekday = 'Holiday' if day == 6 and rng.random() < 0.1 else RAW_WEEKDAYS[day]
+                rows.append({
+                    'cnn': block.cnn,
+                    'corridor': block.corridor,
+                    'limits': block.limits,
+                    'cnnrightleft': side_code,
+                    'blockside': side_name,
+                    'fullname': weekday,
+                    'weekday': weekday,
+                    'fromhour': from_hour,
+                    'tohour': to_hour,
+                    'week1': weeks[0], 'week2': weeks[1], 'week3': weeks[2], 'week4': weeks[3], 'week5': weeks[4],
+                    'holidays': 1 if weekday == 'Holiday' else 0,
+                    'blocksweepid': 1000000 + len(rows),
+                    'line': block.line,
+                    '_block': block.Index
+                })
+
+    schedules = pd.DataFrame(rows)
+    if len(schedules) > target_rows:
+        schedules = schedules.iloc[rng.permutation(len(schedules))[:target_rows]].sort_index()
+    return schedules.reset_index(drop=True)
+
+def generate_citations(blocks: pd.DataFrame, schedules: pd.DataFrame, count: int,
+                       rng: np.random.Generator, on_schedule_share: float = 0.85) -> pd.DataFrame:
+    """Citations beside scheduled blocks, with both raw (address/time) and geocoded (lat/lon) columns"""
+    # Busy blocks get many more citations than quiet ones
+    popularity = rng.lognormal(0, 1, len(schedules))
+    picks = rng.choice(len(schedules), size=count, p=popularity / popularity.sum())
+    chosen = schedules.iloc[picks]
+    block_rows = blocks.loc[chosen['_block'].to_numpy()]
+
+    # Position along the block, pushed to the scheduled side; geocoder error runs mostly along the street
+    t = rng.uniform(0.05, 0.95, count)
+    start_lat, start_lon = block_rows['start_lat'].to_numpy(), block_rows['start_lon'].to_numpy()
+    end_lat, end_lon = block_rows['end_lat'].to_numpy(), block_rows['end_lon'].to_numpy()
+    is_left = (chosen['cnnrightleft'] == 'L').to_numpy()
+    dx = (end_lon - start_lon) * METERS_PER_DEGREE_LON
+    dy = (end_lat - start_lat) * METERS_PER_DEGREE_LAT
+    length = np.hypot(dx, dy)
+    offset = rng.uniform(4, 12, count) * np.where(is_left, 1, -1)
+    along = rng.normal(0, 8, count)
+    latitude = start_lat + t * (end_lat - start_lat) + \
+        ((offset * dx + along * dy) / length + rng.normal(0, 1, count)) / METERS_PER_DEGREE_LAT
+    longitude = start_lon + t * (end_lon - start_lon) + \
+        ((-offset * dy + along * dx) / length + rng.normal(0, 1, count)) / METERS_PER_DEGREE_LON
+
+    # Odd numbers on the left, even on the right
+    numbers = block_rows['block_number'].to_numpy() * 100 + np.clip((t * 98).astype(int), 1, 97)
+    numbers = numbers - (numbers % 2) + np.where(is_left, 1, 0)
+    address_names = block_rows['address_name'].to_numpy()
+    addresses = [f"{number} {name}" for number, name in zip(numbers, address_names)]
+
+    # Timestamps on the scheduled weekday; on-schedule ones in a swept week of the month and inside the window
+    on_schedule = rng.random(count) < on_schedule_share
+    day_index = chosen['weekday'].map({day: i for i, day in enumerate(RAW_WEEKDAYS)}).fillna(6).astype(int).to_numpy()
+    swept_weeks = chosen[[f'week{w}' for w in range(1, 6)]].to_numpy().astype(bool)
+    weeks_back = rng.integers(0, 52, count)
+    for _ in range(10):
+        days_back = weeks_back * 7 + (REFERENCE_DATE.dayofweek - day_index) % 7
+        week_of_month = ((REFERENCE_DATE - pd.to_timedelta(days_back, unit='D')).day.to_numpy() - 1) // 7
+        redraw = on_schedule & ~swept_weeks[np.arange(count), week_of_month]
+        if not redraw.any():
+            break
+        weeks_back[redraw] = rng.integers(0, 52, redraw.sum())
+    from_hour = chosen['fromhour'].to_numpy().astype(float)
+    window = (chosen['tohour'].to_numpy() - from_hour) % 24
+    hours = np.where(on_schedule,
+                     from_hour + rng.uniform(0, 1, count) * window,
+                     rng.uniform(0, 24, count)) % 24
+    issued = REFERENCE_DATE - pd.to_timedelta(days_back, unit='D') + pd.to_timedelta(np.round(hours * 60), unit='m')
+    issued_text = pd.Series(issued).dt.strftime('%Y-%m-%dT%H:%M:%S.000').to_numpy()
+
+    # Geocoder sometimes returns a nearby number instead of the exact one
+    returned_numbers = np.where(rng.random(count) < 0.1, numbers + rng.integers(2, 20, count) * 2, numbers)
+    returned = [f"{number} {name}, SAN FRANCISCO, CA, 94110" for number, name in zip(returned_numbers, address_names)]
+    exact = returned_numbers == numbers
+
+    return pd.DataFrame({
+        'citation_number': 900000000 + np.arange(count),
+        'citation_location': addresses,
+        'citation_issued_datetime': issued_text,
+        'latitude': np.round(latitude, 12),
+        'longitude': np.round(longitude, 12),
+        'returned_address': returned,
+        'confidence': np.where(exact, 'HIGH', 'MEDIUM'),
+        'confidence_score': np.where(exact, 100, 50),
+        'schedule_block': chosen['cnn'].to_numpy()
+    })
+
+def generate_dataset(citations: int, schedules: int, seed: int = 42):
+    """Raw schedules, raw citations and geocoded citations for the given scale"""
+    rng = np.random.default_rng(seed)
+    blocks = generate_blocks(grid_size_for(schedules), rng)
+    schedule_df = generate_schedules(blocks, schedules, rng)
+    citation_df = generate_citations(blocks, schedule_df, citations, rng)
+
+    raw_citations = citation_df[['citation_number', 'citation_location', 'citation_issued_datetime']].copy()
+    raw_citations['violation_desc'] = 'STR CLEAN'
+    geocoded = pd.DataFrame({
+        'citation_id': citation_df['citation_number'],
+        'address': citation_df['citation_location'],
+        'datetime': citation_df['citation_issued_datetime'],
+        'latitude': citation_df['latitude'],
+        'longitude': citation_df['longitude'],
+        'returned_address': citation_df['returned_address'],
+        'confidence': citation_df['confidence'],
+        'confidence_score': citation_df['confidence_score'],
+        'geocoding_status': 'SUCCESS'
+    })
+    return schedule_df.drop(columns=['_block']), raw_citations, geocoded
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate deterministic SF-like schedules and citations')
+    parser.add_argument('--citations', type=int, default=100000, help='Number of citations (default: 100000)')
+    parser.add_argument('--schedules', type=int, default=37000, help='Approximate raw schedule rows (default: 37000)')
+    parser.add_argument('--seed', type=int, default=42, help='Random seed (default: 42)')
+    parser.add_argument('--output-dir', required=True, help='Directory for the generated CSV files')
+    args = parser.parse_args()
+
+    output_dir = Path(args.output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    schedules, raw_citations, geocoded = generate_dataset(args.citations, args.schedules, args.seed)
+
+    schedules.to_csv(output_dir / 'synthetic_schedules_raw.csv', index=False)
+    raw_citations.to_csv(output_dir / 'synthetic_citations_raw.csv', index=False)
+    geocoded.to_csv(output_dir / 'synthetic_citations_geocoded.csv', index=False)
+    print(f"Wrote {len(schedules):,} schedules and {len(geocoded):,} citations to {output_dir}")
+
+if __name__ == "__main__":
+    main()
@@ -9,21 +9,37 @@ Input:
 - final_analysis_*_matches_*.csv (raw citation matches)
 - day_specific_sweeper_estimates_*.csv (schedule definitions)
 Output: app_ready_aggregated_*.csv with proper statistics
+
+Geometry is written as the GeoJSON `line` column by default (the 25-column
+format the iOS app parses). `--geometry-encoding polyline` instead writes a
+simplified, fixed-point `line_polyline` column and a size/error report.
 """
 
 import pandas as pd
 import numpy as np
 import argparse
+import json
 import logging
 from pathlib import Path
 from datetime import datetime
 from collections import defaultdict
 
+from data_loader import read_table
+from geo_utils import (parse_linestring, simplify_line, encode_polyline, decode_polyline,
+                       max_deviation_meters, SF_ORIGIN)
+
+# Schedule columns used for grouping and app output
+SCHEDULE_COLUMNS = ['schedule_id', 'cnn', 'corridor', 'limits', 'cnn_right_left', 'block_side', 'weekday',
+                    'scheduled_from_hour', 'scheduled_to_hour', 'week1', 'week2', 'week3', 'week4', 'week5', 'line']
+
 class MatchBasedAggregator:
-    def __init__(self, matches_file: str, schedules_file: str, output_file: str = None):
+    def __init__(self, matches_file: str, schedules_file: str, output_file: str = None,
+                 geometry_encoding: str = 'geojson', simplify_tolerance: float = 1.0):
         self.matches_file = Path(matches_file)
         self.schedules_file = Path(schedules_file)
         self.output_file = output_file or self.matches_file.parent / f"app_ready_aggregated_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
+        self.geometry_encoding = geometry_encoding
+        self.simplify_tolerance = simplify_tolerance
         
         # Set up logging
         logging.basicConfig(
@@ -168,8 +184,8 @@ class MatchBasedAggregator:
         self.logger.info(f"Loading schedule definitions from: {self.schedules_file}")
         
         # Load the data
-        matches_df = pd.read_csv(self.matches_file)
-        schedules_df = pd.read_csv(self.schedules_file)
+        matches_df = read_table(self.matches_file, 'matches', ['schedule_id', 'citation_time'])
+        schedules_df = read_table(self.schedules_file, 'estimates', SCHEDULE_COLUMNS)
         
         self.logger.info(f"Loaded {len(matches_df):,} citation matches")
         self.logger.info(f"Loaded {len(schedules_df):,} schedule definitions")
@@ -448,6 +464,9 @@ class MatchBasedAggregator:
         # Sort by CNN, side, and week pattern
         result_df = result_df.sort_values(['cnn', 'cnn_right_left', 'clean_id'])
         
+        if self.geometry_encoding == 'polyline':
+            result_df = self.encode_geometry(result_df)
+        
         # Save results
         result_df.to_csv(self.output_file, index=False)
         
@@ -461,6 +480,74 @@ class MatchBasedAggregator:
         
         return result_df
     
+    def encode_geometry(self, result_df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Replace the GeoJSON `line` column with a simplified, quantized `line_polyline`
+        and report the size saved and the geometric error introduced
+        """
+        self.logger.info(f"📐 Encoding geometry as polyline (simplify tolerance {self.simplify_tolerance}m)")
+        
+        encoded_lines = []
+        errors = []
+        vertices_before = 0
+        vertices_after = 0
+        unparsed = 0
+        
+        for line in result_df['line']:
+            coordinates = parse_linestring(line)
+            if not coordinates:
+                encoded_lines.append('')
+                unparsed += 1
+                continue
+            
+            simplified = simplify_line(coordinates, self.simplify_tolerance)
+            encoded = encode_polyline(simplified)
+            encoded_lines.append(encoded)
+            
+            vertices_before += len(coordinates)
+            vertices_after += len(simplified)
+            # Measure against what the app will actually decode, so quantization is included
+            errors.append(max_deviation_meters(coordinates, decode_polyline(encoded)))
+        
+        geojson_bytes = int(result_df['line'].astype(str).str.len().sum())
+        polyline_bytes = sum(len(encoded) for encoded in encoded_lines)
+        csv_bytes_before = len(result_df.to_csv(index=False).encode())
+        
+        line_position = list(result_df.columns).index('line')
+        result_df = result_df.drop(columns=['line'])
+        result_df.insert(line_position, 'line_polyline', encoded_lines)
+        csv_bytes_after = len(result_df.to_csv(index=False).encode())
+        
+        report = {
+            'encoding': 'polyline',
+            'precision': 6,
+            'origin': list(SF_ORIGIN),
+            'simplify_tolerance_meters': self.simplify_tolerance,
+            'rows': len(result_df),
+            'unparsed_rows': unparsed,
+            'vertices_before': vertices_before,
+            'vertices_after': vertices_after,
+            'geometry_bytes_before': geojson_bytes,
+            'geometry_bytes_after': polyline_bytes,
+            'csv_bytes_before': csv_bytes_before,
+            'csv_bytes_after': csv_bytes_after,
+            'max_error_meters': round(float(np.max(errors)), 3) if errors else 0.0,
+            'p99_error_meters': round(float(np.percentile(errors, 99)), 3) if errors else 0.0
+        }
+        
+        report_file = Path(self.output_file).with_name(f"{Path(self.output_file).stem}_geometry_report.json")
+        with open(report_file, 'w') as f:
+            json.dump(report, f, indent=2)
+        
+        self.logger.info(f"   Vertices: {vertices_before:,} → {vertices_after:,}")
+        self.logger.info(f"   Geometry bytes: {geojson_bytes:,} → {polyline_bytes:,}")
+        self.logger.info(f"   CSV bytes: {csv_bytes_before:,} → {csv_bytes_after:,} "
+                         f"({(1 - csv_bytes_after / max(csv_bytes_before, 1)) * 100:.1f}% smaller)")
+        self.logger.info(f"   Error: max {report['max_error_meters']}m, p99 {report['p99_error_meters']}m")
+        self.logger.info(f"   Report saved to: {report_file}")
+        
+        return result_df
+    
     def generate_summary_stats(self, result_df: pd.DataFrame):
         """Generate summary statistics"""
         self.logger.info("\n📊 Aggregation Summary:")
@@ -484,11 +571,16 @@ def main():
     parser.add_argument('--matches', required=True, help='Input matches CSV file')
     parser.add_argument('--schedules', required=True, help='Input schedules CSV file')
     parser.add_argument('--output', help='Output aggregated CSV file')
+    parser.add_argument('--geometry-encoding', choices=['geojson', 'polyline'], default='geojson',
+                        help='Geometry column format: GeoJSON `line` (default, current app format) or compact `line_polyline`')
+    parser.add_argument('--simplify-tolerance', type=float, default=1.0,
+                        help='Douglas-Peucker tolerance in meters for polyline encoding, 0 to disable (default: 1.0)')
     
     args = parser.parse_args()
     
     # Run aggregation
-    aggregator = MatchBasedAggregator(args.matches, args.schedules, args.output)
+    aggregator = MatchBasedAggregator(args.matches, args.schedules, args.output,
+                                      args.geometry_encoding, args.simplify_tolerance)
     aggregator.aggregate_from_matches()
 
 if __name__ == "__main__":
@@ -13,6 +13,8 @@ import argparse
 from datetime import datetime
 from pathlib import Path
 
+from data_loader import read_table
+
 class DaySpecificScheduleDataCleaner:
     def __init__(self, input_file_path, output_dir=None):
         self.input_file = input_file_path
@@ -24,7 +26,7 @@ class DaySpecificScheduleDataCleaner:
     def load_data(self):
         """Load the original schedule data"""
         print("📂 Loading schedule data...")
-        self.df = pd.read_csv(self.input_file)
+        self.df = read_table(self.input_file, 'schedule_raw')
         print(f"✅ Loaded {len(self.df):,} records")
         
     def clean_schedule_data_day_specific(self):
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Typed CSV Loading for Pipeline Stages
+
+One declared schema per pipeline table, so every stage reads its inputs the
+same way instead of letting bare `pd.read_csv` infer them:
+- repeated strings (street names, limits, sides, weekdays, geometry) are categorical
+- hours, week flags and scores use small integer types
+- datetimes are parsed once, at load
+- `columns` projects to the columns a stage actually uses (usecols)
+
+Columns a schema doesn't list are still read with inferred types, and
+requested columns missing from a file (e.g. optional week5) are skipped.
+
+Usage:
+python3 data_loader.py --table citations_geocoded citations_geocoded.csv
+"""
+
+import argparse
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+CATEGORY = 'category'
+DATETIME = 'datetime'
+
+WEEK_FLAGS = {f'week{w}': 'int8' for w in range(1, 6)}
+
+SCHEMAS: Dict[str, Dict[str, str]] = {
+    # SF Open Data schedule records (the cleaner parses hours itself, so they stay lenient floats)
+    'schedule_raw': {
+        'cnn': 'int32', 'corridor': CATEGORY, 'limits': CATEGORY, 'cnnrightleft': CATEGORY,
+        'blockside': CATEGORY, 'fullname': CATEGORY, 'weekday': CATEGORY,
+        'fromhour': 'float32', 'tohour': 'float32', **WEEK_FLAGS, 'holidays': 'int8',
+        'blocksweepid': 'int32', 'line': CATEGORY
+    },
+    'schedule_clean': {
+        'schedule_id': 'int32', 'cnn': 'int32', 'corridor': CATEGORY, 'limits': CATEGORY,
+        'cnn_right_left': CATEGORY, 'block_side': CATEGORY, 'full_name': CATEGORY, 'weekday': CATEGORY,
+        'scheduled_from_hour': 'int8', 'scheduled_to_hour': 'int8', **WEEK_FLAGS, 'holidays': 'int8',
+        'record_count': 'int16', 'line': CATEGORY
+    },
+    # SF Open Data citations (only the columns the pipeline uses are declared)
+    'citations_raw': {
+        'citation_location': CATEGORY, 'citation_issued_datetime': DATETIME, 'violation': CATEGORY,
+        'violation_desc': CATEGORY, 'vehicle_plate_state': CATEGORY, 'suspend_code': CATEGORY,
+        'suspend_process_date': DATETIME, 'suspend_until_date': DATETIME, 'disposition_code': CATEGORY
+    },
+    'citations_geocoded': {
+        'address': CATEGORY, 'datetime': DATETIME, 'latitude': 'float64', 'longitude': 'float64',
+        'returned_address': CATEGORY, 'confidence': CATEGORY, 'confidence_score': 'int8',
+        'geocoding_status': CATEGORY
+    },
+    'matches': {
+        # Fact table columns (citation_id is left to inference, as in the other citation tables)
+        'schedule_id': 'int32', 'distance_meters': 'float32', 'citation_time': 'float32',
+        # Schedule columns repeated on each row only by --denormalized-matches exports
+        'cnn': 'int32', 'corridor': CATEGORY, 'limits': CATEGORY, 'cnn_right_left': CATEGORY,
+        'block_side': CATEGORY, 'weekday': CATEGORY, 'scheduled_from_hour': 'int8', 'scheduled_to_hour': 'int8'
+    },
+    'estimates': {
+        'schedule_id': 'int32', 'cnn': 'int32', 'corridor': CATEGORY, 'limits': CATEGORY,
+        'cnn_right_left': CATEGORY, 'block_side': CATEGORY, 'weekday': CATEGORY,
+        'scheduled_from_hour': 'int8', 'scheduled_to_hour': 'int8', **WEEK_FLAGS,
+        'line': CATEGORY, 'citation_count': 'int32'
+    },
+    'app_aggregated': {
+        'cnn': 'int32', 'corridor': CATEGORY, 'limits': CATEGORY, 'cnn_right_left': CATEGORY,
+        'block_side': CATEGORY, 'schedule_summary': CATEGORY, 'total_weekly_hours': 'int16', **WEEK_FLAGS,
+        'citation_count': 'int32', 'line': CATEGORY
+    }
+}
+
+def read_table(path, table: str, columns: Optional[List[str]] = None, parse_dates: bool = True) -> pd.DataFrame:
+    """Read a pipeline CSV with its declared dtypes, projected to `columns` (file order if None).
+    parse_dates=False leaves datetime columns as the original strings (for stages that only pass them through)."""
+    schema = SCHEMAS[table]
+    header = list(pd.read_csv(path, nrows=0).columns)
+    usecols = [column for column in (columns or header) if column in header]
+    datetimes = [column for column in usecols if schema.get(column) == DATETIME]
+    categoricals = [column for column in usecols if schema.get(column) == CATEGORY]
+    dtypes = {column: schema[column] for column in usecols
+              if column in schema and column not in datetimes and column not in categoricals}
+
+    df = pd.read_csv(path, usecols=usecols, dtype=dtypes)
+    for column in categoricals:
+        # Categories in first-seen order: dtype='category' sorts every distinct string, ~2x slower to load
+        codes, categories = pd.factorize(df[column])
+        df[column] = pd.Categorical.from_codes(codes, categories)
+    if parse_dates:
+        for column in datetimes:
+            # Unparseable values become NaT rather than failing the whole load
+            df[column] = pd.to_datetime(df[column], format='ISO8601', errors='coerce')
+    return df[usecols]
+
+def frame_memory_mb(df: pd.DataFrame) -> float:
+    """In-memory size including string/object contents"""
+    return df.memory_usage(deep=True).sum() / 1024 / 1024
+
+def compare_memory(path, table: str) -> Dict:
+    """Memory of a bare pd.read_csv load vs the typed load of the same file"""
+    bare = frame_memory_mb(pd.read_csv(path))
+    typed = frame_memory_mb(read_table(path, table))
+    return {'table': table, 'file_mb': round(Path(path).stat().st_size / 1024 / 1024, 1),
+            'bare_mb': round(bare, 1), 'typed_mb': round(typed, 1), 'ratio': round(bare / typed, 2) if typed else None}
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare bare vs typed memory footprint of pipeline CSVs')
+    parser.add_argument('--table', choices=list(SCHEMAS), required=True, help='Schema to load the files with')
+    parser.add_argument('files', nargs='+', help='CSV files')
+
+    args = parser.parse_args()
+
+    for path in args.files:
+        result = compare_memory(path, args.table)
+        print(f"📦 {Path(path).name}: {result['file_mb']} MB on disk, "
+              f"{result['bare_mb']} MB bare → {result['typed_mb']} MB typed ({result['ratio']}x smaller)")
+
+if __name__ == "__main__":
+    main()
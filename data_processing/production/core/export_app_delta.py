@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Delta Export Between Pipeline Runs
+
+Compares a new app_ready_schedules_*.csv with the previous run's output by
+`clean_id` and row content hash, and writes only what changed so app data
+updates scale with the amount of change instead of the size of the city.
+
+Output:
+- app_data_delta_<base>_to_<version>.csv - added/changed rows (full columns) and removed clean_ids, tagged by `op`
+- app_data_manifest.json - version, base version, counts, dataset hash and (optionally) the geohash tiles touched
+
+Usage:
+python3 export_app_delta.py --new app_ready_schedules_NEW.csv --previous app_ready_schedules_OLD.csv --output-dir .
+python3 export_app_delta.py --new app_ready_schedules_NEW.csv --output-dir .   # first run: everything is "add"
+"""
+
+import pandas as pd
+import argparse
+import hashlib
+import json
+import logging
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Optional
+
+from geo_utils import parse_geometry_column, line_bounds, geohash_encode
+
+KEY_COLUMN = 'clean_id'
+
+class AppDataDeltaExporter:
+    def __init__(self, new_file: str, previous_file: Optional[str], output_dir: str,
+                 version: str = None, base_version: str = None, tile_precision: int = 0):
+        self.new_file = Path(new_file)
+        self.previous_file = Path(previous_file) if previous_file else None
+        self.output_dir = Path(output_dir)
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        self.version = version or datetime.now().strftime('%Y%m%d_%H%M%S')
+        self.base_version = base_version
+        self.tile_precision = tile_precision
+        self.manifest_file = self.output_dir / 'app_data_manifest.json'
+
+        logging.basicConfig(
+            level=logging.INFO,
+            format='%(asctime)s - %(levelname)s - %(message)s'
+        )
+        self.logger = logging.getLogger(__name__)
+
+    def load_rows(self, csv_file: Path) -> pd.DataFrame:
+        """Load an app-ready CSV as strings, keyed by clean_id, with a content hash per row"""
+        df = pd.read_csv(csv_file, dtype=str, keep_default_na=False)
+
+        duplicates = df[KEY_COLUMN].duplicated(keep='last')
+        if duplicates.any():
+            self.logger.warning(f"   {duplicates.sum()} duplicate {KEY_COLUMN} values in {csv_file.name}, keeping last")
+            df = df[~duplicates]
+
+        columns = sorted(c for c in df.columns if c != KEY_COLUMN)
+        df['_row_hash'] = [
+            hashlib.sha1('\x1f'.join(values).encode()).hexdigest()[:16]
+            for values in df[columns].itertuples(index=False, name=None)
+        ]
+        return df.set_index(KEY_COLUMN, drop=False)
+
+    def tiles_of(self, df: pd.DataFrame, clean_ids) -> set:
+        """Geohash tiles the given rows land in (same rule as export_app_tiles.py)"""
+        tiles = set()
+        for coordinates in parse_geometry_column(df.loc[list(clean_ids)]):
+            if not coordinates:
+                tiles.add('unlocated')
+                continue
+            min_lat, min_lon, max_lat, max_lon = line_bounds(coordinates)
+            tiles.add(geohash_encode((min_lat + max_lat) / 2, (min_lon + max_lon) / 2, self.tile_precision))
+        return tiles
+
+    def export_delta(self) -> Dict:
+        """Diff the two runs and write the delta file plus version manifest"""
+        self.logger.info(f"🔀 Computing app data delta for {self.new_file.name}")
+
+        new_df = self.load_rows(self.new_file)
+        if self.previous_file and self.previous_file.exists():
+            self.logger.info(f"   Previous run: {self.previous_file}")
+            previous_df = self.load_rows(self.previous_file)
+        else:
+            self.logger.info("   No previous run found - delta contains every row")
+            previous_df = new_df.iloc[0:0]
+            self.base_version = None
+
+        new_ids = set(new_df.index)
+        previous_ids = set(previous_df.index)
+        common_ids = new_ids & previous_ids
+
+        added_ids = sorted(new_ids - previous_ids)
+        removed_ids = sorted(previous_ids - new_ids)
+        changed_ids = sorted(
+            clean_id for clean_id in common_ids
+            if new_df.at[clean_id, '_row_hash'] != previous_df.at[clean_id, '_row_hash']
+        )
+
+        columns = [c for c in new_df.columns if c != '_row_hash']
+        delta_df = pd.concat([
+            new_df.loc[added_ids, columns].assign(op='add'),
+            new_df.loc[changed_ids, columns].assign(op='change'),
+            pd.DataFrame({KEY_COLUMN: removed_ids}, columns=columns).assign(op='remove')
+        ], ignore_index=True)[['op'] + columns]
+
+        delta_file = self.output_dir / f"app_data_delta_{self.base_version or 'initial'}_to_{self.version}.csv"
+        delta_df.to_csv(delta_file, index=False)
+
+        # Dataset hash is order independent so clients can verify a patched copy
+        dataset_hash = hashlib.sha256(
+            '\n'.join(f"{clean_id}:{row_hash}" for clean_id, row_hash in sorted(new_df['_row_hash'].items())).encode()
+        ).hexdigest()
+
+        manifest = {
+            'version': self.version,
+            'base_version': self.base_version,
+            'full_file': self.new_file.name,
+            'full_bytes': self.new_file.stat().st_size,
+            'row_count': len(new_df),
+            'dataset_sha256': dataset_hash,
+            'delta_file': delta_file.name,
+            'delta_bytes': delta_file.stat().st_size,
+            'changes': {
+                'added': len(added_ids),
+                'changed': len(changed_ids),
+                'removed': len(removed_ids),
+                'unchanged': len(common_ids) - len(changed_ids)
+            }
+        }
+
+        if self.tile_precision:
+            touched = self.tiles_of(new_df, added_ids + changed_ids) | self.tiles_of(previous_df, changed_ids + removed_ids)
+            manifest['tile_precision'] = self.tile_precision
+            manifest['changed_tiles'] = sorted(touched)
+
+        with open(self.manifest_file, 'w') as f:
+            json.dump(manifest, f, indent=2)
+
+        changes = manifest['changes']
+        ratio = manifest['delta_bytes'] / manifest['full_bytes'] * 100 if manifest['full_bytes'] else 0
+        self.logger.info(f"✅ Delta {self.base_version or 'initial'} → {self.version}: "
+                         f"+{changes['added']:,} ~{changes['changed']:,} -{changes['removed']:,} "
+                         f"({changes['unchanged']:,} unchanged)")
+        self.logger.info(f"   Delta size: {manifest['delta_bytes']:,} bytes ({ratio:.1f}% of full file)")
+        if self.tile_precision:
+            self.logger.info(f"   Tiles to reload: {len(manifest['changed_tiles'])}")
+        self.logger.info(f"📄 Manifest saved to {self.manifest_file}")
+
+        return manifest
+
+def main():
+    parser = argparse.ArgumentParser(description='Export the change set between two app-ready schedule files')
+    parser.add_argument('--new', required=True, help='New app_ready_schedules CSV file')
+    parser.add_argument('--previous', help='Previous run app_ready_schedules CSV file (omit for the first run)')
+    parser.add_argument('--output-dir', required=True, help='Output directory for the delta and manifest')
+    parser.add_argument('--version', help='Version label of the new data (default: current timestamp)')
+    parser.add_argument('--base-version', help='Version label of the previous data')
+    parser.add_argument('--tile-precision', type=int, default=0,
+                        help='List geohash tiles touched by the delta at this precision (default: off)')
+
+    args = parser.parse_args()
+
+    exporter = AppDataDeltaExporter(args.new, args.previous, args.output_dir,
+                                    args.version, args.base_version, args.tile_precision)
+    exporter.export_delta()
+
+if __name__ == "__main__":
+    main()
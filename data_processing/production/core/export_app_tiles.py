@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+Geohash-Tiled Export of App-Ready Schedules
+
+Partitions the monolithic app_ready_schedules_*.csv into one small CSV per
+geohash cell plus a manifest, so the app can load only the tiles around the
+user instead of parsing the whole city at launch.
+
+Input: app_ready_schedules_*.csv (from aggregate_schedules_from_matches.py)
+Output:
+- tiles/<geohash>.csv - same columns as the monolithic file
+- app_tiles_manifest.json - per-tile bounds, row counts, byte sizes and SHA-256 hashes
+
+Usage:
+python3 export_app_tiles.py --input app_ready_schedules_TIMESTAMP.csv --output-dir app_tiles/
+python3 export_app_tiles.py --input app_ready_schedules_TIMESTAMP.csv --output-dir app_tiles/ --benchmark
+"""
+
+import pandas as pd
+import argparse
+import hashlib
+import json
+import logging
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List
+
+from geo_utils import parse_geometry_column, line_bounds, geohash_encode, geohash_bounds, geohash_neighborhood
+
+UNLOCATED_TILE = 'unlocated'
+
+class AppTileExporter:
+    def __init__(self, input_file: str, output_dir: str, precision: int = 6):
+        self.input_file = Path(input_file)
+        self.output_dir = Path(output_dir)
+        self.tiles_dir = self.output_dir / 'tiles'
+        self.manifest_file = self.output_dir / 'app_tiles_manifest.json'
+        self.precision = precision
+
+        logging.basicConfig(
+            level=logging.INFO,
+            format='%(asctime)s - %(levelname)s - %(message)s'
+        )
+        self.logger = logging.getLogger(__name__)
+
+    def assign_tiles(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Assign each row to the geohash cell containing the center of its line's bounding box"""
+        tile_ids = []
+        data_bounds = []
+
+        for coordinates in parse_geometry_column(df):
+            if not coordinates:
+                tile_ids.append(UNLOCATED_TILE)
+                data_bounds.append(None)
+                continue
+
+            min_lat, min_lon, max_lat, max_lon = line_bounds(coordinates)
+            tile_ids.append(geohash_encode((min_lat + max_lat) / 2, (min_lon + max_lon) / 2, self.precision))
+            data_bounds.append((min_lat, min_lon, max_lat, max_lon))
+
+        return df.assign(_tile=tile_ids, _bounds=data_bounds)
+
+    def export_tiles(self) -> Dict:
+        """Write one CSV per tile and the manifest describing them"""
+        self.logger.info(f"🗺️  Tiling {self.input_file} at geohash precision {self.precision}")
+
+        df = pd.read_csv(self.input_file, dtype=str, keep_default_na=False)
+        columns = list(df.columns)
+        tiled = self.assign_tiles(df)
+
+        self.tiles_dir.mkdir(parents=True, exist_ok=True)
+        for stale_tile in self.tiles_dir.glob('*.csv'):
+            stale_tile.unlink()
+
+        tiles = {}
+        for tile_id, group in tiled.groupby('_tile', sort=True):
+            tile_file = self.tiles_dir / f"{tile_id}.csv"
+            group[columns].to_csv(tile_file, index=False)
+            content = tile_file.read_bytes()
+
+            row_bounds = [bounds for bounds in group['_bounds'] if bounds]
+            tiles[tile_id] = {
+                'file': str(tile_file.relative_to(self.output_dir)),
+                'rows': len(group),
+                'bytes': len(content),
+                'sha256': hashlib.sha256(content).hexdigest(),
+                # Cell bounds decide membership; data bounds cover lines that cross the cell edge
+                'bounds': list(geohash_bounds(tile_id)) if tile_id != UNLOCATED_TILE else None,
+                'data_bounds': [
+                    min(b[0] for b in row_bounds), min(b[1] for b in row_bounds),
+                    max(b[2] for b in row_bounds), max(b[3] for b in row_bounds)
+                ] if row_bounds else None
+            }
+
+        manifest = {
+            'version': datetime.now().strftime('%Y%m%d_%H%M%S'),
+            'source_file': self.input_file.name,
+            'source_sha256': hashlib.sha256(self.input_file.read_bytes()).hexdigest(),
+            'tiling': 'geohash',
+            'precision': self.precision,
+            'columns': columns,
+            'row_count': len(df),
+            'tile_count': len(tiles),
+            'total_bytes': sum(tile['bytes'] for tile in tiles.values()),
+            'tiles': tiles
+        }
+
+        with open(self.manifest_file, 'w') as f:
+            json.dump(manifest, f, indent=2)
+
+        rows_per_tile = [tile['rows'] for tile in tiles.values()]
+        self.logger.info(f"✅ Wrote {len(tiles)} tiles ({len(df):,} rows, "
+                         f"avg {len(df) / max(len(tiles), 1):.0f} / max {max(rows_per_tile, default=0)} rows per tile)")
+        self.logger.info(f"📄 Manifest saved to {self.manifest_file}")
+
+        return manifest
+
+    def load_tiles(self, manifest: Dict, tile_ids: List[str]) -> pd.DataFrame:
+        """Load the given tiles (as a client would) and parse their geometry"""
+        frames = [
+            pd.read_csv(self.output_dir / manifest['tiles'][tile_id]['file'])
+            for tile_id in tile_ids if tile_id in manifest['tiles']
+        ]
+        df = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=manifest['columns'])
+        df['parsed_line'] = parse_geometry_column(df)
+        return df
+
+    def benchmark(self, manifest: Dict, lat: float = 37.7749, lon: float = -122.4194, repeats: int = 3) -> Dict:
+        """Compare size and parse time of the monolithic CSV with loading the 3x3 tiles around a point"""
+        def timed(load):
+            best = float('inf')
+            for _ in range(repeats):
+                start = time.perf_counter()
+                rows = len(load())
+                best = min(best, time.perf_counter() - start)
+            return best, rows
+
+        def load_monolithic():
+            df = pd.read_csv(self.input_file)
+            df['parsed_line'] = parse_geometry_column(df)
+            return df
+
+        neighborhood = [tile for tile in geohash_neighborhood(lat, lon, self.precision) if tile in manifest['tiles']]
+
+        monolithic_seconds, monolithic_rows = timed(load_monolithic)
+        local_seconds, local_rows = timed(lambda: self.load_tiles(manifest, neighborhood))
+
+        results = {
+            'point': [lat, lon],
+            'monolithic': {
+                'bytes': self.input_file.stat().st_size,
+                'rows': monolithic_rows,
+                'parse_seconds': round(monolithic_seconds, 4)
+            },
+            'all_tiles': {
+                'tiles': manifest['tile_count'],
+                'bytes': manifest['total_bytes']
+            },
+            'neighborhood_tiles': {
+                'tiles': len(neighborhood),
+                'bytes': sum(manifest['tiles'][tile]['bytes'] for tile in neighborhood),
+                'rows': local_rows,
+                'parse_seconds': round(local_seconds, 4)
+            }
+        }
+
+        self.logger.info("📊 Tile benchmark (best of %d):", repeats)
+        self.logger.info(f"   Monolithic CSV: {results['monolithic']['bytes']:,} bytes, "
+                         f"{monolithic_rows:,} rows, {monolithic_seconds * 1000:.0f} ms")
+        self.logger.info(f"   3x3 tiles around ({lat}, {lon}): {results['neighborhood_tiles']['bytes']:,} bytes, "
+                         f"{local_rows:,} rows, {local_seconds * 1000:.0f} ms")
+        return results
+
+def main():
+    parser = argparse.ArgumentParser(description='Export app-ready schedules as geohash tiles')
+    parser.add_argument('--input', required=True, help='Input app_ready_schedules CSV file')
+    parser.add_argument('--output-dir', required=True, help='Output directory for tiles and manifest')
+    parser.add_argument('--precision', type=int, default=6,
+                        help='Geohash precision (default: 6, ~1.2km x 0.6km cells)')
+    parser.add_argument('--benchmark', action='store_true',
+                        help='Compare size and parse time against the monolithic CSV')
+    parser.add_argument('--lat', type=float, default=37.7749, help='Benchmark point latitude')
+    parser.add_argument('--lon', type=float, default=-122.4194, help='Benchmark point longitude')
+
+    args = parser.parse_args()
+
+    exporter = AppTileExporter(args.input, args.output_dir, args.precision)
+    manifest = exporter.export_tiles()
+
+    if args.benchmark:
+        results = exporter.benchmark(manifest, args.lat, args.lon)
+        benchmark_file = exporter.output_dir / 'app_tiles_benchmark.json'
+        with open(benchmark_file, 'w') as f:
+            json.dump(results, f, indent=2)
+        exporter.logger.info(f"📄 Benchmark saved to {benchmark_file}")
+
+if __name__ == "__main__":
+    main()
@@ -12,6 +12,13 @@ Orchestrates the full end-to-end processing pipeline:
 7. Join citations with schedules and calculate estimated sweeper times
 8. Store final analysis results
 
+Steps run as a stage DAG (stage_dag.py): the schedule steps (1-3) and the
+citation steps (4-6) are independent and run concurrently. Clean, geocode,
+match and aggregate outputs are cached by input content and parameters
+(stage_cache.py), so reruns only recompute stages whose inputs changed.
+Geocoding tries the offline geocoder (offline_geocoder.py), calibrated on
+earlier runs' Census results, before calling the Census API.
+
 This is designed for weekly/monthly refresh of the complete dataset.
 
 Usage:
@@ -24,12 +31,20 @@ import argparse
 import logging
 import json
 import time
+import threading
 from datetime import datetime, timedelta
 from pathlib import Path
-from typing import Dict, List
-import subprocess
+from typing import Callable, Dict, List, Optional
 import sys
 import os
+import shutil
+
+from data_loader import read_table
+from stage_cache import StageCache, file_sha256
+from stage_dag import PipelineStage, StageDAG
+from stage_profiler import StageProfiler, file_bytes
+
+SF_OPEN_DATA_API = "https://data.sfgov.org"
 
 class FullPipelineProcessor:
     def __init__(self, 
@@ -38,30 +53,75 @@ class FullPipelineProcessor:
                  output_dir: str = "../output/pipeline_results", 
                  rate_limit: float = 0.01,
                  batch_size: int = 5000,
-                 skip_geocoding: bool = False):
+                 skip_geocoding: bool = False,
+                 tile_precision: int = 6,
+                 previous_run_dir: str = None,
+                 geometry_encoding: str = 'geojson',
+                 simplify_tolerance: float = 1.0,
+                 profile: bool = False,
+                 max_parallel_stages: int = 4,
+                 max_distance: int = 200,
+                 grid_size: float = 100,
+                 cache_dir: str = None,
+                 use_cache: bool = True,
+                 resume_dir: str = None,
+                 offline_geocoding: bool = True,
+                 api_base: str = SF_OPEN_DATA_API):
         
         self.days_back = days_back
         self.workers = workers
         self.skip_geocoding = skip_geocoding
         self.rate_limit = rate_limit
         self.batch_size = batch_size
+        self.tile_precision = tile_precision
+        self.previous_run_dir = Path(previous_run_dir) if previous_run_dir else None
+        self.geometry_encoding = geometry_encoding
+        self.simplify_tolerance = simplify_tolerance
+        self.max_parallel_stages = max_parallel_stages
+        self.max_distance = max_distance
+        self.grid_size = grid_size
+        self.offline_geocoding = offline_geocoding
+        self.api_base = api_base.rstrip('/')
         
-        # File paths for pipeline stages
-        self.timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        self.output_dir = Path(output_dir) / self.timestamp
+        # File paths for pipeline stages (a resumed run keeps its directory and timestamp)
+        if resume_dir:
+            self.output_dir = Path(resume_dir)
+            if not self.output_dir.is_dir():
+                raise FileNotFoundError(f"Run directory to resume not found: {self.output_dir}")
+            self.timestamp = self.output_dir.name
+        else:
+            self.timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+            self.output_dir = Path(output_dir) / self.timestamp
         
         # Create output directory
         self.output_dir.mkdir(parents=True, exist_ok=True)
         
         # Set up logging
         self.setup_logging()
+        
+        # Per-stage timing, memory, I/O and API metrics (plus cProfile dumps with --profile)
+        self.profiler = StageProfiler(self.output_dir, profile=profile, logger=self.logger)
+        
+        # Stage outputs keyed by input content, parameters and code, shared across runs
+        self.cache = StageCache(cache_dir or self.output_dir.parent / "stage_cache", logger=self.logger) if use_cache else None
+        
+        # Completed stages with output checksums, so a failed run can be resumed
+        self.run_manifest_file = self.output_dir / "run_manifest.json"
+        self.run_manifest = self.load_run_manifest() if resume_dir else {'timestamp': self.timestamp, 'stages': {}}
+        self.manifest_lock = threading.Lock()
+        self.resumed_stages = set()
         self.schedule_raw_file = self.output_dir / f"schedule_raw_{self.timestamp}.csv"
         self.schedule_clean_file = self.output_dir / f"schedule_cleaned_{self.timestamp}.csv"
         self.citations_raw_file = self.output_dir / f"citations_raw_{self.timestamp}.csv"
         self.citations_geocoded_file = self.output_dir / f"citations_geocoded_{self.timestamp}.csv"
+        self.geocoding_calibration_file = self.output_dir / f"geocoding_calibration_{self.timestamp}.csv"
         self.final_estimates_file = self.output_dir / f"day_specific_sweeper_estimates_{self.timestamp}.csv"
         self.app_aggregated_file = self.output_dir / f"app_ready_schedules_{self.timestamp}.csv"
         self.pipeline_report_file = self.output_dir / f"pipeline_report_{self.timestamp}.json"
+        self.app_tiles_dir = self.output_dir / "app_tiles"
+        self.app_tiles_manifest_file = self.app_tiles_dir / "app_tiles_manifest.json"
+        self.app_delta_dir = self.output_dir / "app_delta"
+        self.app_delta_manifest_file = self.app_delta_dir / "app_data_manifest.json"
         
     def setup_logging(self):
         """Set up comprehensive logging for the full pipeline"""
@@ -81,7 +141,7 @@ class FullPipelineProcessor:
         """Step 1: Fetch street sweeping schedule data from SF Open Data API"""
         self.logger.info("📅 Step 1: Fetching street sweeping schedule data from SF Open Data API")
         
-        url = "https://data.sfgov.org/resource/yhqp-riqs.json"
+        url = f"{self.api_base}/resource/yhqp-riqs.json"
         
         all_schedules = []
         limit = 50000  # API limit per request
@@ -96,7 +156,9 @@ class FullPipelineProcessor:
             
             try:
                 self.logger.info(f"   Fetching schedule batch at offset {offset}...")
+                request_start = time.perf_counter()
                 response = requests.get(url, params=params, timeout=60)
+                self.profiler.api_call(time.perf_counter() - request_start, response.ok)
                 response.raise_for_status()
                 
                 batch_schedules = response.json()
@@ -142,7 +204,7 @@ class FullPipelineProcessor:
                 '--output-dir', str(self.output_dir)
             ]
             
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=300)
+            result = self.profiler.run(cmd, timeout=300)
             
             if result.returncode != 0:
                 self.logger.error(f"Schedule cleaning failed: {result.stderr}")
@@ -151,7 +213,7 @@ class FullPipelineProcessor:
             self.logger.info("✅ Schedule cleaning completed successfully")
             
             # Load cleaned data
-            cleaned_df = pd.read_csv(self.schedule_clean_file)
+            cleaned_df = read_table(self.schedule_clean_file, 'schedule_clean')
             self.logger.info(f"📊 Cleaned schedule: {len(schedule_df):,} → {len(cleaned_df):,} records")
             
             # Cleanup temporary file
@@ -289,7 +351,7 @@ print(f"Saved cleaned schedule data: {{len(df)}} -> {{len(result_df)}} records")
         
         self.logger.info(f"   Date range: {start_date_str} to {end_date.strftime('%Y-%m-%d')}")
         
-        url = "https://data.sfgov.org/resource/ab4h-6ztd.json"
+        url = f"{self.api_base}/resource/ab4h-6ztd.json"
         
         all_citations = []
         limit = 50000  # API limit per request
@@ -305,7 +367,9 @@ print(f"Saved cleaned schedule data: {{len(df)}} -> {{len(result_df)}} records")
             
             try:
                 self.logger.info(f"   Fetching citation batch at offset {offset}...")
+                request_start = time.perf_counter()
                 response = requests.get(url, params=params, timeout=60)
+                self.profiler.api_call(time.perf_counter() - request_start, response.ok)
                 response.raise_for_status()
                 
                 batch_citations = response.json()
@@ -334,7 +398,7 @@ print(f"Saved cleaned schedule data: {{len(df)}} -> {{len(result_df)}} records")
         
         return df
         
-    def geocode_citations(self, citations_df: pd.DataFrame) -> pd.DataFrame:
+    def geocode_citations(self, citations_df: pd.DataFrame, calibration_file: Path = None) -> pd.DataFrame:
         """Step 4: Geocode all citations using the production citation processor"""
         self.logger.info("📍 Step 4: Geocoding all citations with parallel processing")
         
@@ -344,9 +408,9 @@ print(f"Saved cleaned schedule data: {{len(df)}} -> {{len(result_df)}} records")
             if Path(existing_geocoded_file).exists():
                 self.logger.info(f"   ⚡ --skip-geocoding flag used: Loading existing geocoded data")
                 self.logger.info(f"   📁 Using data from: {existing_geocoded_file}")
-                existing_df = pd.read_csv(existing_geocoded_file)
                 # Copy to our expected output location
-                existing_df.to_csv(self.citations_geocoded_file, index=False)
+                shutil.copy2(existing_geocoded_file, self.citations_geocoded_file)
+                existing_df = read_table(self.citations_geocoded_file, 'citations_geocoded')
                 self.logger.info(f"   ✅ Loaded {len(existing_df):,} pre-geocoded citations")
                 return existing_df
             else:
@@ -405,20 +469,26 @@ print(f"Saved cleaned schedule data: {{len(df)}} -> {{len(result_df)}} records")
                 '--output-dir', str(self.output_dir),
                 '--no-resume'  # Disable SQLite database to avoid concurrency issues
             ]
+            if calibration_file:
+                # Blocks calibrated by earlier Census results are geocoded locally
+                cmd += ['--schedules', str(self.schedule_clean_file), '--calibration', str(calibration_file)]
             
             self.logger.info(f"   Running: {' '.join(cmd)}")
             
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=14400)  # 4 hour timeout
+            result = self.profiler.run(cmd, timeout=14400)  # 4 hour timeout
             
             if result.returncode != 0:
                 self.logger.error(f"Citation geocoding failed: {result.stderr}")
                 raise RuntimeError("Citation geocoding failed")
                 
             self.logger.info("✅ Citation geocoding completed successfully")
+            self.record_geocoding_api_calls()
             
             # Load geocoded results
-            geocoded_df = pd.read_csv(self.citations_geocoded_file)
+            geocoded_df = read_table(self.citations_geocoded_file, 'citations_geocoded')
             self.logger.info(f"📊 Geocoded citations: {len(geocoded_df):,} with confidence filtering")
+            if self.offline_geocoding:
+                self.update_geocoding_calibration(geocoded_df, calibration_file)
             
             # Cleanup temporary file
             os.remove(temp_citations_file)
@@ -431,6 +501,30 @@ print(f"Saved cleaned schedule data: {{len(df)}} -> {{len(result_df)}} records")
                 os.remove(temp_citations_file)
             raise
             
+    def geocoding_calibration_source(self) -> Optional[Path]:
+        """Previous run's accumulated Census geocodes (or its geocoded citations) for offline geocoding"""
+        if not self.offline_geocoding:
+            return None
+        _, calibration_file = self.find_previous_run_file("geocoding_calibration_*.csv", "citations_geocoded_*.csv")
+        return calibration_file
+        
+    def update_geocoding_calibration(self, geocoded_df: pd.DataFrame, previous_file: Path = None):
+        """Carry Census-geocoded addresses forward, so blocks answered offline stay calibrated in later runs"""
+        columns = ['address', 'latitude', 'longitude', 'confidence', 'geocoding_status']
+        frames = [read_table(previous_file, 'citations_geocoded', columns)] if previous_file else []
+        combined = pd.concat(frames + [geocoded_df[columns]], ignore_index=True)
+        calibration = combined[combined['geocoding_status'] == 'SUCCESS'].drop_duplicates('address', keep='last')
+        calibration.to_csv(self.geocoding_calibration_file, index=False)
+        self.logger.info(f"   📏 Offline geocoder calibration: {len(calibration):,} Census-geocoded addresses")
+        
+    def record_geocoding_api_calls(self):
+        """Attribute the geocoder's Census API call stats (from its processing report) to the current stage"""
+        report_files = sorted(self.output_dir.glob("processing_report_*.json"))
+        if not report_files or not self.profiler.current:
+            return
+        with open(report_files[-1]) as f:
+            self.profiler.current.api.merge(json.load(f).get('api_calls'))
+            
     def calculate_sweeper_estimates(self, citations_df: pd.DataFrame, schedule_df: pd.DataFrame) -> pd.DataFrame:
         """Step 5: Join citations with schedules and calculate estimated sweeper times"""
         self.logger.info("🔄 Step 5: Calculating estimated sweeper arrival times")
@@ -452,14 +546,18 @@ print(f"Saved cleaned schedule data: {{len(df)}} -> {{len(result_df)}} records")
                 sys.executable, 'production_hybrid_matcher_day_specific.py',
                 '--citation-file', str(self.citations_geocoded_file),
                 '--schedule-file', str(self.schedule_clean_file),
-                '--max-distance', '200',
+                '--max-distance', str(self.max_distance),
+                '--grid-size', str(self.grid_size),
+                '--checkpoint-dir', str(self.output_dir / "match_checkpoints"),
                 '--output-prefix', str(self.output_dir / f"final_analysis_{self.timestamp}"),
                 '--output-dir', str(self.output_dir)
             ]
+            if self.profiler.profile:
+                cmd.append('--stats')  # Per-step matcher funnel alongside the stage profile
             
             self.logger.info(f"   Running: {' '.join(cmd)}")
             
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=1800)  # 30 minute timeout
+            result = self.profiler.run(cmd, timeout=1800)  # 30 minute timeout
             
             if result.returncode != 0:
                 self.logger.error(f"Schedule matching failed: {result.stderr}")
@@ -472,7 +570,7 @@ print(f"Saved cleaned schedule data: {{len(df)}} -> {{len(result_df)}} records")
             if not estimates_files:
                 raise RuntimeError("Day-specific schedules file not found")
                 
-            estimates_df = pd.read_csv(estimates_files[0])
+            estimates_df = read_table(estimates_files[0], 'estimates')
             
             # Copy to our standardized filename
             estimates_df.to_csv(self.final_estimates_file, index=False)
@@ -506,12 +604,14 @@ print(f"Saved cleaned schedule data: {{len(df)}} -> {{len(result_df)}} records")
                 sys.executable, 'aggregate_schedules_from_matches.py',
                 '--matches', str(matches_file),
                 '--schedules', str(self.final_estimates_file),
-                '--output', str(self.app_aggregated_file)
+                '--output', str(self.app_aggregated_file),
+                '--geometry-encoding', self.geometry_encoding,
+                '--simplify-tolerance', str(self.simplify_tolerance)
             ]
             
             self.logger.info(f"   Running: {' '.join(cmd)}")
             
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=600)  # 10 minute timeout
+            result = self.profiler.run(cmd, timeout=600)  # 10 minute timeout
             
             if result.returncode != 0:
                 self.logger.error(f"App aggregation failed: {result.stderr}")
@@ -520,7 +620,7 @@ print(f"Saved cleaned schedule data: {{len(df)}} -> {{len(result_df)}} records")
             self.logger.info("✅ App aggregation completed successfully")
             
             # Load aggregated results
-            aggregated_df = pd.read_csv(self.app_aggregated_file)
+            aggregated_df = read_table(self.app_aggregated_file, 'app_aggregated')
             self.logger.info(f"📊 Aggregated schedules: {len(aggregated_df):,} app-ready rows")
             
             return aggregated_df
@@ -529,6 +629,95 @@ print(f"Saved cleaned schedule data: {{len(df)}} -> {{len(result_df)}} records")
             self.logger.error(f"Error in app aggregation: {e}")
             raise
             
+    def export_app_tiles(self) -> Dict:
+        """Step 6b: Partition app-ready schedules into geohash tiles with a manifest"""
+        self.logger.info(f"🗺️  Step 6b: Exporting geohash tiles (precision {self.tile_precision})")
+        
+        try:
+            cmd = [
+                sys.executable, 'export_app_tiles.py',
+                '--input', str(self.app_aggregated_file),
+                '--output-dir', str(self.app_tiles_dir),
+                '--precision', str(self.tile_precision)
+            ]
+            
+            self.logger.info(f"   Running: {' '.join(cmd)}")
+            
+            result = self.profiler.run(cmd, timeout=600)  # 10 minute timeout
+            
+            if result.returncode != 0:
+                self.logger.error(f"Tile export failed: {result.stderr}")
+                raise RuntimeError("Tile export failed")
+            
+            with open(self.app_tiles_manifest_file) as f:
+                manifest = json.load(f)
+            self.logger.info(f"📊 Exported {manifest['tile_count']} tiles "
+                             f"({manifest['total_bytes']:,} bytes) to {self.app_tiles_dir}")
+            
+            return manifest
+            
+        except Exception as e:
+            self.logger.error(f"Error in tile export: {e}")
+            raise
+            
+    def find_previous_app_output(self):
+        """Locate the most recent earlier run's app-ready file (or the one given via --previous-run)"""
+        return self.find_previous_run_file("app_ready_schedules_*.csv")
+        
+    def find_previous_run_file(self, *patterns: str):
+        """Most recent earlier run (or --previous-run) with a file matching one of the patterns, in preference order"""
+        if self.previous_run_dir:
+            candidates = [self.previous_run_dir]
+        else:
+            candidates = sorted(
+                (d for d in self.output_dir.parent.iterdir() if d.is_dir() and d.name < self.timestamp),
+                key=lambda d: d.name, reverse=True
+            )
+        
+        for run_dir in candidates:
+            for pattern in patterns:
+                files = sorted(run_dir.glob(pattern))
+                if files:
+                    return run_dir.name, files[-1]
+        return None, None
+        
+    def export_app_delta(self) -> Dict:
+        """Step 6c: Diff app-ready schedules against the previous run"""
+        self.logger.info("🔀 Step 6c: Exporting app data delta against the previous run")
+        
+        base_version, previous_file = self.find_previous_app_output()
+        
+        try:
+            cmd = [
+                sys.executable, 'export_app_delta.py',
+                '--new', str(self.app_aggregated_file),
+                '--output-dir', str(self.app_delta_dir),
+                '--version', self.timestamp,
+                '--tile-precision', str(self.tile_precision)
+            ]
+            if previous_file:
+                cmd += ['--previous', str(previous_file), '--base-version', base_version]
+            
+            self.logger.info(f"   Running: {' '.join(cmd)}")
+            
+            result = self.profiler.run(cmd, timeout=600)  # 10 minute timeout
+            
+            if result.returncode != 0:
+                self.logger.error(f"Delta export failed: {result.stderr}")
+                raise RuntimeError("Delta export failed")
+            
+            with open(self.app_delta_manifest_file) as f:
+                manifest = json.load(f)
+            changes = manifest['changes']
+            self.logger.info(f"📊 Delta vs {manifest['base_version'] or 'nothing'}: +{changes['added']:,} "
+                             f"~{changes['changed']:,} -{changes['removed']:,} ({manifest['delta_bytes']:,} bytes)")
+            
+            return manifest
+            
+        except Exception as e:
+            self.logger.error(f"Error in delta export: {e}")
+            raise
+            
     def generate_pipeline_report(self, 
                                 schedule_raw_count: int,
                                 schedule_clean_count: int,
@@ -537,7 +726,8 @@ print(f"Saved cleaned schedule data: {{len(df)}} -> {{len(result_df)}} records")
                                 estimates_count: int,
                                 app_aggregated_count: int,
                                 start_time: datetime,
-                                end_time: datetime) -> Dict:
+                                end_time: datetime,
+                                dag: StageDAG) -> Dict:
         """Generate comprehensive pipeline report"""
         
         processing_time = end_time - start_time
@@ -580,12 +770,25 @@ print(f"Saved cleaned schedule data: {{len(df)}} -> {{len(result_df)}} records")
                 'geocoded_citation_data': str(self.citations_geocoded_file),
                 'final_estimates': str(self.final_estimates_file),
                 'app_ready_schedules': str(self.app_aggregated_file),
+                'app_tiles_manifest': str(self.app_tiles_manifest_file) if self.tile_precision else None,
+                'app_delta_manifest': str(self.app_delta_manifest_file),
+                'stage_cache': str(self.cache.cache_dir) if self.cache else None,
+                'run_manifest': str(self.run_manifest_file),
                 'pipeline_report': str(self.pipeline_report_file)
             },
             'performance_metrics': {
                 'citations_per_minute': round(citations_raw_count / (processing_time.total_seconds() / 60), 1),
-                'total_api_calls': schedule_raw_count + citations_raw_count + citations_geocoded_count,
-                'estimated_cost_savings': f"${citations_geocoded_count * 0.01:.2f} vs manual processing"
+                'total_api_calls': sum(stage.api.calls for stage in self.profiler.stages.values()),
+                'profiling_enabled': self.profiler.profile,
+                'cached_stages': [name for name, stage in self.profiler.stages.items() if stage.cache == 'hit'],
+                'resumed_stages': sorted(self.resumed_stages)
+            },
+            'stage_metrics': self.profiler.report(),
+            'stage_schedule': {
+                'max_parallel_stages': self.max_parallel_stages,
+                'timeline': dag.timeline,
+                'sum_of_stage_seconds': round(sum(t['end_seconds'] - t['start_seconds'] for t in dag.timeline.values()), 3),
+                'critical_path_seconds': dag.critical_path_seconds()
             }
         }
         
@@ -595,40 +798,270 @@ print(f"Saved cleaned schedule data: {{len(df)}} -> {{len(result_df)}} records")
             
         return report
         
+    def run_fetch_schedules(self) -> Dict:
+        with self.profiler.stage('fetch_schedules') as stage:
+            schedule_raw_df = self.fetch_schedule_data()
+            stage.update(rows_out=len(schedule_raw_df), bytes_written=file_bytes(self.schedule_raw_file))
+        return {'schedule_raw': schedule_raw_df}
+        
+    def stage_params(self, name: str) -> Dict:
+        """Parameters that change a stage's outputs (part of its cache key and resume check)"""
+        return {
+            'fetch_schedules': {'api_base': self.api_base},
+            'fetch_citations': {'days_back': self.days_back, 'api_base': self.api_base},
+            'geocode': {'min_confidence': 'MEDIUM', 'skip_geocoding': self.skip_geocoding,
+                        'offline_geocoding': self.offline_geocoding},
+            'match': {'max_distance': self.max_distance, 'grid_size': self.grid_size},
+            'aggregate': {'geometry_encoding': self.geometry_encoding, 'simplify_tolerance': self.simplify_tolerance},
+            'app_tiles': {'tile_precision': self.tile_precision}
+        }.get(name, {})
+        
+    def stage_output_files(self, name: str) -> Dict[str, Path]:
+        """Files a stage leaves in the run directory, by a run-independent name"""
+        if name == 'match':
+            # The matcher stamps its own file names, so look for them before assuming ours
+            prefix = f"final_analysis_{self.timestamp}"
+            matches_files = sorted(self.output_dir.glob(f"{prefix}_matches_*.csv"))
+            schedules_files = sorted(self.output_dir.glob(f"{prefix}_schedules_*.csv"))
+            return {
+                'matches.csv': matches_files[0] if matches_files else self.output_dir / f"{prefix}_matches_{self.timestamp}.csv",
+                'schedules.csv': schedules_files[0] if schedules_files else self.output_dir / f"{prefix}_schedules_{self.timestamp}.csv",
+                'estimates.csv': self.final_estimates_file,
+                'match_stats.json': self.output_dir / f"{prefix}_match_stats.json"
+            }
+        return {
+            'fetch_schedules': {'schedule_raw.csv': self.schedule_raw_file},
+            'clean_schedules': {'schedule_clean.csv': self.schedule_clean_file},
+            'fetch_citations': {'citations_raw.csv': self.citations_raw_file},
+            'geocode': {
+                'citations_geocoded.csv': self.citations_geocoded_file,
+                'geocoding_calibration.csv': self.geocoding_calibration_file
+            },
+            'aggregate': {
+                'app_ready_schedules.csv': self.app_aggregated_file,
+                'geometry_report.json': self.app_aggregated_file.with_name(f"{self.app_aggregated_file.stem}_geometry_report.json")
+            },
+            'app_tiles': {'app_tiles_manifest.json': self.app_tiles_manifest_file},
+            'app_delta': {'app_data_manifest.json': self.app_delta_manifest_file}
+        }[name]
+        
+    def run_cached(self, stage, inputs: List[Path], code: List[str],
+                   compute: Callable[[], pd.DataFrame], load: Callable[[], pd.DataFrame]) -> pd.DataFrame:
+        """Restore a stage's output files from the stage cache, or compute them and store them"""
+        if not self.cache:
+            return compute()
+        
+        key = self.cache.key(stage.name, inputs, self.stage_params(stage.name),
+                             [Path(__file__).parent / script for script in code])
+        if self.cache.restore(stage.name, key, self.stage_output_files(stage.name)):
+            stage.cache = 'hit'
+            return load()
+        
+        stage.cache = 'miss'
+        result = compute()
+        self.cache.store(stage.name, key, self.stage_output_files(stage.name))
+        return result
+        
+    def run_clean_schedules(self, schedule_raw: pd.DataFrame) -> Dict:
+        with self.profiler.stage('clean_schedules') as stage:
+            schedule_clean_df = self.run_cached(
+                stage, [self.schedule_raw_file], ['clean_schedule_data_day_specific.py'],
+                lambda: self.clean_schedule_data(schedule_raw),
+                lambda: read_table(self.schedule_clean_file, 'schedule_clean')
+            )
+            stage.update(rows_in=len(schedule_raw), rows_out=len(schedule_clean_df),
+                         bytes_read=file_bytes(self.schedule_raw_file),
+                         bytes_written=file_bytes(self.schedule_clean_file))
+        return {'schedule_clean': schedule_clean_df}
+        
+    def run_fetch_citations(self) -> Dict:
+        with self.profiler.stage('fetch_citations') as stage:
+            citations_raw_df = self.fetch_citation_data()
+            stage.update(rows_out=len(citations_raw_df), bytes_written=file_bytes(self.citations_raw_file))
+        return {'citations_raw': citations_raw_df}
+        
+    def run_geocode(self, citations_raw: pd.DataFrame, schedule_clean: pd.DataFrame = None) -> Dict:
+        with self.profiler.stage('geocode') as stage:
+            if self.skip_geocoding:
+                citations_geocoded_df = self.geocode_citations(citations_raw)
+            else:
+                calibration_file = self.calibration_source
+                inputs = [self.citations_raw_file]
+                if calibration_file:
+                    inputs += [self.schedule_clean_file, calibration_file]
+                citations_geocoded_df = self.run_cached(
+                    stage, inputs, ['production_citation_processor.py', 'offline_geocoder.py'],
+                    lambda: self.geocode_citations(citations_raw, calibration_file),
+                    lambda: read_table(self.citations_geocoded_file, 'citations_geocoded')
+                )
+            stage.update(rows_in=len(citations_raw), rows_out=len(citations_geocoded_df),
+                         bytes_read=file_bytes(self.citations_raw_file),
+                         bytes_written=file_bytes(self.citations_geocoded_file))
+        return {'citations_geocoded': citations_geocoded_df}
+        
+    def run_match(self, citations_geocoded: pd.DataFrame, schedule_clean: pd.DataFrame) -> Dict:
+        with self.profiler.stage('match') as stage:
+            estimates_df = self.run_cached(
+                stage, [self.citations_geocoded_file, self.schedule_clean_file],
+                ['production_hybrid_matcher_day_specific.py', 'geo_utils.py', 'schedule_index.py', 'segment_raster.py'],
+                lambda: self.calculate_sweeper_estimates(citations_geocoded, schedule_clean),
+                lambda: read_table(self.final_estimates_file, 'estimates')
+            )
+            stage.update(rows_in=len(citations_geocoded), rows_out=len(estimates_df),
+                         bytes_read=file_bytes(self.citations_geocoded_file, self.schedule_clean_file),
+                         bytes_written=file_bytes(*self.output_dir.glob(f"final_analysis_{self.timestamp}_*.csv")))
+        return {'estimates': estimates_df}
+        
+    def run_aggregate(self, citations_geocoded: pd.DataFrame, estimates: pd.DataFrame) -> Dict:
+        with self.profiler.stage('aggregate') as stage:
+            app_aggregated_df = self.run_cached(
+                stage, [self.stage_output_files('match')['matches.csv'], self.final_estimates_file],
+                ['aggregate_schedules_from_matches.py', 'geo_utils.py'],
+                lambda: self.aggregate_for_app(citations_geocoded, estimates),
+                lambda: read_table(self.app_aggregated_file, 'app_aggregated')
+            )
+            stage.update(rows_in=len(estimates), rows_out=len(app_aggregated_df),
+                         bytes_read=file_bytes(*self.output_dir.glob(f"final_analysis_{self.timestamp}_matches_*.csv"),
+                                               self.final_estimates_file),
+                         bytes_written=file_bytes(self.app_aggregated_file))
+        return {'app_aggregated': app_aggregated_df}
+        
+    def run_app_tiles(self, app_aggregated: pd.DataFrame) -> Dict:
+        with self.profiler.stage('app_tiles') as stage:
+            tiles_manifest = self.export_app_tiles()
+            stage.update(rows_in=len(app_aggregated), bytes_read=file_bytes(self.app_aggregated_file),
+                         bytes_written=tiles_manifest['total_bytes'])
+        return {'tiles_manifest': tiles_manifest}
+        
+    def run_app_delta(self, app_aggregated: pd.DataFrame) -> Dict:
+        with self.profiler.stage('app_delta') as stage:
+            delta_manifest = self.export_app_delta()
+            stage.update(rows_in=len(app_aggregated), bytes_read=file_bytes(self.app_aggregated_file),
+                         bytes_written=delta_manifest['delta_bytes'])
+        return {'delta_manifest': delta_manifest}
+        
+    def load_run_manifest(self) -> Dict:
+        """Read the manifest of the run being resumed"""
+        if not self.run_manifest_file.exists():
+            self.logger.warning(f"⚠️  No run manifest in {self.output_dir} - every stage will run")
+            return {'timestamp': self.timestamp, 'stages': {}}
+        with open(self.run_manifest_file) as f:
+            return json.load(f)
+        
+    def mark_stage_complete(self, name: str):
+        """Record a finished stage with checksums of its outputs"""
+        outputs = {
+            output: {'path': str(path), 'sha256': file_sha256(path)}
+            for output, path in self.stage_output_files(name).items() if Path(path).is_file()
+        }
+        with self.manifest_lock:
+            self.run_manifest['stages'][name] = {
+                'completed_at': datetime.now().isoformat(),
+                'params': self.stage_params(name),
+                'outputs': outputs
+            }
+            temp_file = self.run_manifest_file.with_suffix('.json.tmp')
+            with open(temp_file, 'w') as f:
+                json.dump(self.run_manifest, f, indent=2, default=str)
+            temp_file.replace(self.run_manifest_file)
+            
+    def stage_complete(self, name: str) -> bool:
+        """A stage can be skipped if it finished with the same parameters and its outputs are unchanged"""
+        record = self.run_manifest['stages'].get(name)
+        if not record or record.get('params') != json.loads(json.dumps(self.stage_params(name))):
+            return False
+        for output, info in record['outputs'].items():
+            path = Path(info['path'])
+            if not path.is_file() or file_sha256(path) != info['sha256']:
+                self.logger.warning(f"⚠️  {name}: {path.name} is missing or changed since the stage completed - rerunning")
+                return False
+        return True
+        
+    def load_stage_artifacts(self, name: str) -> Dict:
+        """Re-read a completed stage's artifacts from the run directory"""
+        artifact, output = {
+            'fetch_schedules': ('schedule_raw', 'schedule_raw.csv'),
+            'clean_schedules': ('schedule_clean', 'schedule_clean.csv'),
+            'fetch_citations': ('citations_raw', 'citations_raw.csv'),
+            'geocode': ('citations_geocoded', 'citations_geocoded.csv'),
+            'match': ('estimates', 'estimates.csv'),
+            'aggregate': ('app_aggregated', 'app_ready_schedules.csv'),
+            'app_tiles': ('tiles_manifest', 'app_tiles_manifest.json'),
+            'app_delta': ('delta_manifest', 'app_data_manifest.json')
+        }[name]
+        path = self.stage_output_files(name)[output]
+        if path.suffix == '.json':
+            with open(path) as f:
+                return {artifact: json.load(f)}
+        return {artifact: read_table(path, artifact)}
+        
+    def resumable(self, stage: PipelineStage, dependencies: set) -> Callable[..., Dict]:
+        """Wrap a stage so a resumed run skips it when it and everything upstream already completed"""
+        run = stage.run
+        
+        def run_or_resume(**inputs) -> Dict:
+            if dependencies <= self.resumed_stages and self.stage_complete(stage.name):
+                with self.profiler.stage(stage.name) as metrics:
+                    self.logger.info(f"⏭️  {stage.name}: completed in an earlier attempt, loading its outputs")
+                    metrics.cache = 'resumed'
+                    artifacts = self.load_stage_artifacts(stage.name)
+                with self.manifest_lock:
+                    self.resumed_stages.add(stage.name)
+                return artifacts
+            
+            artifacts = run(**inputs)
+            self.mark_stage_complete(stage.name)
+            return artifacts
+        return run_or_resume
+        
+    def build_stages(self) -> List[PipelineStage]:
+        """Pipeline steps with the artifacts each consumes and produces"""
+        # Resolved once so the geocode stage's inputs and what it actually reads agree
+        self.calibration_source = None if self.skip_geocoding else self.geocoding_calibration_source()
+        stages = [
+            # Schedule branch (steps 1-2) and citation branch (steps 3-4) are independent
+            PipelineStage('fetch_schedules', self.run_fetch_schedules, outputs=['schedule_raw']),
+            PipelineStage('clean_schedules', self.run_clean_schedules, ['schedule_raw'], ['schedule_clean']),
+            PipelineStage('fetch_citations', self.run_fetch_citations, outputs=['citations_raw']),
+            # Offline geocoding interpolates along cleaned schedule blocks, so with a calibration file it waits
+            # for them; otherwise the citation branch runs alongside the schedule branch
+            PipelineStage('geocode', self.run_geocode,
+                          ['citations_raw', 'schedule_clean'] if self.calibration_source else ['citations_raw'],
+                          ['citations_geocoded']),
+            PipelineStage('match', self.run_match, ['citations_geocoded', 'schedule_clean'], ['estimates']),
+            PipelineStage('aggregate', self.run_aggregate, ['citations_geocoded', 'estimates'], ['app_aggregated']),
+            # Delta against the previous run for incremental app updates
+            PipelineStage('app_delta', self.run_app_delta, ['app_aggregated'], ['delta_manifest'])
+        ]
+        if self.tile_precision:
+            # Tile app output so clients can load only nearby blocks
+            stages.append(PipelineStage('app_tiles', self.run_app_tiles, ['app_aggregated'], ['tiles_manifest']))
+        return stages
+        
     def run_full_pipeline(self) -> Dict:
         """Execute the complete production pipeline"""
         self.logger.info("🚀 Starting Full SF Parking Citation Analysis Pipeline")
         self.logger.info("=" * 80)
         self.logger.info(f"   Processing {self.days_back} days of data with {self.workers} workers")
         self.logger.info(f"   Output directory: {self.output_dir}")
+        self.logger.info(f"   Stage parallelism: {self.max_parallel_stages}")
         self.logger.info("=" * 80)
         
         start_time = datetime.now()
         
         try:
-            # Step 1: Fetch schedule data
-            schedule_raw_df = self.fetch_schedule_data()
-            schedule_raw_count = len(schedule_raw_df)
-            
-            # Step 2: Clean schedule data
-            schedule_clean_df = self.clean_schedule_data(schedule_raw_df)
-            schedule_clean_count = len(schedule_clean_df)
-            
-            # Step 3: Fetch citation data
-            citations_raw_df = self.fetch_citation_data()
-            citations_raw_count = len(citations_raw_df)
-            
-            # Step 4: Geocode citations
-            citations_geocoded_df = self.geocode_citations(citations_raw_df)
-            citations_geocoded_count = len(citations_geocoded_df)
-            
-            # Step 5: Calculate estimates
-            estimates_df = self.calculate_sweeper_estimates(citations_geocoded_df, schedule_clean_df)
-            estimates_count = len(estimates_df)
+            # Steps 1-6c: independent stages run concurrently as soon as their inputs are ready
+            dag = StageDAG(self.build_stages(), max_workers=self.max_parallel_stages, logger=self.logger)
+            for stage in dag.stages.values():
+                stage.run = self.resumable(stage, dag.dependencies[stage.name])
+            artifacts = dag.run()
             
-            # Step 6: Aggregate for app
-            app_aggregated_df = self.aggregate_for_app(citations_geocoded_df, estimates_df)
-            app_aggregated_count = len(app_aggregated_df)
+            schedule_raw_count = len(artifacts['schedule_raw'])
+            schedule_clean_count = len(artifacts['schedule_clean'])
+            citations_raw_count = len(artifacts['citations_raw'])
+            citations_geocoded_count = len(artifacts['citations_geocoded'])
+            estimates_count = len(artifacts['estimates'])
+            app_aggregated_count = len(artifacts['app_aggregated'])
             
             end_time = datetime.now()
             
@@ -636,7 +1069,7 @@ print(f"Saved cleaned schedule data: {{len(df)}} -> {{len(result_df)}} records")
             report = self.generate_pipeline_report(
                 schedule_raw_count, schedule_clean_count,
                 citations_raw_count, citations_geocoded_count,
-                estimates_count, app_aggregated_count, start_time, end_time
+                estimates_count, app_aggregated_count, start_time, end_time, dag
             )
             
             self.logger.info("🎉 Full pipeline completed successfully!")
@@ -647,6 +1080,17 @@ print(f"Saved cleaned schedule data: {{len(df)}} -> {{len(result_df)}} records")
             self.logger.info(f"   Estimates: {estimates_count:,} schedule blocks with predicted times")
             self.logger.info(f"   📱 App-ready: {app_aggregated_count:,} aggregated schedules (CNN+Side+Week)")
             self.logger.info(f"   Processing time: {end_time - start_time}")
+            for name, metrics in report['stage_metrics'].items():
+                timeline = dag.timeline[name]
+                # Subprocess stages have their own peak; in-process ones only the process peak so far (marked *)
+                memory = (f"{metrics['subprocess_peak_rss_mb']:>7.0f} MB peak " if metrics['subprocess_peak_rss_mb']
+                          else f"{metrics['process_peak_rss_mb_at_end']:>7.0f} MB peak*")
+                self.logger.info(f"   ⏱️  {name:<16} {metrics['wall_seconds']:>9.1f}s wall {metrics['cpu_seconds']:>9.1f}s CPU "
+                                 f"{memory} "
+                                 f"[{timeline['start_seconds']:.1f}s → {timeline['end_seconds']:.1f}s]")
+            schedule = report['stage_schedule']
+            self.logger.info(f"   🔀 Stage time {schedule['sum_of_stage_seconds']:.1f}s, "
+                             f"critical path {schedule['critical_path_seconds']:.1f}s")
             self.logger.info(f"📁 All output saved to: {self.output_dir}")
             self.logger.info(f"🎯 Primary app file: {self.app_aggregated_file.name}")
             
@@ -670,6 +1114,33 @@ def main():
                        help='Batch size for geocoding (default: 5000)')
     parser.add_argument('--skip-geocoding', action='store_true',
                        help='Skip geocoding and use existing geocoded data for testing (default: False)')
+    parser.add_argument('--tile-precision', type=int, default=6,
+                       help='Geohash precision for tiled app output, 0 to disable (default: 6)')
+    parser.add_argument('--previous-run', default=None,
+                       help='Run directory to diff app output against (default: latest earlier run in --output-dir)')
+    parser.add_argument('--geometry-encoding', choices=['geojson', 'polyline'], default='geojson',
+                       help='App output geometry: GeoJSON `line` (default) or simplified `line_polyline`')
+    parser.add_argument('--simplify-tolerance', type=float, default=1.0,
+                       help='Simplification tolerance in meters for polyline geometry (default: 1.0)')
+    parser.add_argument('--profile', action='store_true',
+                       help='Write a cProfile dump and summary per stage to <run>/profiles/ (default: False)')
+    parser.add_argument('--max-distance', type=int, default=200,
+                       help='Maximum citation-to-schedule matching distance in meters (default: 200)')
+    parser.add_argument('--grid-size', type=float, default=100,
+                       help='Matcher spatial grid cell size in meters (default: 100)')
+    parser.add_argument('--cache-dir', default=None,
+                       help='Stage cache directory (default: <output-dir>/stage_cache)')
+    parser.add_argument('--no-cache', action='store_true',
+                       help='Recompute every stage without reading or writing the stage cache (default: False)')
+    parser.add_argument('--resume', metavar='RUN_DIR', default=None,
+                       help='Resume a failed run in RUN_DIR from its first incomplete stage')
+    parser.add_argument('--sequential', action='store_true',
+                       help='Run one stage at a time instead of overlapping independent stages (default: False)')
+    parser.add_argument('--no-offline-geocoding', action='store_true',
+                       help='Send every address to the Census API instead of interpolating calibrated blocks locally (default: False)')
+    parser.add_argument('--api-base', default=SF_OPEN_DATA_API,
+                       help=f'SF Open Data API to fetch schedules and citations from, e.g. a local '
+                            f'benchmarks/socrata_server.py (default: {SF_OPEN_DATA_API})')
     
     args = parser.parse_args()
     
@@ -680,7 +1151,20 @@ def main():
         output_dir=args.output_dir,
         rate_limit=args.rate_limit,
         batch_size=args.batch_size,
-        skip_geocoding=args.skip_geocoding
+        skip_geocoding=args.skip_geocoding,
+        tile_precision=args.tile_precision,
+        previous_run_dir=args.previous_run,
+        geometry_encoding=args.geometry_encoding,
+        simplify_tolerance=args.simplify_tolerance,
+        profile=args.profile,
+        max_parallel_stages=1 if args.sequential else 4,
+        max_distance=args.max_distance,
+        grid_size=args.grid_size,
+        cache_dir=args.cache_dir,
+        use_cache=not args.no_cache,
+        resume_dir=args.resume,
+        offline_geocoding=not args.no_offline_geocoding,
+        api_base=args.api_base
     )
     
     try:
@@ -694,8 +1178,10 @@ def main():
         
     except KeyboardInterrupt:
         print("\n⚠️ Pipeline interrupted by user. Partial results may be available.")
+        print(f"   Resume with: --resume {processor.output_dir}")
     except Exception as e:
         print(f"\n❌ Pipeline failed: {e}")
+        print(f"   Resume with: --resume {processor.output_dir}")
         raise
 
 if __name__ == "__main__":
@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+"""
+Shared geometry helpers for the production pipeline
+
+- Parsing of the schedule `line` column (GeoJSON LineString stored as a Python dict repr)
+- Geohash encoding/decoding for tiling app-ready output
+- Polyline simplification and compact fixed-point encoding of app geometry
+- Point-to-polyline distance with side of street for matching
+- Hilbert-curve ordering of grid cells for spatially local batch work
+"""
+
+import ast
+import json
+import math
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+GEOHASH_BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+GEOHASH_DECODE = {char: i for i, char in enumerate(GEOHASH_BASE32)}
+
+def parse_linestring(linestring) -> Optional[List[Tuple[float, float]]]:
+    """Parse a LineString stored as a dict repr or JSON into [(lat, lon), ...]"""
+    if not isinstance(linestring, str) or not linestring.strip():
+        return None
+    try:
+        text = linestring.strip()
+        geojson_data = json.loads(text) if text.startswith('{"') else ast.literal_eval(text)
+        if geojson_data.get('type') != 'LineString':
+            return None
+        coordinates = [(coord[1], coord[0]) for coord in geojson_data.get('coordinates', [])]
+        return coordinates if coordinates else None
+    except (ValueError, SyntaxError, TypeError, AttributeError, IndexError):
+        return None
+
+def line_bounds(coordinates: List[Tuple[float, float]]) -> Tuple[float, float, float, float]:
+    """Bounding box of [(lat, lon), ...] as (min_lat, min_lon, max_lat, max_lon)"""
+    lats = [lat for lat, _ in coordinates]
+    lons = [lon for _, lon in coordinates]
+    return min(lats), min(lons), max(lats), max(lons)
+
+def geohash_encode(lat: float, lon: float, precision: int = 6) -> str:
+    """Encode a point as a geohash string of the given length"""
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    bit_count = 0
+    even = True
+
+    while len(chars) < precision:
+        interval, value = (lon_range, lon) if even else (lat_range, lat)
+        mid = (interval[0] + interval[1]) / 2
+        if value >= mid:
+            bits = (bits << 1) | 1
+            interval[0] = mid
+        else:
+            bits = bits << 1
+            interval[1] = mid
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(GEOHASH_BASE32[bits])
+            bits = 0
+            bit_count = 0
+
+    return ''.join(chars)
+
+def geohash_bounds(geohash: str) -> Tuple[float, float, float, float]:
+    """Bounding box of a geohash cell as (min_lat, min_lon, max_lat, max_lon)"""
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    even = True
+
+    for char in geohash:
+        value = GEOHASH_DECODE[char]
+        for shift in range(4, -1, -1):
+            interval = lon_range if even else lat_range
+            mid = (interval[0] + interval[1]) / 2
+            if (value >> shift) & 1:
+                interval[0] = mid
+            else:
+                interval[1] = mid
+            even = not even
+
+    return lat_range[0], lon_range[0], lat_range[1], lon_range[1]
+
+def geohash_neighborhood(lat: float, lon: float, precision: int = 6) -> List[str]:
+    """Geohash of the cell containing a point plus its 8 surrounding cells"""
+    min_lat, min_lon, max_lat, max_lon = geohash_bounds(geohash_encode(lat, lon, precision))
+    lat_step = max_lat - min_lat
+    lon_step = max_lon - min_lon
+    center_lat = (min_lat + max_lat) / 2
+    center_lon = (min_lon + max_lon) / 2
+
+    cells = []
+    for dlat in (-1, 0, 1):
+        for dlon in (-1, 0, 1):
+            cell = geohash_encode(center_lat + dlat * lat_step, center_lon + dlon * lon_step, precision)
+            if cell not in cells:
+                cells.append(cell)
+    return cells
+
+# Fixed-point origin for quantized geometry (south-west corner of San Francisco)
+SF_ORIGIN = (37.70, -122.52)
+METERS_PER_DEGREE_LAT = 111320.0
+
+def to_local_meters(coordinates: List[Tuple[float, float]], ref_lat: float) -> List[Tuple[float, float]]:
+    """Project [(lat, lon), ...] to (x, y) meters with an equirectangular projection around ref_lat"""
+    lon_scale = METERS_PER_DEGREE_LAT * math.cos(math.radians(ref_lat))
+    return [(lon * lon_scale, lat * METERS_PER_DEGREE_LAT) for lat, lon in coordinates]
+
+def point_segment_distance(px: float, py: float, ax: float, ay: float, bx: float, by: float) -> float:
+    """Distance in the plane from point P to segment AB"""
+    dx, dy = bx - ax, by - ay
+    length_sq = dx * dx + dy * dy
+    if length_sq == 0:
+        return math.hypot(px - ax, py - ay)
+    t = max(0.0, min(1.0, ((px - ax) * dx + (py - ay) * dy) / length_sq))
+    return math.hypot(px - (ax + t * dx), py - (ay + t * dy))
+
+def point_polyline_side(px: float, py: float, points: List[Tuple[float, float]]) -> Tuple[float, float]:
+    """
+    Distance in the plane from point P to the polyline [(x, y), ...] and P's signed
+    perpendicular offset from the nearest segment: positive left of the line's
+    digitized direction, negative right (the schedule's cnn_right_left L/R).
+    """
+    if len(points) == 1:
+        return math.hypot(px - points[0][0], py - points[0][1]), 0.0
+
+    best_distance, best_offset = math.inf, 0.0
+    for (ax, ay), (bx, by) in zip(points, points[1:]):
+        dx, dy = bx - ax, by - ay
+        length_sq = dx * dx + dy * dy
+        t = max(0.0, min(1.0, ((px - ax) * dx + (py - ay) * dy) / length_sq)) if length_sq else 0.0
+        distance = math.hypot(px - (ax + t * dx), py - (ay + t * dy))
+        if distance < best_distance:
+            best_distance = distance
+            best_offset = (dx * (py - ay) - dy * (px - ax)) / math.sqrt(length_sq) if length_sq else 0.0
+    return best_distance, best_offset
+
+def hilbert_index(x: np.ndarray, y: np.ndarray, order: int = 16) -> np.ndarray:
+    """Position of each (x, y) cell along a Hilbert curve over a 2^order grid (x, y in [0, 2^order))"""
+    n = 1 << order
+    x = np.asarray(x, dtype=np.int64).copy()
+    y = np.asarray(y, dtype=np.int64).copy()
+    d = np.zeros(x.shape, dtype=np.int64)
+    s = n >> 1
+    while s > 0:
+        rx = (x & s) > 0
+        ry = (y & s) > 0
+        d += s * s * ((3 * rx.astype(np.int64)) ^ ry.astype(np.int64))
+        # Rotate the quadrant so the sub-curve keeps its orientation
+        flip = ~ry & rx
+        x = np.where(flip, n - 1 - x, x)
+        y = np.where(flip, n - 1 - y, y)
+        x, y = np.where(~ry, y, x), np.where(~ry, x, y)
+        s >>= 1
+    return d
+
+def simplify_line(coordinates: List[Tuple[float, float]], tolerance_meters: float) -> List[Tuple[float, float]]:
+    """Douglas-Peucker simplification of [(lat, lon), ...] with a tolerance in meters"""
+    if tolerance_meters <= 0 or len(coordinates) <= 2:
+        return list(coordinates)
+
+    points = to_local_meters(coordinates, coordinates[0][0])
+    keep = [False] * len(points)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(points) - 1)]
+
+    while stack:
+        start, end = stack.pop()
+        max_distance = 0.0
+        max_index = None
+        for i in range(start + 1, end):
+            distance = point_segment_distance(*points[i], *points[start], *points[end])
+            if distance > max_distance:
+                max_distance = distance
+                max_index = i
+        if max_index is not None and max_distance > tolerance_meters:
+            keep[max_index] = True
+            stack.append((start, max_index))
+            stack.append((max_index, end))
+
+    return [coord for coord, kept in zip(coordinates, keep) if kept]
+
+def max_deviation_meters(original: List[Tuple[float, float]], approximation: List[Tuple[float, float]]) -> float:
+    """Largest distance from any original vertex to the approximating polyline"""
+    ref_lat = original[0][0]
+    points = to_local_meters(original, ref_lat)
+    line = to_local_meters(approximation, ref_lat)
+    if len(line) == 1:
+        line = line * 2
+
+    return max(
+        min(point_segment_distance(px, py, *line[i], *line[i + 1]) for i in range(len(line) - 1))
+        for px, py in points
+    )
+
+def _encode_signed(value: int) -> str:
+    """Polyline-algorithm varint: zigzag the sign, then emit 5-bit chunks offset by 63"""
+    value = ~(value << 1) if value < 0 else value << 1
+    chunks = []
+    while value >= 0x20:
+        chunks.append(chr((0x20 | (value & 0x1f)) + 63))
+        value >>= 5
+    chunks.append(chr(value + 63))
+    return ''.join(chunks)
+
+def encode_polyline(coordinates: List[Tuple[float, float]], precision: int = 6,
+                    origin: Tuple[float, float] = SF_ORIGIN) -> str:
+    """
+    Encode [(lat, lon), ...] with the polyline algorithm.
+    
+    Coordinates are quantized to 10^-precision degrees and the first point is a
+    delta from `origin`, so every value stays small for SF geometry.
+    """
+    factor = 10 ** precision
+    previous_lat = round(origin[0] * factor)
+    previous_lon = round(origin[1] * factor)
+    chunks = []
+
+    for lat, lon in coordinates:
+        quantized_lat = round(lat * factor)
+        quantized_lon = round(lon * factor)
+        chunks.append(_encode_signed(quantized_lat - previous_lat))
+        chunks.append(_encode_signed(quantized_lon - previous_lon))
+        previous_lat, previous_lon = quantized_lat, quantized_lon
+
+    return ''.join(chunks)
+
+def decode_polyline(encoded: str, precision: int = 6,
+                    origin: Tuple[float, float] = SF_ORIGIN) -> List[Tuple[float, float]]:
+    """Decode a string produced by encode_polyline back to [(lat, lon), ...]"""
+    factor = 10 ** precision
+    values = []
+    value = shift = 0
+
+    for char in encoded:
+        chunk = ord(char) - 63
+        value |= (chunk & 0x1f) << shift
+        shift += 5
+        if chunk < 0x20:
+            values.append(~(value >> 1) if value & 1 else value >> 1)
+            value = shift = 0
+
+    lat = round(origin[0] * factor)
+    lon = round(origin[1] * factor)
+    coordinates = []
+    for dlat, dlon in zip(values[0::2], values[1::2]):
+        lat += dlat
+        lon += dlon
+        coordinates.append((lat / factor, lon / factor))
+    return coordinates
+
+def parse_geometry_column(df) -> List[Optional[List[Tuple[float, float]]]]:
+    """Coordinates of every app-ready row, whether geometry is stored as `line` GeoJSON or `line_polyline`"""
+    if 'line_polyline' in df.columns:
+        return [decode_polyline(value) if isinstance(value, str) and value else None for value in df['line_polyline']]
+    return [parse_linestring(value) for value in df['line']]
@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+"""
+Offline Address Interpolation Geocoder
+
+Places "NNN STREET" addresses on the schedule street network without an API call:
+1. Every schedule block (CNN) contributes its street name and centerline geometry.
+2. Earlier Census geocodes calibrate house-number ranges: each geocoded point is
+   snapped to the nearest block of its street, and a per-block linear fit maps
+   house number -> distance along the block. A block whose observations share
+   one hundred (e.g. 1400-1450) covers that whole hundred-block.
+3. A lookup finds the block of the street whose range holds the number and
+   interpolates along its centerline.
+
+Addresses on uncalibrated blocks return None so the caller falls back to the
+Census API; those results calibrate the next run.
+
+Usage:
+python3 offline_geocoder.py --schedules schedule_cleaned.csv --calibration citations_geocoded.csv --evaluate 0.3
+"""
+
+import argparse
+import bisect
+import logging
+import math
+import re
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from data_loader import read_table
+from geo_utils import METERS_PER_DEGREE_LAT, SF_ORIGIN, parse_linestring
+
+HOUSE_NUMBER = re.compile(r'^(\d+)\S*\s+(.+)$')
+LEADING_ZEROS = re.compile(r'\b0+(\d)')
+STREET_TYPES = {
+    'STREET', 'ST', 'AVENUE', 'AVE', 'BOULEVARD', 'BLVD', 'DRIVE', 'DR', 'COURT', 'CT',
+    'PLACE', 'PL', 'LANE', 'LN', 'ROAD', 'RD', 'PARKWAY', 'PKWY', 'CIRCLE', 'CIR',
+    'TERRACE', 'TER', 'WAY', 'PLAZA', 'PLZ', 'SQUARE', 'SQ', 'ALLEY', 'HWY'
+}
+CALIBRATION_COLUMNS = ['address', 'latitude', 'longitude', 'confidence', 'geocoding_status']
+LON_SCALE = METERS_PER_DEGREE_LAT * math.cos(math.radians(SF_ORIGIN[0]))
+
+def street_key(street: str) -> str:
+    """Comparable street name: upper case, no leading zeros ("01st" -> "1ST"), no type suffix.
+    Directionals are kept since SOUTH VAN NESS and VAN NESS are different streets."""
+    words = LEADING_ZEROS.sub(r'\1', str(street).upper()).split()
+    if len(words) > 1 and words[-1] in STREET_TYPES:
+        words = words[:-1]
+    return ' '.join(words)
+
+def parse_address(address: str) -> Optional[Tuple[int, str]]:
+    """(house number, street key) for "NNN STREET" addresses, else None"""
+    match = HOUSE_NUMBER.match(str(address).strip())
+    if not match:
+        return None
+    return int(match.group(1)), street_key(match.group(2))
+
+class BlockLine:
+    """A block centerline in local meters with cumulative lengths for interpolation"""
+
+    def __init__(self, coordinates: List[Tuple[float, float]]):
+        self.points = [((lon - SF_ORIGIN[1]) * LON_SCALE, (lat - SF_ORIGIN[0]) * METERS_PER_DEGREE_LAT)
+                       for lat, lon in coordinates]
+        self.cumulative = [0.0]
+        for (ax, ay), (bx, by) in zip(self.points, self.points[1:]):
+            self.cumulative.append(self.cumulative[-1] + math.hypot(bx - ax, by - ay))
+        self.length = self.cumulative[-1]
+
+    def project(self, x: float, y: float) -> Tuple[float, float]:
+        """(distance from the line, distance along it) for a point in local meters"""
+        best = (math.inf, 0.0)
+        for i, ((ax, ay), (bx, by)) in enumerate(zip(self.points, self.points[1:])):
+            dx, dy = bx - ax, by - ay
+            length_sq = dx * dx + dy * dy
+            t = max(0.0, min(1.0, ((x - ax) * dx + (y - ay) * dy) / length_sq)) if length_sq else 0.0
+            distance = math.hypot(x - (ax + t * dx), y - (ay + t * dy))
+            if distance < best[0]:
+                best = (distance, self.cumulative[i] + t * math.sqrt(length_sq))
+        return best
+
+    def point_at(self, along: float) -> Tuple[float, float]:
+        """(lat, lon) of the point `along` meters from the start"""
+        along = max(0.0, min(self.length, along))
+        i = max(0, min(len(self.points) - 2, bisect.bisect_right(self.cumulative, along) - 1))
+        segment = self.cumulative[i + 1] - self.cumulative[i]
+        t = (along - self.cumulative[i]) / segment if segment else 0.0
+        (ax, ay), (bx, by) = self.points[i], self.points[min(i + 1, len(self.points) - 1)]
+        x, y = ax + t * (bx - ax), ay + t * (by - ay)
+        return y / METERS_PER_DEGREE_LAT + SF_ORIGIN[0], x / LON_SCALE + SF_ORIGIN[1]
+
+class BlockRange:
+    """Calibrated house numbers of one block: along = intercept + slope * number"""
+
+    def __init__(self, cnn, numbers: np.ndarray, along: np.ndarray):
+        self.cnn = cnn
+        self.observations = len(numbers)
+        self.low, self.high = int(numbers.min()), int(numbers.max())
+        self.slope, self.intercept = np.polyfit(numbers, along, 1)
+        self.rms_meters = float(np.sqrt(np.mean((self.intercept + self.slope * numbers - along) ** 2)))
+        # SF numbers blocks by hundreds, so one hundred's observations stand for the whole hundred-block
+        hundred = self.low // 100
+        self.range_low, self.range_high = (hundred * 100, hundred * 100 + 99) if self.high // 100 == hundred \
+            else (self.low, self.high)
+
+class OfflineGeocoder:
+    def __init__(self, max_snap_meters: float = 30.0, max_rms_meters: float = 20.0, min_observations: int = 2):
+        self.max_snap_meters = max_snap_meters
+        self.max_rms_meters = max_rms_meters
+        self.min_observations = min_observations
+        self.blocks: Dict[object, BlockLine] = {}
+        self.street_blocks: Dict[str, List] = defaultdict(list)
+        self.street_ranges: Dict[str, List[BlockRange]] = defaultdict(list)
+        self.cache: Dict[str, Optional[Dict]] = {}
+        self.lookups = 0
+        self.hits = 0
+        # geocode() is called from the citation processor's worker threads
+        self.lock = threading.Lock()
+
+        logging.basicConfig(
+            level=logging.INFO,
+            format='%(asctime)s - %(levelname)s - %(message)s'
+        )
+        self.logger = logging.getLogger(__name__)
+
+    def add_schedules(self, schedule_df: pd.DataFrame):
+        """Index one centerline per block (CNN) by street"""
+        for cnn, corridor, line in schedule_df[['cnn', 'corridor', 'line']].drop_duplicates('cnn').itertuples(index=False):
+            coordinates = parse_linestring(line)
+            if not coordinates or len(coordinates) < 2 or pd.isna(corridor):
+                continue
+            block = BlockLine(coordinates)
+            if block.length > 0:
+                self.blocks[cnn] = block
+                self.street_blocks[street_key(corridor)].append(cnn)
+        self.logger.info(f"🗺️  Indexed {len(self.blocks):,} blocks on {len(self.street_blocks):,} streets")
+
+    def calibrate(self, geocoded_df: pd.DataFrame) -> Dict:
+        """Fit house-number ranges per block from Census-geocoded citations (offline results are skipped)"""
+        usable = geocoded_df.dropna(subset=['address', 'latitude', 'longitude'])
+        if 'geocoding_status' in usable.columns:
+            usable = usable[usable['geocoding_status'] == 'SUCCESS']
+        if 'confidence' in usable.columns:
+            usable = usable[usable['confidence'].isin(['HIGH', 'MEDIUM'])]
+
+        observations = defaultdict(dict)
+        snapped = 0
+        for address, lat, lon in usable[['address', 'latitude', 'longitude']].drop_duplicates('address').itertuples(index=False):
+            parsed = parse_address(address)
+            if not parsed or parsed[1] not in self.street_blocks:
+                continue
+            number, key = parsed
+            x, y = (lon - SF_ORIGIN[1]) * LON_SCALE, (lat - SF_ORIGIN[0]) * METERS_PER_DEGREE_LAT
+            distance, along, cnn = min(self.blocks[cnn].project(x, y) + (cnn,) for cnn in self.street_blocks[key])
+            if distance <= self.max_snap_meters:
+                observations[(key, cnn)][number] = along
+                snapped += 1
+
+        self.street_ranges.clear()
+        self.cache.clear()
+        rejected = 0
+        for (key, cnn), by_number in observations.items():
+            if len(by_number) < self.min_observations:
+                continue
+            block_range = BlockRange(cnn, np.array(list(by_number), dtype=float), np.array(list(by_number.values())))
+            if block_range.rms_meters > self.max_rms_meters:
+                rejected += 1
+                continue
+            self.street_ranges[key].append(block_range)
+
+        summary = {
+            'calibration_addresses': int(usable['address'].nunique()),
+            'snapped_addresses': snapped,
+            'calibrated_blocks': sum(len(ranges) for ranges in self.street_ranges.values()),
+            'rejected_blocks': rejected,
+            'total_blocks': len(self.blocks)
+        }
+        self.logger.info(f"📏 Calibrated {summary['calibrated_blocks']:,}/{summary['total_blocks']:,} blocks "
+                         f"from {snapped:,} snapped addresses ({rejected} rejected as inconsistent)")
+        return summary
+
+    def geocode(self, address: str) -> Optional[Dict]:
+        """Location dict (same keys as the Census path plus confidence) or None if the block isn't calibrated"""
+        with self.lock:
+            cached = address in self.cache
+            result = self.cache.get(address)
+        if not cached:
+            # Interpolation only reads the calibrated ranges, so it runs outside the lock
+            result = self.interpolate(address)
+        with self.lock:
+            self.cache[address] = result
+            self.lookups += 1
+            if result:
+                self.hits += 1
+        return result
+
+    def interpolate(self, address: str) -> Optional[Dict]:
+        parsed = parse_address(address)
+        if not parsed:
+            return None
+        number, key = parsed
+        candidates = [r for r in self.street_ranges.get(key, ()) if r.range_low <= number <= r.range_high]
+        if not candidates:
+            return None
+
+        # Prefer the block whose observed numbers are closest, then the best-supported one
+        block_range = min(candidates, key=lambda r: (max(r.low - number, number - r.high, 0), -r.observations))
+        block = self.blocks[block_range.cnn]
+        lat, lon = block.point_at(block_range.intercept + block_range.slope * number)
+        observed = block_range.low <= number <= block_range.high
+        return {
+            'latitude': lat,
+            'longitude': lon,
+            'address': f"{number} {key}",
+            'cnn': block_range.cnn,
+            'confidence_score': 100 if observed else 60,
+            'confidence': 'HIGH' if observed else 'MEDIUM'
+        }
+
+    def stats(self) -> Dict:
+        return {
+            'lookups': self.lookups,
+            'hits': self.hits,
+            'hit_rate': round(self.hits / self.lookups * 100, 1) if self.lookups else None,
+            'calibrated_blocks': sum(len(ranges) for ranges in self.street_ranges.values())
+        }
+
+    @classmethod
+    def from_files(cls, schedule_file: str, calibration_files: List[str], **kwargs) -> 'OfflineGeocoder':
+        geocoder = cls(**kwargs)
+        geocoder.add_schedules(read_table(schedule_file, 'schedule_clean', ['cnn', 'corridor', 'line']))
+        calibration = [read_table(f, 'citations_geocoded', CALIBRATION_COLUMNS, parse_dates=False)
+                       for f in calibration_files]
+        if calibration:
+            geocoder.calibrate(pd.concat(calibration, ignore_index=True))
+        return geocoder
+
+def haversine_meters(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 6371000 * 2 * np.arcsin(np.sqrt(a))
+
+def main():
+    parser = argparse.ArgumentParser(description='Offline address interpolation geocoder built from schedule blocks')
+    parser.add_argument('--schedules', required=True, help='Schedule CSV with cnn, corridor and line columns')
+    parser.add_argument('--calibration', nargs='+', required=True, help='Census-geocoded citation CSV(s)')
+    parser.add_argument('--evaluate', type=float, default=0.3,
+                        help='Hold out this fraction of calibration addresses and compare offline vs Census (default: 0.3)')
+    parser.add_argument('--seed', type=int, default=42, help='Hold-out sampling seed')
+
+    args = parser.parse_args()
+
+    geocoded = pd.concat([read_table(f, 'citations_geocoded', CALIBRATION_COLUMNS, parse_dates=False)
+                          for f in args.calibration], ignore_index=True)
+    addresses = pd.Series(geocoded['address'].dropna().unique())
+    holdout = set(addresses.sample(frac=args.evaluate, random_state=args.seed))
+
+    geocoder = OfflineGeocoder()
+    geocoder.add_schedules(read_table(args.schedules, 'schedule_clean', ['cnn', 'corridor', 'line']))
+    geocoder.calibrate(geocoded[~geocoded['address'].isin(holdout)])
+
+    test = geocoded[geocoded['address'].isin(holdout)].dropna(subset=['latitude', 'longitude'])
+    start = time.perf_counter()
+    results = [geocoder.interpolate(address) for address in test['address']]
+    seconds = time.perf_counter() - start
+
+    hits = [(row.latitude, row.longitude, result['latitude'], result['longitude'])
+            for row, result in zip(test.itertuples(), results) if result]
+    errors = haversine_meters(*np.array(hits).T) if hits else np.array([])
+    geocoder.logger.info(f"🎯 Held-out citations: {len(test):,}, resolved offline: {len(hits):,} "
+                         f"({len(hits) / len(test) * 100 if len(test) else 0:.1f}%)")
+    geocoder.logger.info(f"   Lookup time: {seconds / max(len(test), 1) * 1e6:.1f} µs/address")
+    if len(errors):
+        geocoder.logger.info(f"   Distance to Census point: median {np.median(errors):.1f}m, "
+                             f"p90 {np.percentile(errors, 90):.1f}m, p99 {np.percentile(errors, 99):.1f}m")
+
+if __name__ == "__main__":
+    main()
@@ -7,10 +7,11 @@ with confidence filtering, parallel processing, and resumption capability.
 
 Features:
 - Parallel geocoding with worker threads
+- Offline address interpolation on the schedule street network, Census API as fallback
 - Retry logic for API timeouts
 - Progress tracking and resumption
 - Confidence filtering (HIGH/MEDIUM only)
-- Rate limiting to prevent API throttling
+- Adaptive (AIMD) concurrency control driven by API latency and errors
 - Comprehensive logging and error handling
 - Weekly refresh optimization
 
@@ -25,7 +26,6 @@ import time
 import re
 import csv
 import json
-import threading
 import queue
 import argparse
 from datetime import datetime, timedelta
@@ -35,6 +35,60 @@ from typing import Dict, List, Optional, Tuple
 from concurrent.futures import ThreadPoolExecutor, as_completed
 import sqlite3
 import os
+from functools import lru_cache
+
+from data_loader import read_table
+from offline_geocoder import OfflineGeocoder
+from rate_controller import AdaptiveRateController
+from stage_profiler import ApiCallStats
+
+SF_OPEN_DATA_API = "https://data.sfgov.org"
+
+# Address validation tables, compiled once
+LEADING_NUMBER = re.compile(r'^(\d+)\s*')
+SUFFIX_ABBREVIATIONS = {
+    ' STREET': ' ST', ' AVENUE': ' AVE', ' BOULEVARD': ' BLVD',
+    ' DRIVE': ' DR', ' COURT': ' CT', ' PLACE': ' PL',
+    ' LANE': ' LN', ' ROAD': ' RD', ' PARKWAY': ' PKWY'
+}
+FULL_SUFFIX = re.compile('(' + '|'.join(SUFFIX_ABBREVIATIONS) + r')\Z')
+# Abbreviations stripped (anywhere, as before) to get the core street name for fuzzy matching
+CORE_SUFFIXES = re.compile(' ST| AVE| BLVD| DR| CT| PL| WAY| LN| RD| PKWY')
+# Returned addresses that name an area or whole street rather than a specific address
+GENERAL_REFERENCE = re.compile('AVENUE,|STREET,|BOULEVARD,|DISTRICT,|NEIGHBORHOOD,|SAN FRANCISCO')
+
+def abbreviate_suffix(street_upper: str) -> str:
+    """STREET -> ST etc. when the name ends in a full suffix"""
+    suffix = FULL_SUFFIX.search(street_upper)
+    return street_upper.replace(suffix.group(1), SUFFIX_ABBREVIATIONS[suffix.group(1)]) if suffix else street_upper
+
+def split_address(address: str) -> Tuple[Optional[int], str]:
+    """Street number (None if absent) and upper-cased street name with its suffix abbreviated, in one regex pass"""
+    address = address.strip()
+    match = LEADING_NUMBER.match(address)
+    number = int(match.group(1)) if match else None
+    street = address[match.end():] if match else address
+    return number, abbreviate_suffix(street.upper())
+
+def confidence_level(confidence_score: int) -> str:
+    if confidence_score >= 80:
+        return "HIGH"
+    elif confidence_score >= 50:
+        return "MEDIUM"
+    return "LOW"
+
+@lru_cache(maxsize=1 << 18)
+def score_geocoding_result(original_address: str, returned_address: str) -> Tuple[int, str]:
+    """Confidence score and level for one (original, returned) pair; memoized since addresses repeat heavily"""
+    orig_number, orig_street = split_address(original_address)
+    ret_street_upper = returned_address.upper()
+    
+    street_in_result = CORE_SUFFIXES.sub('', orig_street).strip() in ret_street_upper
+    number_in_result = str(orig_number) in returned_address if orig_number else False
+    is_general = GENERAL_REFERENCE.search(ret_street_upper) is not None
+    
+    confidence_score = 40 * street_in_result + 50 * number_in_result + 10 * (not is_general)
+    return confidence_score, confidence_level(confidence_score)
 
 class CitationGeocodingProcessor:
     def __init__(self, 
@@ -45,7 +99,11 @@ class CitationGeocodingProcessor:
                  timeout: int = 10,
                  min_confidence: str = "MEDIUM",
                  output_dir: str = None,
-                 use_database: bool = True):
+                 use_database: bool = True,
+                 adaptive_rate: bool = True,
+                 target_p95: float = 2.0,
+                 offline_geocoder: OfflineGeocoder = None,
+                 api_base: str = SF_OPEN_DATA_API):
         
         self.max_workers = max_workers
         self.batch_size = batch_size
@@ -67,6 +125,10 @@ class CitationGeocodingProcessor:
         
         # Initialize geocoder - using Census API instead of Nominatim for better US address accuracy
         self.census_api_url = "https://geocoding.geo.census.gov/geocoder/locations/onelineaddress"
+        # Calibrated blocks are answered locally; the rest go to Census
+        self.offline_geocoder = offline_geocoder
+        # SF Open Data (or a local stand-in) for fetch_citations
+        self.api_base = api_base.rstrip('/')
         
         # Progress tracking
         self.processed_count = 0
@@ -74,10 +136,11 @@ class CitationGeocodingProcessor:
         self.high_confidence_count = 0
         self.medium_confidence_count = 0
         self.failed_count = 0
+        self.api_stats = ApiCallStats()
         
-        # Thread-safe rate limiting
-        self.last_request_time = 0
-        self.rate_lock = threading.Lock()
+        # Concurrency limit adapts to API latency/errors (max_workers is the ceiling, rate_limit_delay the minimum spacing)
+        self.rate_controller = AdaptiveRateController(max_workers, min_interval=rate_limit_delay,
+                                                      target_p95_seconds=target_p95, adaptive=adaptive_rate)
         
         # Resume capability (only if using database)
         if self.use_database:
@@ -179,17 +242,14 @@ class CitationGeocodingProcessor:
         self.logger.info(f"Loading citations from file: {input_file}")
         
         try:
-            df = pd.read_csv(input_file)
+            # Datetimes are only passed through to the output, so they stay unparsed
+            df = read_table(input_file, 'citations_raw',
+                            ['citation_number', 'citation_location', 'citation_issued_datetime'], parse_dates=False)
+            if 'citation_number' not in df.columns:
+                df['citation_number'] = [f"file_{i}" for i in range(len(df))]
             
             # Convert DataFrame to list of dictionaries in expected format
-            citations = []
-            for _, row in df.iterrows():
-                citation = {
-                    'citation_number': row.get('citation_number', f"file_{len(citations)}"),
-                    'citation_location': row['citation_location'],
-                    'citation_issued_datetime': row['citation_issued_datetime']
-                }
-                citations.append(citation)
+            citations = df[['citation_number', 'citation_location', 'citation_issued_datetime']].to_dict('records')
                 
             self.logger.info(f"✅ Loaded {len(citations)} citations from file")
             return citations
@@ -207,7 +267,7 @@ class CitationGeocodingProcessor:
         start_date = end_date - timedelta(days=days_back)
         start_date_str = start_date.strftime('%Y-%m-%d')
         
-        url = "https://data.sfgov.org/resource/ab4h-6ztd.json"
+        url = f"{self.api_base}/resource/ab4h-6ztd.json"
         
         all_citations = []
         offset = 0
@@ -253,77 +313,22 @@ class CitationGeocodingProcessor:
         
     def extract_street_number(self, address: str) -> Optional[int]:
         """Extract street number from address"""
-        match = re.match(r'^(\d+)', address.strip())
-        return int(match.group(1)) if match else None
+        return split_address(address)[0]
         
     def normalize_street_suffix(self, street_name: str) -> str:
         """Normalize street suffixes for fuzzy matching"""
-        suffix_map = {
-            ' STREET': ' ST', ' AVENUE': ' AVE', ' BOULEVARD': ' BLVD',
-            ' DRIVE': ' DR', ' COURT': ' CT', ' PLACE': ' PL',
-            ' LANE': ' LN', ' ROAD': ' RD', ' PARKWAY': ' PKWY'
-        }
-        
-        street_upper = street_name.upper()
-        for full_suffix, short_suffix in suffix_map.items():
-            if street_upper.endswith(full_suffix):
-                return street_upper.replace(full_suffix, short_suffix)
-        
-        return street_upper
+        return abbreviate_suffix(street_name.upper())
         
     def extract_street_name(self, address: str) -> str:
         """Extract and normalize street name from address"""
-        street_name = re.sub(r'^\d+\s*', '', address.strip())
-        return self.normalize_street_suffix(street_name)
+        return split_address(address)[1]
         
     def validate_geocoding_result(self, original_address: str, returned_address: str) -> Tuple[int, str]:
         """Validate geocoding result and return confidence score and level"""
-        
-        # Extract components from original address
-        orig_number = self.extract_street_number(original_address)
-        orig_street = self.extract_street_name(original_address)
-        
-        ret_street_upper = returned_address.upper()
-        
-        # Check 1: Street name matching (fuzzy)
-        orig_core = orig_street
-        for suffix in [' ST', ' AVE', ' BLVD', ' DR', ' CT', ' PL', ' WAY', ' LN', ' RD', ' PKWY']:
-            orig_core = orig_core.replace(suffix, '')
-            
-        street_in_result = orig_core.strip() in ret_street_upper
-        
-        # Check 2: Street number matching
-        number_in_result = str(orig_number) in returned_address if orig_number else False
-        
-        # Check 3: Not a general reference
-        is_general = any(phrase in ret_street_upper for phrase in [
-            'AVENUE,', 'STREET,', 'BOULEVARD,', 'DISTRICT,', 'NEIGHBORHOOD,', 'SAN FRANCISCO'
-        ])
-        
-        # Calculate confidence score
-        confidence_score = 0
-        if street_in_result: confidence_score += 40
-        if number_in_result: confidence_score += 50
-        if not is_general: confidence_score += 10
-        
-        if confidence_score >= 80:
-            confidence = "HIGH"
-        elif confidence_score >= 50:
-            confidence = "MEDIUM"
-        else:
-            confidence = "LOW"
-            
-        return confidence_score, confidence
+        return score_geocoding_result(original_address, returned_address)
         
     def rate_limited_geocode(self, address: str) -> Optional[Dict]:
         """Perform rate-limited geocoding using Census API"""
-        with self.rate_lock:
-            # Light rate limiting for Census API (much more lenient than Nominatim)
-            elapsed = time.time() - self.last_request_time
-            if elapsed < self.rate_limit_delay:
-                time.sleep(self.rate_limit_delay - elapsed)
-            self.last_request_time = time.time()
-            
         full_address = f"{address}, San Francisco, CA"
         
         for attempt in range(self.max_retries):
@@ -334,7 +339,19 @@ class CitationGeocodingProcessor:
                     'format': 'json'
                 }
                 
-                response = requests.get(self.census_api_url, params=params, timeout=self.timeout)
+                self.rate_controller.acquire()
+                request_start = time.perf_counter()
+                try:
+                    response = requests.get(self.census_api_url, params=params, timeout=self.timeout)
+                except Exception:
+                    # No response at all (timeout, connection error) counts as congestion
+                    latency = time.perf_counter() - request_start
+                    self.rate_controller.release(latency)
+                    self.api_stats.record(latency, ok=False)
+                    raise
+                latency = time.perf_counter() - request_start
+                self.rate_controller.release(latency, response.status_code, response.headers.get('Retry-After'))
+                self.api_stats.record(latency, ok=response.ok)
                 response.raise_for_status()
                 
                 data = response.json()
@@ -357,7 +374,7 @@ class CitationGeocodingProcessor:
             except Exception as e:
                 self.logger.warning(f"Geocoding attempt {attempt + 1} failed for '{address}': {e}")
                 if attempt < self.max_retries - 1:
-                    time.sleep(2 ** attempt)  # Exponential backoff
+                    time.sleep(self.rate_controller.retry_delay(attempt))
                     
         return None
         
@@ -380,6 +397,21 @@ class CitationGeocodingProcessor:
         }
         
         try:
+            location = self.offline_geocoder.geocode(address) if self.offline_geocoder else None
+            
+            if location:
+                # Status kept distinct from SUCCESS so offline points never calibrate the offline geocoder
+                result.update({
+                    'latitude': location['latitude'],
+                    'longitude': location['longitude'],
+                    'returned_address': location['address'],
+                    'confidence': location['confidence'],
+                    'confidence_score': location['confidence_score'],
+                    'geocoding_status': 'OFFLINE'
+                })
+                self.save_citation_result(citation_id, result)
+                return result
+            
             location = self.rate_limited_geocode(address)
             
             if location:
@@ -448,7 +480,8 @@ class CitationGeocodingProcessor:
                         success_rate = (self.success_count / self.processed_count) * 100
                         self.logger.info(f"Processed {self.processed_count} citations. "
                                        f"Success rate: {success_rate:.1f}% "
-                                       f"(H:{self.high_confidence_count}, M:{self.medium_confidence_count}, F:{self.failed_count})")
+                                       f"(H:{self.high_confidence_count}, M:{self.medium_confidence_count}, F:{self.failed_count}) "
+                                       f"| {self.rate_controller.summary()}")
                         
                 except Exception as e:
                     self.logger.error(f"Error processing citation {citation.get('citation_location', 'unknown')}: {e}")
@@ -523,8 +556,12 @@ class CitationGeocodingProcessor:
                 'max_retries': self.max_retries,
                 'timeout': self.timeout,
                 'min_confidence': self.min_confidence
-            }
+            },
+            'api_calls': self.api_stats.to_dict(),
+            'rate_controller': self.rate_controller.state()
         }
+        if self.offline_geocoder:
+            report['offline_geocoder'] = self.offline_geocoder.stats()
         
         return report
         
@@ -592,6 +629,13 @@ class CitationGeocodingProcessor:
         self.logger.info(f"⏱️  Total time: {processing_time}")
         self.logger.info(f"📊 Success rate: {report['processing_summary']['success_rate']}")
         self.logger.info(f"✅ Usable results: {report['processing_summary']['usable_results']}")
+        rate_state = report['rate_controller']
+        self.logger.info(f"🚦 Rate controller: {self.rate_controller.summary()}, peak limit {rate_state['peak_concurrency_limit']}, "
+                         f"{rate_state['increases']} increases / {rate_state['decreases']} decreases")
+        if 'offline_geocoder' in report:
+            offline = report['offline_geocoder']
+            self.logger.info(f"🗺️  Offline geocoder: {offline['hits']:,}/{offline['lookups']:,} resolved locally "
+                             f"({offline['hit_rate']}%), {self.api_stats.calls:,} Census calls")
         
         return report
 
@@ -616,11 +660,25 @@ def main():
                        help='Output CSV filename')
     parser.add_argument('--output-dir', type=str, default=None,
                        help='Output directory for all generated files (logs, database, etc.)')
+    parser.add_argument('--fixed-rate', action='store_true',
+                       help='Keep all workers busy instead of adapting concurrency to API latency/errors')
+    parser.add_argument('--target-p95', type=float, default=2.0,
+                       help='API p95 latency (seconds) above which adaptive concurrency backs off (default: 2.0)')
     parser.add_argument('--no-resume', action='store_true',
                        help='Start fresh instead of resuming previous processing')
+    parser.add_argument('--schedules', type=str, default=None,
+                       help='Cleaned schedule CSV; enables the offline geocoder (requires --calibration)')
+    parser.add_argument('--calibration', type=str, nargs='+', default=[],
+                       help='Earlier geocoded citation CSV(s) used to calibrate block address ranges')
+    parser.add_argument('--api-base', type=str, default=SF_OPEN_DATA_API,
+                       help=f'SF Open Data API to fetch citations from (default: {SF_OPEN_DATA_API})')
     
     args = parser.parse_args()
     
+    offline_geocoder = None
+    if args.schedules and args.calibration:
+        offline_geocoder = OfflineGeocoder.from_files(args.schedules, args.calibration)
+    
     # Initialize processor
     processor = CitationGeocodingProcessor(
         max_workers=args.workers,
@@ -628,7 +686,11 @@ def main():
         rate_limit_delay=args.rate_limit,
         min_confidence=args.min_confidence,
         output_dir=args.output_dir,
-        use_database=not args.no_resume
+        use_database=not args.no_resume,
+        adaptive_rate=not args.fixed_rate,
+        target_p95=args.target_p95,
+        offline_geocoder=offline_geocoder,
+        api_base=args.api_base
     )
     
     try:
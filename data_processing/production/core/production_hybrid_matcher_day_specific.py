@@ -2,29 +2,150 @@
 """
 Production Hybrid Citation Schedule Matcher - Day Specific Version
 Matches citations to day-specific schedule rows for accurate timing estimates
+
+Each citation is filtered by spatial grid, street name, weekday/week-of-month/time
+window and distance to the block side's centerline, and matches are written as a
+fact table keyed by schedule_id. Options are described in --help and README.md.
 """
 
 import pandas as pd
+import numpy as np
 import json
 from typing import Dict, List, Tuple, Optional
-from geopy.distance import geodesic
+from pandas.tseries.holiday import USFederalHolidayCalendar
 import time
 from collections import defaultdict
 import re
 import argparse
 import logging
+import shutil
 from datetime import datetime
 from pathlib import Path
 
+from data_loader import read_table
+from geo_utils import SF_ORIGIN, hilbert_index, point_polyline_side, to_local_meters
+from schedule_index import ScheduleIndex, code_sha256
+from segment_raster import SegmentRaster
+from stage_cache import file_sha256
+
+MATCH_STEPS = ('spatial_grid', 'street_name', 'day_time', 'distance')
+
+# Citations closer than this to the centerline keep candidates on both sides
+SIDE_TOLERANCE_METERS = 1.0
+# Side of the square (from SF_ORIGIN) that Hilbert ordering covers; citations and geometries share this curve
+HILBERT_EXTENT_METERS = 32768
+# Input columns the matcher uses (everything else is left on disk)
+CITATION_COLUMNS = ['citation_id', 'address', 'datetime', 'latitude', 'longitude']
+SCHEDULE_COLUMNS = ['schedule_id', 'cnn', 'corridor', 'limits', 'cnn_right_left', 'block_side', 'weekday',
+                    'scheduled_from_hour', 'scheduled_to_hour', 'week1', 'week2', 'week3', 'week4', 'week5',
+                    'holidays', 'line']
+# Match fact table; block and window details live once per schedule in the schedules file
+MATCH_COLUMNS = ['citation_id', 'schedule_id', 'distance_meters', 'citation_time']
+MATCH_DTYPES = {'distance_meters': 'float32', 'citation_time': 'float32'}
+# Schedule fields the per-citation day/time, side and match checks read
+SCHEDULE_ROW_COLUMNS = ['schedule_id', 'geometry_id', 'cnn_right_left', 'weekday', 'week_mask', 'holidays',
+                        'scheduled_from_hour', 'scheduled_to_hour']
+DENORMALIZED_MATCH_COLUMNS = ['cnn', 'corridor', 'limits', 'cnn_right_left', 'block_side', 'weekday',
+                              'scheduled_from_hour', 'scheduled_to_hour']
+
+def sf_holidays(start, end) -> pd.DatetimeIndex:
+    """Days without regular sweeping: federal holidays (as observed) plus the day after Thanksgiving"""
+    federal = USFederalHolidayCalendar().holidays(start, end)
+    day_after_thanksgiving = federal[(federal.month == 11) & (federal.dayofweek == 3)] + pd.Timedelta(days=1)
+    return federal.union(day_after_thanksgiving)
+
+def citation_time_features(issued: pd.Series) -> pd.DataFrame:
+    """Weekday name, decimal hour, week of month (nth such weekday, 1-5; 0 if unknown) and holiday flag"""
+    if not pd.api.types.is_datetime64_any_dtype(issued):
+        issued = pd.to_datetime(issued, format='ISO8601', errors='coerce')
+    days = issued.dt.normalize()
+    holidays = sf_holidays(days.min(), days.max()) if days.notna().any() else pd.DatetimeIndex([])
+    return pd.DataFrame({
+        'citation_weekday': issued.dt.day_name(),
+        'citation_time': issued.dt.hour + issued.dt.minute / 60.0,
+        'week_of_month': ((issued.dt.day - 1) // 7 + 1).fillna(0).astype('int8'),
+        'is_holiday': days.isin(holidays)
+    }, index=issued.index)
+
+class MatchStats:
+    """Per-step candidate counts and timings for hybrid_match_citation
+    (spatial_grid and street_name count geometries, day_time and distance count schedule rows)"""
+    
+    def __init__(self):
+        self.citations = 0
+        self.entered = dict.fromkeys(MATCH_STEPS, 0)
+        self.candidates_in = dict.fromkeys(MATCH_STEPS, 0)
+        self.candidates_out = dict.fromkeys(MATCH_STEPS, 0)
+        self.eliminated = dict.fromkeys(MATCH_STEPS, 0)
+        self.nanoseconds = dict.fromkeys(MATCH_STEPS, 0)
+        self.distance_evaluations = 0
+        self.wrong_side_pruned = 0
+        self.spatial_candidates_per_citation = []
+        
+    def record(self, step: str, candidates_in: int, candidates_out: int, nanoseconds: int):
+        """Count one citation passing through a step (for the grid step, candidates_in is cells scanned)"""
+        self.entered[step] += 1
+        self.candidates_in[step] += candidates_in
+        self.candidates_out[step] += candidates_out
+        self.nanoseconds[step] += nanoseconds
+        if not candidates_out:
+            self.eliminated[step] += 1
+            
+    def report(self, spatial_grid: Dict) -> Dict:
+        """Funnel, timing and grid occupancy summary"""
+        def percentiles(values):
+            if not len(values):
+                return None
+            p50, p90, p99 = np.percentile(values, [50, 90, 99])
+            return {'p50': float(p50), 'p90': float(p90), 'p99': float(p99), 'max': int(np.max(values))}
+        
+        total_ns = sum(self.nanoseconds.values())
+        steps = {}
+        for step in MATCH_STEPS:
+            entered = self.entered[step]
+            steps[step] = {
+                'citations_entered': entered,
+                'citations_eliminated': self.eliminated[step],
+                'candidates_in': self.candidates_in[step],
+                'candidates_out': self.candidates_out[step],
+                'avg_candidates_out': round(self.candidates_out[step] / entered, 2) if entered else None,
+                'total_seconds': round(self.nanoseconds[step] / 1e9, 3),
+                'us_per_citation': round(self.nanoseconds[step] / 1e3 / entered, 1) if entered else None,
+                'time_share': round(self.nanoseconds[step] / total_ns, 3) if total_ns else None
+            }
+        
+        return {
+            'citations': self.citations,
+            'citations_matched': self.entered['distance'] - self.eliminated['distance'],
+            'steps': steps,
+            'distance_evaluations': self.distance_evaluations,
+            'wrong_side_pruned': self.wrong_side_pruned,
+            'spatial_candidates_per_citation': percentiles(self.spatial_candidates_per_citation),
+            'grid_occupancy': {
+                'cells': len(spatial_grid),
+                'geometries_per_cell': percentiles([len(indices) for indices in spatial_grid.values()])
+            }
+        }
+
 class DaySpecificHybridMatcher:
-    def __init__(self, max_distance_meters: float = 200, grid_size_meters: float = 100, grid_search_radius: int = 1, output_dir: str = None):
+    def __init__(self, max_distance_meters: float = 200, grid_size_meters: float = 100, grid_search_radius: int = 1,
+                 output_dir: str = None, collect_stats: bool = False, spatial_order: bool = True):
         self.max_distance_meters = max_distance_meters
         self.grid_size_meters = grid_size_meters
         self.grid_search_radius = grid_search_radius
         self.output_dir = Path(output_dir) if output_dir else Path('.')
         self.output_dir.mkdir(parents=True, exist_ok=True)
         self.schedules = None
+        self.schedule_rows = []
+        self.geometries = []
         self.spatial_grid = defaultdict(list)
+        self.spatial_order = spatial_order
+        self.raster = None
+        # Grid candidates of the last cell looked up (consecutive citations mostly share a cell in Hilbert order)
+        self.last_cell = None
+        self.last_cell_candidates = None
+        # None when disabled so the hot path only pays for a truthiness check
+        self.stats = MatchStats() if collect_stats else None
         self.setup_logging()
         
     def setup_logging(self):
@@ -124,179 +245,363 @@ class DaySpecificHybridMatcher:
         grid_y = int(lon_meters / self.grid_size_meters)
         return grid_x, grid_y
 
-    def calculate_distance_to_schedule(self, citation_lat: float, citation_lon: float, 
-                                     schedule_coordinates: List[Tuple[float, float]]) -> float:
-        """Calculate distance from citation to schedule line"""
-        if not schedule_coordinates:
-            return float('inf')
-        
-        citation_point = (citation_lat, citation_lon)
-        min_distance = float('inf')
-        
-        for coord in schedule_coordinates:
-            distance = geodesic(citation_point, coord).meters
-            min_distance = min(min_distance, distance)
-        
-        return min_distance
+    def hilbert_keys(self, lat: np.ndarray, lon: np.ndarray) -> np.ndarray:
+        """Hilbert-curve position of each point's grid cell (same cells as lat_lon_to_grid), on one fixed
+        curve anchored at SF_ORIGIN so keys from separate calls are comparable"""
+        origin_x, origin_y = self.lat_lon_to_grid(*SF_ORIGIN)
+        order = max(1, int(np.ceil(np.log2(HILBERT_EXTENT_METERS / self.grid_size_meters))))
+        last_cell = (1 << order) - 1
+        grid_x = np.trunc(np.asarray(lat, dtype=float) * 111000 / self.grid_size_meters) - origin_x
+        grid_y = np.trunc(np.asarray(lon, dtype=float) * 111000 * 0.794 / self.grid_size_meters) - origin_y
+        grid_x = np.clip(np.nan_to_num(grid_x), 0, last_cell).astype(np.int64)
+        grid_y = np.clip(np.nan_to_num(grid_y), 0, last_cell).astype(np.int64)
+        return hilbert_index(grid_x, grid_y, order)
+
+    def calculate_distance_to_schedule(self, citation_x: float, citation_y: float,
+                                     schedule_points: List[Tuple[float, float]]) -> Tuple[float, float]:
+        """Distance from citation to the schedule line's nearest segment and signed side offset (+ left, - right),
+        all in local meters"""
+        if not schedule_points:
+            return float('inf'), 0.0
+        return point_polyline_side(citation_x, citation_y, schedule_points)
 
     def build_hybrid_index(self, schedule_df: pd.DataFrame):
-        """Build spatial grid index and normalize street names"""
+        """Build spatial grid index over unique block-side geometries and normalize street names"""
         self.logger.info("Building day-specific hybrid index...")
         
-        # Parse coordinates and normalize street names
-        self.logger.info("Parsing coordinates and normalizing street names...")
-        schedule_df['parsed_coords'] = schedule_df['line'].apply(self.parse_linestring_coordinates)
-        schedule_df['base_corridor'] = schedule_df['corridor'].apply(self.extract_street_from_address)
-        schedule_df['normalized_corridor'] = schedule_df['base_corridor'].apply(self.normalize_street_name)
+        # One geometry per block side (same cnn, side, street and line) instead of one per weekday row
+        geometry_keys = ['cnn', 'cnn_right_left', 'corridor', 'line']
+        schedule_df['geometry_id'] = schedule_df.groupby(geometry_keys, sort=False, observed=True, dropna=False).ngroup()
+        geometry_df = schedule_df.drop_duplicates('geometry_id').set_index('geometry_id')
         
-        # Filter valid schedules
-        valid_schedules = schedule_df[schedule_df['parsed_coords'].notna()].copy()
+        # Parse coordinates and normalize street names
+        self.logger.info(f"Parsing coordinates and normalizing street names for {len(geometry_df):,} geometries...")
+        # Object dtype: a categorical `line` can't map to (unhashable) coordinate lists
+        parsed_coords = geometry_df['line'].astype(object).apply(self.parse_linestring_coordinates)
+        normalized_corridor = geometry_df['corridor'].astype(object).apply(
+            lambda corridor: self.normalize_street_name(self.extract_street_from_address(corridor)))
+        # Bit w-1 set when the schedule sweeps in week w of the month
+        schedule_df['week_mask'] = sum(schedule_df[f'week{w}'].astype(int) * (1 << (w - 1))
+                                       for w in range(1, 6) if f'week{w}' in schedule_df)
+        if 'holidays' not in schedule_df:
+            schedule_df['holidays'] = 0
+        
+        # Filter valid schedules, renumbering geometries densely in Hilbert order of their first point's cell
+        parsed_coords = parsed_coords[parsed_coords.notna()]
+        first_points = np.array([coords[0] for coords in parsed_coords]).reshape(-1, 2)
+        geometry_ids = parsed_coords.index[np.argsort(self.hilbert_keys(first_points[:, 0], first_points[:, 1]), kind='stable')]
+        valid_schedules = schedule_df[schedule_df['geometry_id'].isin(geometry_ids)].copy()
+        geometry_codes = valid_schedules['geometry_id'].map(pd.Series(np.arange(len(geometry_ids)), index=geometry_ids)).to_numpy()
+        valid_schedules['geometry_id'] = geometry_codes
         self.schedules = valid_schedules.reset_index(drop=True)
+        # Plain per-row dicts for candidate checks: iloc row assembly is slow, more so with categorical columns
+        self.schedule_rows = self.schedules[SCHEDULE_ROW_COLUMNS].to_dict('records')
+        self.geometries = [{'coords': parsed_coords[geometry_id],
+                            'points': to_local_meters(parsed_coords[geometry_id], SF_ORIGIN[0]),
+                            'normalized_corridor': normalized_corridor[geometry_id],
+                            'schedules': []} for geometry_id in geometry_ids]
+        for idx, geometry_id in enumerate(geometry_codes):
+            self.geometries[geometry_id]['schedules'].append(idx)
         
         # Build spatial grid
         self.logger.info("Building spatial grid index...")
-        for idx, row in self.schedules.iterrows():
-            coords = row['parsed_coords']
-            if coords:
-                lat, lon = coords[0]
-                grid_x, grid_y = self.lat_lon_to_grid(lat, lon)
-                self.spatial_grid[(grid_x, grid_y)].append(idx)
+        self.spatial_grid = defaultdict(list)
+        self.last_cell = self.last_cell_candidates = None
+        for geometry_id, geometry in enumerate(self.geometries):
+            lat, lon = geometry['coords'][0]
+            grid_x, grid_y = self.lat_lon_to_grid(lat, lon)
+            self.spatial_grid[(grid_x, grid_y)].append(geometry_id)
         
         grid_cells = len(self.spatial_grid)
-        avg_schedules_per_cell = len(self.schedules) / grid_cells if grid_cells > 0 else 0
-        max_schedules_per_cell = max(len(indices) for indices in self.spatial_grid.values()) if self.spatial_grid else 0
+        avg_geometries_per_cell = len(self.geometries) / grid_cells if grid_cells > 0 else 0
+        max_geometries_per_cell = max(len(indices) for indices in self.spatial_grid.values()) if self.spatial_grid else 0
         
         self.logger.info(f"Day-specific hybrid index built:")
         self.logger.info(f"  - {len(self.schedules)} day-specific schedules with coordinates")
+        self.logger.info(f"  - {len(self.geometries)} unique geometries "
+                         f"({len(self.schedules) / max(len(self.geometries), 1):.1f} schedules/geometry)")
         self.logger.info(f"  - {grid_cells} grid cells")
-        self.logger.info(f"  - Avg {avg_schedules_per_cell:.1f} schedules/cell")
-        self.logger.info(f"  - Max {max_schedules_per_cell} schedules/cell")
+        self.logger.info(f"  - Avg {avg_geometries_per_cell:.1f} geometries/cell")
+        self.logger.info(f"  - Max {max_geometries_per_cell} geometries/cell")
+
+    def load_index(self, index: ScheduleIndex):
+        """Take schedules, geometries and the spatial grid from a prebuilt index file instead of build_hybrid_index"""
+        if index.header.get('code_sha256') != code_sha256():
+            raise ValueError("Schedule index was built by different matcher or geo_utils code; "
+                             "rebuild it with schedule_index.py build-index")
+        arrays = index.arrays
+        self.schedules = index.schedule_frame()
+        self.schedule_rows = self.schedules[SCHEDULE_ROW_COLUMNS].to_dict('records')
+
+        # Flat arrays sliced back into the per-geometry lists the hot loop reads
+        coords = arrays['geometry_coords'].tolist()
+        points = arrays['geometry_points'].tolist()
+        streets = index.strings('streets')
+        schedule_ids = arrays['geometry_schedules'].tolist()
+        offsets = arrays['geometry_offsets'].tolist()
+        schedule_offsets = arrays['geometry_schedule_offsets'].tolist()
+        self.geometries = [{'coords': coords[start:end], 'points': points[start:end],
+                            'normalized_corridor': streets[street_id],
+                            'schedules': schedule_ids[schedule_start:schedule_end]}
+                           for start, end, street_id, schedule_start, schedule_end
+                           in zip(offsets, offsets[1:], arrays['geometry_street_ids'].tolist(),
+                                  schedule_offsets, schedule_offsets[1:])]
+
+        self.spatial_grid = defaultdict(list)
+        self.last_cell = self.last_cell_candidates = None
+        if index.header['grid_size_meters'] == self.grid_size_meters:
+            keys = arrays['grid_keys']
+            cells = zip((keys >> 32).tolist(), ((keys & 0xFFFFFFFF) - (1 << 31)).tolist())
+            grid_ids = arrays['grid_geometries'].tolist()
+            grid_offsets = arrays['grid_offsets'].tolist()
+            for cell, start, end in zip(cells, grid_offsets, grid_offsets[1:]):
+                self.spatial_grid[cell] = grid_ids[start:end]
+        else:
+            self.logger.info(f"Index grid is {index.header['grid_size_meters']:g}m, rebuilding at {self.grid_size_meters:g}m")
+            for geometry_id, geometry in enumerate(self.geometries):
+                self.spatial_grid[self.lat_lon_to_grid(*geometry['coords'][0])].append(geometry_id)
+
+        self.logger.info(f"Loaded schedule index: {len(self.schedules):,} day-specific schedules, "
+                         f"{len(self.geometries):,} geometries, {len(self.spatial_grid):,} grid cells")
+
+    def use_raster(self, raster: SegmentRaster):
+        """Take spatial candidates from a SegmentRaster built over this index's geometries"""
+        if raster.radius_meters < self.max_distance_meters:
+            raise ValueError(f"Raster radius {raster.radius_meters:g}m is below the matching distance "
+                             f"{self.max_distance_meters:g}m; rebuild it with --radius {self.max_distance_meters:g}")
+        if raster.source.get('geometries') != len(self.geometries):
+            raise ValueError(f"Raster was built for {raster.source.get('geometries')} geometries, "
+                             f"index has {len(self.geometries)}; rebuild it from this schedule file")
+        self.raster = raster
+        self.logger.info(f"🗺️  Using segment raster: {raster.shape[0]:,} x {raster.shape[1]:,} cells of "
+                         f"{raster.cell_meters:g}m, radius {raster.radius_meters:g}m")
 
-    def hybrid_match_citation(self, citation_row: pd.Series) -> List[Dict]:
-        """Match citation using hybrid approach with simplified day matching"""
+    def hybrid_match_citation(self, citation_row: Dict) -> List[Dict]:
+        """Match a citation (with citation_time_features columns) using the hybrid approach"""
+        if not isinstance(citation_row['citation_weekday'], str):
+            # Unparseable datetime: no day or time to check against
+            return []
         citation_lat = citation_row['latitude']
         citation_lon = citation_row['longitude']
         citation_address = citation_row.get('address', '')
+        stats = self.stats
+        if stats:
+            stats.citations += 1
+            step_start = time.perf_counter_ns()
         
-        # Extract and normalize citation street name
-        citation_street = self.extract_street_from_address(citation_address)
-        citation_street_norm = self.normalize_street_name(citation_street)
-        
-        # Step 1: Spatial filtering using grid
+        # Step 1: Spatial filtering using the raster (one cell lookup) or grid
+        citation_x, citation_y = to_local_meters([(citation_lat, citation_lon)], SF_ORIGIN[0])[0]
         grid_x, grid_y = self.lat_lon_to_grid(citation_lat, citation_lon)
         
-        spatial_candidates = set()
-        for dx in range(-self.grid_search_radius, self.grid_search_radius + 1):
-            for dy in range(-self.grid_search_radius, self.grid_search_radius + 1):
-                cell = (grid_x + dx, grid_y + dy)
-                schedule_indices = self.spatial_grid.get(cell, [])
-                spatial_candidates.update(schedule_indices)
+        if self.raster is not None:
+            spatial_candidates = self.raster.candidates(citation_x, citation_y).tolist()
+        elif (grid_x, grid_y) == self.last_cell:
+            spatial_candidates = self.last_cell_candidates
+        else:
+            spatial_candidates = set()
+            for dx in range(-self.grid_search_radius, self.grid_search_radius + 1):
+                for dy in range(-self.grid_search_radius, self.grid_search_radius + 1):
+                    cell = (grid_x + dx, grid_y + dy)
+                    geometry_ids = self.spatial_grid.get(cell, [])
+                    spatial_candidates.update(geometry_ids)
+            self.last_cell, self.last_cell_candidates = (grid_x, grid_y), spatial_candidates
+        
+        if stats:
+            now = time.perf_counter_ns()
+            cells_scanned = 1 if self.raster is not None else (2 * self.grid_search_radius + 1) ** 2
+            stats.record('spatial_grid', cells_scanned, len(spatial_candidates), now - step_start)
+            stats.spatial_candidates_per_citation.append(len(spatial_candidates))
+            step_start = now
         
         if not spatial_candidates:
             return []
         
         # Step 2: Street name validation
+        # Extract and normalize citation street name
+        citation_street = self.extract_street_from_address(citation_address)
+        citation_street_norm = self.normalize_street_name(citation_street)
+        
         street_candidates = []
         if citation_street_norm:
-            for idx in spatial_candidates:
-                schedule = self.schedules.iloc[idx]
-                schedule_street_norm = schedule['normalized_corridor']
+            for geometry_id in spatial_candidates:
+                schedule_street_norm = self.geometries[geometry_id]['normalized_corridor']
                 
                 # Check if street names match (contains check for flexibility)
                 if (citation_street_norm in schedule_street_norm or 
                     schedule_street_norm in citation_street_norm or
                     citation_street_norm == schedule_street_norm):
-                    street_candidates.append(idx)
+                    street_candidates.append(geometry_id)
         else:
             # If no street name, use all spatial candidates
             street_candidates = list(spatial_candidates)
         
+        if stats:
+            now = time.perf_counter_ns()
+            stats.record('street_name', len(spatial_candidates), len(street_candidates), now - step_start)
+            step_start = now
+        
         if not street_candidates:
             return []
         
-        # Step 3: SIMPLIFIED Day and time validation
-        citation_datetime = citation_row.get('datetime', '2025-06-27T10:00:00')
-        try:
-            dt = datetime.fromisoformat(citation_datetime.replace('T', ' ').replace('.000', ''))
-            citation_time_decimal = dt.hour + dt.minute / 60.0
-            citation_weekday = dt.strftime('%A')  # Monday, Tuesday, etc.
-        except:
-            citation_weekday = 'Tuesday'
-            citation_time_decimal = 10.0  # Fallback
+        # Step 3: Day, week-of-month and time validation
+        citation_weekday = citation_row['citation_weekday']
+        citation_time_decimal = citation_row['citation_time']
+        week_bit = 1 << (citation_row['week_of_month'] - 1)
+        is_holiday = citation_row['is_holiday']
         
+        # Fan out from geometries to their day-specific schedule rows
         day_and_time_candidates = []
-        for idx in street_candidates:
-            schedule = self.schedules.iloc[idx]
-            
-            # SIMPLIFIED: Direct string comparison instead of boolean columns
-            if schedule['weekday'] == citation_weekday:
-                # Check time window match
-                from_hour = schedule['scheduled_from_hour']
-                to_hour = schedule['scheduled_to_hour']
-                if from_hour <= citation_time_decimal <= to_hour:
-                    day_and_time_candidates.append(idx)
+        schedule_count = 0
+        for geometry_id in street_candidates:
+            schedule_indices = self.geometries[geometry_id]['schedules']
+            schedule_count += len(schedule_indices)
+            for idx in schedule_indices:
+                schedule = self.schedule_rows[idx]
+                
+                # Holidays suspend regular routes; otherwise the weekday must be swept in this week of the month
+                if is_holiday:
+                    day_active = schedule['holidays'] == 1
+                else:
+                    day_active = schedule['weekday'] == citation_weekday and schedule['week_mask'] & week_bit
+                if day_active:
+                    # Check time window match
+                    from_hour = schedule['scheduled_from_hour']
+                    to_hour = schedule['scheduled_to_hour']
+                    if from_hour <= citation_time_decimal <= to_hour:
+                        day_and_time_candidates.append(idx)
+        
+        if stats:
+            now = time.perf_counter_ns()
+            stats.record('day_time', schedule_count, len(day_and_time_candidates), now - step_start)
+            step_start = now
         
         if not day_and_time_candidates:
             return []
         
-        # Step 4: Distance calculation and ranking
+        # Step 4: Distance calculation (once per geometry), side-of-street check and ranking
         matches = []
+        geometry_distances = {}
         for idx in day_and_time_candidates:
-            schedule = self.schedules.iloc[idx]
-            distance = self.calculate_distance_to_schedule(
-                citation_lat, citation_lon, schedule['parsed_coords']
-            )
+            schedule = self.schedule_rows[idx]
+            geometry_id = schedule['geometry_id']
+            if geometry_id not in geometry_distances:
+                geometry_distances[geometry_id] = self.calculate_distance_to_schedule(
+                    citation_x, citation_y, self.geometries[geometry_id]['points']
+                )
+            distance, side_offset = geometry_distances[geometry_id]
+            
+            # L rows sweep the left of the digitized line, R rows the right
+            if abs(side_offset) >= SIDE_TOLERANCE_METERS and \
+                    schedule['cnn_right_left'] == ('R' if side_offset > 0 else 'L'):
+                if stats:
+                    stats.wrong_side_pruned += 1
+                continue
             
             if distance <= self.max_distance_meters:
                 match = {
                     'citation_id': citation_row.get('citation_id', 'unknown'),
                     'schedule_id': schedule['schedule_id'],
-                    'cnn': schedule['cnn'],
-                    'corridor': schedule['corridor'],
-                    'limits': schedule['limits'],
-                    'cnn_right_left': schedule['cnn_right_left'],
-                    'block_side': schedule['block_side'],
                     'distance_meters': distance,
-                    'weekday': citation_weekday,
-                    'scheduled_from_hour': schedule['scheduled_from_hour'],
-                    'scheduled_to_hour': schedule['scheduled_to_hour'],
                     'citation_time': citation_time_decimal
                 }
                 matches.append(match)
         
         # Sort by distance (closest first)
-        matches.sort(key=lambda x: x['distance_meters'])
+        matches.sort(key=lambda x: (x['distance_meters'], x['schedule_id']))
+        
+        if stats:
+            stats.record('distance', len(day_and_time_candidates), len(matches), time.perf_counter_ns() - step_start)
+            stats.distance_evaluations += sum(max(len(self.geometries[geometry_id]['points']) - 1, 1)
+                                             for geometry_id in geometry_distances)
         
         return matches
 
-    def process_all_citations(self, citation_df: pd.DataFrame) -> pd.DataFrame:
+    def open_checkpoint(self, checkpoint_dir: str, checkpoint_key: str) -> Path:
+        """Checkpoint directory for this input; chunks saved for different inputs are discarded"""
+        checkpoint = Path(checkpoint_dir)
+        checkpoint.mkdir(parents=True, exist_ok=True)
+        key_file = checkpoint / 'checkpoint.json'
+        if key_file.exists() and json.loads(key_file.read_text()).get('key') == checkpoint_key:
+            return checkpoint
+        
+        for chunk_file in checkpoint.glob('chunk_*.pkl'):
+            chunk_file.unlink()
+        key_file.write_text(json.dumps({'key': checkpoint_key}))
+        return checkpoint
+        
+    def process_all_citations(self, citation_df: pd.DataFrame, checkpoint_dir: str = None,
+                              checkpoint_key: str = None, chunk_size: int = 25000) -> pd.DataFrame:
         """Process all citations and return matches DataFrame"""
         self.logger.info(f"Processing {len(citation_df)} citations with day-specific hybrid matching...")
         
+        # Time features once per citation instead of a datetime parse per citation in the hot loop
+        features = citation_time_features(citation_df['datetime'])
+        citation_df = citation_df.join(features)
+        unparsed = int(features['citation_weekday'].isna().sum())
+        if unparsed:
+            self.logger.warning(f"⚠️  Skipping {unparsed:,} citations with an unparseable datetime")
+        
+        # Visit citations along a Hilbert curve of their grid cells so consecutive citations share grid
+        # candidates and nearby geometries; order[i] is the input position of the i-th citation visited
+        if self.spatial_order:
+            order = np.argsort(self.hilbert_keys(citation_df['latitude'], citation_df['longitude']), kind='stable')
+        else:
+            order = np.arange(len(citation_df))
+        citation_df = citation_df.iloc[order]
+        
         all_matches = []
         total_citations = len(citation_df)
         start_time = time.time()
+        checkpoint = self.open_checkpoint(checkpoint_dir, checkpoint_key) if checkpoint_dir else None
+        processed = 0
+        resumed_chunks = 0
+        
+        for chunk_start in range(0, total_citations, chunk_size):
+            chunk_file = checkpoint / f"chunk_{chunk_start // chunk_size:05d}.pkl" if checkpoint else None
+            if chunk_file and chunk_file.exists():
+                all_matches.extend(pd.read_pickle(chunk_file))
+                resumed_chunks += 1
+                continue
+            
+            chunk_matches = []
+            chunk_df = citation_df.iloc[chunk_start:chunk_start + chunk_size]
+            chunk_positions = order[chunk_start:chunk_start + chunk_size].tolist()
+            for idx, (position, citation_row) in enumerate(zip(chunk_positions, chunk_df.to_dict('records')),
+                                                           start=chunk_start):
+                if idx % 25000 == 0:  # Log every 25K citations
+                    elapsed = time.time() - start_time
+                    rate = processed / elapsed if elapsed > 0 else 0
+                    remaining = (total_citations - idx) / rate if rate > 0 else 0
+                    self.logger.info(f"Processing citation {idx:,}/{total_citations:,} ({rate:.1f}/sec, {remaining/60:.1f}min remaining)")
+                    
+                    # Memory optimization: force garbage collection every 25K
+                    import gc
+                    gc.collect()
+                    
+                matches = self.hybrid_match_citation(citation_row)
+                if matches:
+                    chunk_matches.append((position, matches))
+                processed += 1
+            
+            if chunk_file:
+                # Write then rename so a crash mid-write never leaves a partial chunk
+                temp_file = chunk_file.with_suffix('.tmp')
+                pd.to_pickle(chunk_matches, temp_file)
+                temp_file.replace(chunk_file)
+            all_matches.extend(chunk_matches)
         
-        for idx, (_, citation_row) in enumerate(citation_df.iterrows()):
-            if idx % 25000 == 0:  # Log every 25K citations
-                elapsed = time.time() - start_time
-                rate = idx / elapsed if elapsed > 0 else 0
-                remaining = (total_citations - idx) / rate if rate > 0 else 0
-                self.logger.info(f"Processing citation {idx:,}/{total_citations:,} ({rate:.1f}/sec, {remaining/60:.1f}min remaining)")
-                
-                # Memory optimization: force garbage collection every 25K
-                import gc
-                gc.collect()
-                
-            matches = self.hybrid_match_citation(citation_row)
-            all_matches.extend(matches)
+        if resumed_chunks:
+            self.logger.info(f"♻️  Resumed {resumed_chunks} completed chunk(s) of {chunk_size:,} citations from {checkpoint}")
         
         if not all_matches:
             self.logger.warning("No matches found!")
             return pd.DataFrame()
         
+        # Back to input order; each citation's matches stay closest first
+        all_matches.sort(key=lambda citation_matches: citation_matches[0])
+        all_matches = [match for _, matches in all_matches for match in matches]
         self.logger.info(f"Found {len(all_matches):,} citation-schedule matches")
-        return pd.DataFrame(all_matches)
+        return pd.DataFrame(all_matches, columns=MATCH_COLUMNS).astype(MATCH_DTYPES)
 
     def generate_day_specific_estimates(self, matches_df: pd.DataFrame) -> pd.DataFrame:
         """Generate day-specific schedule estimates (LEFT JOIN - all schedules included)"""
@@ -361,13 +666,99 @@ class DaySpecificHybridMatcher:
         self.logger.info(f"Generated {len(schedule_stats)} day-specific schedule estimates")
         return pd.DataFrame(schedule_stats)
 
-    def export_results(self, matches_df: pd.DataFrame, schedules_df: pd.DataFrame, output_prefix: str):
-        """Export results to CSV files"""
+    def export_match_stats(self, output_prefix: str) -> Optional[str]:
+        """Log the per-step funnel and write it next to the other outputs"""
+        if not self.stats:
+            return None
+        
+        report = self.stats.report(self.spatial_grid)
+        stats_file = f"{output_prefix}_match_stats.json"
+        with open(stats_file, 'w') as f:
+            json.dump(report, f, indent=2)
+        
+        self.logger.info("📊 Matching funnel:")
+        for step, step_stats in report['steps'].items():
+            self.logger.info(f"   {step:<13} {step_stats['citations_entered']:>9,} citations, "
+                             f"{step_stats['candidates_in']:>11,} → {step_stats['candidates_out']:>10,} candidates, "
+                             f"{step_stats['total_seconds']:>8.2f}s ({step_stats['us_per_citation'] or 0:.0f} µs/citation)")
+        self.logger.info(f"   Wrong side of street: {report['wrong_side_pruned']:,} candidates pruned")
+        occupancy = report['grid_occupancy']['geometries_per_cell']
+        if occupancy:
+            self.logger.info(f"   Grid occupancy (geometries/cell): p50 {occupancy['p50']:.0f}, p90 {occupancy['p90']:.0f}, "
+                             f"p99 {occupancy['p99']:.0f}, max {occupancy['max']}")
+        self.logger.info(f"   Stats saved to {stats_file}")
+        return stats_file
+
+    def sweep_distances(self, matches_df: pd.DataFrame, thresholds: List[float]) -> Tuple[Dict, pd.DataFrame]:
+        """Match counts, schedule coverage and estimate drift at each distance threshold, from matches found
+        at the largest one (a threshold's matches are those within it); drift is relative to the largest"""
+        thresholds = sorted(set(thresholds))
+        by_threshold = {}
+        for threshold in thresholds:
+            within = matches_df[matches_df['distance_meters'] <= threshold]
+            by_threshold[threshold] = (within, within.groupby('schedule_id')['citation_time'].agg(['size', 'mean']))
+        reference = by_threshold[thresholds[-1]][1]
+        
+        coverage = pd.DataFrame({'schedule_id': self.schedules['schedule_id']})
+        results = []
+        for threshold in thresholds:
+            within, by_schedule = by_threshold[threshold]
+            coverage[f'citations_within_{threshold:g}m'] = \
+                coverage['schedule_id'].map(by_schedule['size']).fillna(0).astype('int32')
+            common = by_schedule.index.intersection(reference.index)
+            time_drift = (by_schedule.loc[common, 'mean'] - reference.loc[common, 'mean']).abs()
+            count_drift = 1 - by_schedule.loc[common, 'size'] / reference.loc[common, 'size']
+            matched_citations = within['citation_id'].nunique()
+            results.append({
+                'max_distance_meters': threshold,
+                'matches': len(within),
+                'matched_citations': matched_citations,
+                'matches_per_citation': round(len(within) / matched_citations, 3) if matched_citations else None,
+                'schedules_covered': len(by_schedule),
+                'schedule_coverage': round(len(by_schedule) / len(self.schedules), 4) if len(self.schedules) else None,
+                'schedules_lost': len(reference) - len(common),
+                'mean_citation_count_drift': round(float(count_drift.mean()), 4) if len(common) else None,
+                'mean_time_drift_hours': round(float(time_drift.mean()), 4) if len(common) else None,
+                'p90_time_drift_hours': round(float(time_drift.quantile(0.9)), 4) if len(common) else None
+            })
+        
+        summary = {'reference_distance_meters': thresholds[-1], 'schedules': len(self.schedules),
+                   'grid_size_meters': self.grid_size_meters, 'grid_search_radius': self.grid_search_radius,
+                   'thresholds': results}
+        return summary, coverage
+
+    def export_distance_sweep(self, summary: Dict, coverage: pd.DataFrame, output_prefix: str) -> Tuple[str, str]:
+        """Log the sweep table and write it next to the other outputs"""
+        sweep_file = f"{output_prefix}_distance_sweep.json"
+        coverage_file = f"{output_prefix}_distance_sweep_coverage.csv"
+        with open(sweep_file, 'w') as f:
+            json.dump(summary, f, indent=2)
+        coverage.to_csv(coverage_file, index=False)
+        
+        self.logger.info(f"📏 Distance sweep (drift relative to {summary['reference_distance_meters']:g}m):")
+        for result in summary['thresholds']:
+            self.logger.info(f"   {result['max_distance_meters']:>6g}m {result['matches']:>10,} matches, "
+                             f"{result['matched_citations']:>9,} citations, "
+                             f"{result['schedules_covered']:>7,} schedules ({result['schedule_coverage'] or 0:.1%}), "
+                             f"time drift {result['mean_time_drift_hours'] or 0:.3f}h")
+        self.logger.info(f"   Sweep saved to {sweep_file} and {coverage_file}")
+        return sweep_file, coverage_file
+
+    def denormalize_matches(self, matches_df: pd.DataFrame) -> pd.DataFrame:
+        """Matches with their schedule's block and window columns joined back on (the pre-fact-table layout)"""
+        dimension = self.schedules[['schedule_id'] + DENORMALIZED_MATCH_COLUMNS]
+        return matches_df.merge(dimension, on='schedule_id', how='left')[
+            ['citation_id', 'schedule_id'] + DENORMALIZED_MATCH_COLUMNS[:5] + ['distance_meters']
+            + DENORMALIZED_MATCH_COLUMNS[5:] + ['citation_time']]
+
+    def export_results(self, matches_df: pd.DataFrame, schedules_df: pd.DataFrame, output_prefix: str,
+                       denormalized: bool = False):
+        """Export results to CSV files (matches as the narrow fact table unless denormalized)"""
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         
         # Export matches
         matches_file = f"{output_prefix}_matches_{timestamp}.csv"
-        matches_df.to_csv(matches_file, index=False)
+        (self.denormalize_matches(matches_df) if denormalized else matches_df).to_csv(matches_file, index=False)
         self.logger.info(f"Exported {len(matches_df):,} matches to {matches_file}")
         
         # Export schedules
@@ -380,15 +771,38 @@ class DaySpecificHybridMatcher:
 def main():
     parser = argparse.ArgumentParser(description='Day-Specific Production Hybrid Citation-Schedule Matcher')
     parser.add_argument('--citation-file', required=True, help='Input citation CSV file')
-    parser.add_argument('--schedule-file', required=True, help='Input day-specific schedule CSV file')
+    parser.add_argument('--schedule-file', help='Input day-specific schedule CSV file')
+    parser.add_argument('--index-file', help='Prebuilt schedule index from schedule_index.py build-index '
+                                               '(instead of --schedule-file)')
     parser.add_argument('--output-prefix', default='day_specific_results', help='Output file prefix')
     parser.add_argument('--max-distance', type=int, default=200, help='Maximum matching distance in meters')
+    parser.add_argument('--grid-size', type=float, default=100, help='Spatial grid cell size in meters')
+    parser.add_argument('--grid-radius', type=int, default=1, help='Grid cells searched in each direction around a citation')
+    parser.add_argument('--sweep-distances', type=float, nargs='+', metavar='M',
+                        help='Match once up to the largest of these distances and report matches, schedule coverage '
+                             'and estimate drift at each in <output-prefix>_distance_sweep.json and '
+                             '_distance_sweep_coverage.csv (replaces the matches/schedules outputs)')
     parser.add_argument('--output-dir', help='Output directory for generated files (logs, etc.)')
+    parser.add_argument('--stats', action='store_true',
+                        help='Count and time each filtering step and write <output-prefix>_match_stats.json')
+    parser.add_argument('--checkpoint-dir', help='Save matches per chunk here and skip completed chunks on rerun')
+    parser.add_argument('--chunk-size', type=int, default=25000, help='Citations per checkpoint chunk')
+    parser.add_argument('--raster-index', metavar='DIR',
+                        help='Segment raster from segment_raster.py (same schedule file, radius >= --max-distance)')
+    parser.add_argument('--no-spatial-order', action='store_true',
+                        help='Match citations in input order instead of Hilbert-curve order of their grid cell')
+    parser.add_argument('--denormalized-matches', action='store_true',
+                        help='Repeat each schedule\'s block and window columns on every match row')
     
     args = parser.parse_args()
+    if not args.schedule_file and not args.index_file:
+        parser.error('one of --schedule-file or --index-file is required')
     
     # Initialize matcher
-    matcher = DaySpecificHybridMatcher(max_distance_meters=args.max_distance, output_dir=args.output_dir)
+    max_distance = max(args.sweep_distances) if args.sweep_distances else args.max_distance
+    matcher = DaySpecificHybridMatcher(max_distance_meters=max_distance, grid_size_meters=args.grid_size,
+                                       grid_search_radius=args.grid_radius, output_dir=args.output_dir,
+                                       collect_stats=args.stats, spatial_order=not args.no_spatial_order)
     
     matcher.logger.info("🚀 Starting Day-Specific Production Citation-Schedule Matching")
     matcher.logger.info("=" * 70)
@@ -397,28 +811,58 @@ def main():
     
     # Load data
     matcher.logger.info(f"Loading citation data from {args.citation_file}")
-    citation_df = pd.read_csv(args.citation_file)
+    citation_df = read_table(args.citation_file, 'citations_geocoded', CITATION_COLUMNS)
     matcher.logger.info(f"Loaded {len(citation_df):,} citations")
     
-    matcher.logger.info(f"Loading day-specific schedule data from {args.schedule_file}")
-    schedule_df = pd.read_csv(args.schedule_file)
-    matcher.logger.info(f"Loaded {len(schedule_df):,} day-specific schedules")
+    if args.index_file:
+        # Prebuilt index: no schedule CSV parsing or index build
+        matcher.logger.info(f"Loading schedule index from {args.index_file}")
+        index = ScheduleIndex.load(args.index_file)
+        matcher.load_index(index)
+        schedules_sha256 = index.header['source']['schedules_sha256']
+    else:
+        matcher.logger.info(f"Loading day-specific schedule data from {args.schedule_file}")
+        schedule_df = read_table(args.schedule_file, 'schedule_clean', SCHEDULE_COLUMNS)
+        matcher.logger.info(f"Loaded {len(schedule_df):,} day-specific schedules")
+        
+        # Build index
+        matcher.build_hybrid_index(schedule_df)
+        schedules_sha256 = file_sha256(args.schedule_file)
+    if args.raster_index:
+        raster = SegmentRaster.load(args.raster_index)
+        if raster.source.get('schedules_sha256') != schedules_sha256:
+            raise ValueError(f"Raster {args.raster_index} was built from a different schedule file")
+        matcher.use_raster(raster)
     
-    # Build index
-    matcher.build_hybrid_index(schedule_df)
-    
-    # Process citations
-    matches_df = matcher.process_all_citations(citation_df)
+    # Process citations (checkpoints are tied to the exact inputs and matching parameters)
+    checkpoint_key = None
+    if args.checkpoint_dir:
+        checkpoint_key = json.dumps([file_sha256(args.citation_file), schedules_sha256,
+                                     max_distance, args.grid_size, args.grid_radius, args.chunk_size,
+                                     'input order' if args.no_spatial_order else 'hilbert order',
+                                     args.raster_index and file_sha256(Path(args.raster_index) / 'cell_lists.npy')])
+    matches_df = matcher.process_all_citations(citation_df, args.checkpoint_dir, checkpoint_key, args.chunk_size)
+    matcher.export_match_stats(args.output_prefix)
     
     if matches_df.empty:
         matcher.logger.error("No matches found - analysis cannot continue")
         return
     
+    if args.sweep_distances:
+        matcher.export_distance_sweep(*matcher.sweep_distances(matches_df, args.sweep_distances), args.output_prefix)
+        if args.checkpoint_dir:
+            shutil.rmtree(args.checkpoint_dir, ignore_errors=True)
+        matcher.logger.info(f"⏱️  Total processing time: {(time.time() - start_time)/60:.1f} minutes")
+        return
+    
     # Generate day-specific estimates
     schedules_df = matcher.generate_day_specific_estimates(matches_df)
     
     # Export results
-    matches_file, schedules_file = matcher.export_results(matches_df, schedules_df, args.output_prefix)
+    matches_file, schedules_file = matcher.export_results(matches_df, schedules_df, args.output_prefix,
+                                                          args.denormalized_matches)
+    if args.checkpoint_dir:
+        shutil.rmtree(args.checkpoint_dir, ignore_errors=True)
     
     # Final summary
     processing_time = time.time() - start_time
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Adaptive Rate Controller for Geocoding API Calls
+
+AIMD (additive increase, multiplicative decrease) control of how many
+requests may be in flight at once:
+- Every window of completed requests (at least `min_window`, or the current
+  limit if larger) with p95 latency under target and few congestion errors
+  raises the limit by one.
+- A congestion signal (HTTP 429, 5xx, timeout, connection error) cuts the
+  limit by `decrease_factor`. The limit is cut at most once per window, so a
+  burst of failures from one overload only counts once.
+- A window whose p95 latency is over target also cuts the limit.
+- 429 responses with Retry-After pause all new requests until then.
+
+Request starts are also spaced at least `min_interval` seconds apart (the
+old fixed rate limit, now a floor).
+"""
+
+import random
+import threading
+import time
+from typing import Dict, List, Optional
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Retry-After header in seconds (HTTP-date values are ignored)"""
+    try:
+        return max(0.0, float(value)) if value else None
+    except ValueError:
+        return None
+
+class AdaptiveRateController:
+    def __init__(self, max_concurrency: int, initial_concurrency: int = None, min_concurrency: int = 1,
+                 min_interval: float = 0.0, target_p95_seconds: float = 2.0, max_error_rate: float = 0.02,
+                 decrease_factor: float = 0.5, min_window: int = 20, adaptive: bool = True):
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min(min_concurrency, max_concurrency)
+        self.limit = initial_concurrency or max(self.min_concurrency, max_concurrency // 4)
+        self.limit = max_concurrency if not adaptive else min(max(self.limit, self.min_concurrency), max_concurrency)
+        self.min_interval = min_interval
+        self.target_p95_seconds = target_p95_seconds
+        self.max_error_rate = max_error_rate
+        self.decrease_factor = decrease_factor
+        self.min_window = min_window
+        self.adaptive = adaptive
+
+        self.condition = threading.Condition()
+        self.in_flight = 0
+        self.next_start = 0.0
+        self.paused_until = 0.0
+        self.start_time = time.monotonic()
+
+        # Current window, plus completions since the last cut (so one overload only cuts once)
+        self.window_latencies: List[float] = []
+        self.window_errors = 0
+        self.since_decrease = None
+
+        self.completed = 0
+        self.congestion_errors = 0
+        self.throttled = 0
+        self.increases = 0
+        self.decreases = 0
+        self.peak_limit = self.limit
+        self.last_p95 = None
+        self.last_error_rate = None
+        self.history: List[Dict] = []
+
+    def window_size(self) -> int:
+        return max(self.min_window, self.limit)
+
+    def acquire(self):
+        """Block until a request may start (under the limit, past any pause, spaced by min_interval)"""
+        with self.condition:
+            while True:
+                now = time.monotonic()
+                if self.in_flight < self.limit and now >= self.paused_until and now >= self.next_start:
+                    self.in_flight += 1
+                    self.next_start = now + self.min_interval
+                    return
+                if self.in_flight >= self.limit:
+                    self.condition.wait()
+                else:
+                    self.condition.wait(max(self.paused_until, self.next_start) - now)
+
+    def release(self, latency: float, status_code: Optional[int] = None, retry_after: Optional[str] = None):
+        """Report a finished request; status_code None means it never got a response (timeout, connection error)"""
+        congestion = status_code is None or status_code == 429 or status_code >= 500
+        with self.condition:
+            self.in_flight -= 1
+            self.completed += 1
+            self.window_latencies.append(latency)
+            if self.since_decrease is not None:
+                self.since_decrease += 1
+
+            if congestion:
+                self.congestion_errors += 1
+                self.window_errors += 1
+                if status_code == 429:
+                    self.throttled += 1
+                    pause = parse_retry_after(retry_after)
+                    if pause:
+                        self.paused_until = max(self.paused_until, time.monotonic() + pause)
+                reason = 'throttled' if status_code == 429 else 'timeout' if status_code is None else f'http_{status_code}'
+                self.decrease(reason)
+            elif len(self.window_latencies) >= self.window_size():
+                self.evaluate_window()
+
+            self.condition.notify_all()
+
+    def evaluate_window(self):
+        """Grow the limit after a healthy window, shrink it after a slow one"""
+        latencies = sorted(self.window_latencies)
+        self.last_p95 = latencies[min(len(latencies) - 1, int(0.95 * len(latencies)))]
+        self.last_error_rate = self.window_errors / len(latencies)
+        self.window_latencies = []
+        self.window_errors = 0
+
+        if self.last_p95 > self.target_p95_seconds:
+            self.decrease('slow')
+        elif self.last_error_rate <= self.max_error_rate and self.adaptive and self.limit < self.max_concurrency:
+            self.limit += 1
+            self.increases += 1
+            self.peak_limit = max(self.peak_limit, self.limit)
+            self.record('increase')
+
+    def decrease(self, reason: str):
+        if not self.adaptive or (self.since_decrease is not None and self.since_decrease < self.window_size()):
+            return
+        new_limit = max(self.min_concurrency, int(self.limit * self.decrease_factor))
+        self.since_decrease = 0
+        if new_limit < self.limit:
+            self.limit = new_limit
+            self.decreases += 1
+            self.record(f'decrease:{reason}')
+
+    def record(self, event: str):
+        # Bounded so a long run doesn't grow the report without limit
+        if len(self.history) < 500:
+            self.history.append({'seconds': round(time.monotonic() - self.start_time, 1),
+                                 'event': event, 'limit': self.limit})
+
+    def retry_delay(self, attempt: int, base: float = 0.5, cap: float = 30.0) -> float:
+        """Backoff before a retry: full jitter on an exponential ceiling, never before a Retry-After pause ends"""
+        delay = random.uniform(0, min(cap, base * 2 ** attempt))
+        return max(delay, self.paused_until - time.monotonic())
+
+    def summary(self) -> str:
+        """One-line state for progress logs"""
+        p95 = f"{self.last_p95 * 1000:.0f}ms" if self.last_p95 is not None else "n/a"
+        return (f"concurrency {self.limit}/{self.max_concurrency} (in flight {self.in_flight}), "
+                f"p95 {p95}, congestion errors {self.congestion_errors}")
+
+    def state(self) -> Dict:
+        with self.condition:
+            return {
+                'adaptive': self.adaptive,
+                'concurrency_limit': self.limit,
+                'peak_concurrency_limit': self.peak_limit,
+                'max_concurrency': self.max_concurrency,
+                'min_interval_seconds': self.min_interval,
+                'target_p95_seconds': self.target_p95_seconds,
+                'last_window_p95_seconds': round(self.last_p95, 3) if self.last_p95 is not None else None,
+                'last_window_error_rate': self.last_error_rate,
+                'completed_requests': self.completed,
+                'congestion_errors': self.congestion_errors,
+                'throttled_responses': self.throttled,
+                'increases': self.increases,
+                'decreases': self.decreases,
+                'history': self.history
+            }
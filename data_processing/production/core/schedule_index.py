@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+"""
+Prebuilt Schedule Index File
+
+Serializes what DaySpecificHybridMatcher.build_hybrid_index derives from the
+cleaned schedule CSV into one versioned binary file, so a matcher run starts
+without reading the CSV, parsing geometries or rebuilding the spatial grid:
+- schedule attributes (numeric columns raw, string columns as codes + string tables)
+- geometries: packed (lat, lon) and local-meter coordinates with CSR offsets,
+  street IDs into a normalized street-name table, and their schedule rows
+- the spatial grid: sorted cell keys with CSR geometry lists
+
+Layout: 8-byte magic, uint32 format version, uint32 header length, a JSON
+header (source and code fingerprints, build parameters, array table), then each array
+64-byte aligned. Loading memory-maps the file and wraps every array with
+np.frombuffer, so nothing is parsed and processes opening the same file share
+its pages. Lookups straight from the arrays (cell_geometries) stay zero-copy;
+the matcher copies them into its Python lists, which takes tens of milliseconds.
+The matcher refuses an index built by different matcher or geo_utils code.
+
+Usage:
+python3 schedule_index.py build-index --schedules cleaned_schedules.csv --output schedules.idx
+python3 schedule_index.py info schedules.idx
+"""
+
+import argparse
+import json
+import logging
+import mmap
+import struct
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+MAGIC = b'SFSCHIDX'
+FORMAT_VERSION = 1
+ALIGNMENT = 64
+PREAMBLE = struct.Struct('<8sII')
+# Code that derives the indexed geometries and grid; an index built by other versions is stale
+INDEX_CODE = ['production_hybrid_matcher_day_specific.py', 'geo_utils.py']
+
+def code_sha256() -> Dict[str, str]:
+    """SHA-256 of each INDEX_CODE file"""
+    from stage_cache import file_sha256
+    return {name: file_sha256(Path(__file__).with_name(name)) for name in INDEX_CODE}
+
+def encode_strings(values: List[str]) -> Dict[str, np.ndarray]:
+    """UTF-8 blob plus offsets for a string table"""
+    encoded = [value.encode('utf-8') for value in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(value) for value in encoded], out=offsets[1:])
+    return {'blob': np.frombuffer(b''.join(encoded), dtype=np.uint8), 'offsets': offsets}
+
+def grid_keys(cells: np.ndarray) -> np.ndarray:
+    """One sortable int64 per (grid_x, grid_y) cell"""
+    cells = np.asarray(cells, dtype=np.int64).reshape(-1, 2)
+    return (cells[:, 0] << 32) + (cells[:, 1] + (1 << 31))
+
+class ScheduleIndex:
+    """Read-only view of an index file; arrays are backed by the memory map"""
+
+    def __init__(self, arrays: Dict[str, np.ndarray], header: Dict, mapping: Optional[mmap.mmap] = None):
+        self.arrays = arrays
+        self.header = header
+        self.mapping = mapping
+        self._strings = {}
+
+    @staticmethod
+    def write(path, arrays: Dict[str, np.ndarray], header: Dict) -> int:
+        """Write arrays and header; returns the file size in bytes"""
+        layout = {}
+        offset = 0
+        for name, array in arrays.items():
+            layout[name] = {'dtype': array.dtype.str, 'shape': list(array.shape), 'offset': offset}
+            offset += -(-array.nbytes // ALIGNMENT) * ALIGNMENT
+        header = dict(header, format_version=FORMAT_VERSION, arrays=layout)
+        header_bytes = json.dumps(header).encode('utf-8')
+        data_start = -(-(PREAMBLE.size + len(header_bytes)) // ALIGNMENT) * ALIGNMENT
+
+        # Write then rename so readers never map a partial file
+        path = Path(path)
+        temp_path = path.with_name(path.name + '.tmp')
+        with open(temp_path, 'wb') as f:
+            f.write(PREAMBLE.pack(MAGIC, FORMAT_VERSION, len(header_bytes)))
+            f.write(header_bytes)
+            for name, array in arrays.items():
+                f.seek(data_start + layout[name]['offset'])
+                f.write(np.ascontiguousarray(array).tobytes())
+            f.truncate(data_start + offset)
+        temp_path.replace(path)
+        return path.stat().st_size
+
+    @classmethod
+    def load(cls, path) -> 'ScheduleIndex':
+        """Memory-map an index file"""
+        with open(path, 'rb') as f:
+            mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, header_length = PREAMBLE.unpack_from(mapping, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a schedule index file")
+        if version != FORMAT_VERSION:
+            raise ValueError(f"{path} has index format {version}, expected {FORMAT_VERSION}; rebuild it with build-index")
+        header = json.loads(mapping[PREAMBLE.size:PREAMBLE.size + header_length])
+        data_start = -(-(PREAMBLE.size + header_length) // ALIGNMENT) * ALIGNMENT
+
+        arrays = {}
+        for name, spec in header['arrays'].items():
+            dtype = np.dtype(spec['dtype'])
+            count = int(np.prod(spec['shape'], dtype=np.int64))
+            arrays[name] = np.frombuffer(mapping, dtype=dtype, count=count,
+                                         offset=data_start + spec['offset']).reshape(spec['shape'])
+        return cls(arrays, header, mapping)
+
+    def strings(self, name: str) -> List[str]:
+        """Decoded string table (cached)"""
+        if name not in self._strings:
+            blob = self.arrays[f'{name}_blob'].tobytes()
+            offsets = self.arrays[f'{name}_offsets'].tolist()
+            self._strings[name] = [blob[start:end].decode('utf-8') for start, end in zip(offsets, offsets[1:])]
+        return self._strings[name]
+
+    def schedule_frame(self) -> pd.DataFrame:
+        """Schedule attributes with string columns as categoricals, as read_table loads them"""
+        columns = {}
+        for column in self.header['schedule_columns']:
+            if column in self.header['schedule_string_columns']:
+                columns[column] = pd.Categorical.from_codes(self.arrays[f'schedule_{column}'],
+                                                            self.strings(f'schedule_{column}'))
+            else:
+                columns[column] = self.arrays[f'schedule_{column}']
+        return pd.DataFrame(columns)
+
+    def cell_geometries(self, grid_x: int, grid_y: int) -> np.ndarray:
+        """Geometry IDs indexed in one spatial-grid cell, straight from the mapped arrays"""
+        keys = self.arrays['grid_keys']
+        key = grid_keys([(grid_x, grid_y)])[0]
+        position = int(np.searchsorted(keys, key))
+        if position == len(keys) or keys[position] != key:
+            return self.arrays['grid_geometries'][:0]
+        offsets = self.arrays['grid_offsets']
+        return self.arrays['grid_geometries'][offsets[position]:offsets[position + 1]]
+
+def index_arrays(matcher) -> Tuple[Dict[str, np.ndarray], Dict]:
+    """Arrays and header fields for a matcher after build_hybrid_index"""
+    arrays = {}
+    string_columns = []
+    for column in matcher.schedules.columns:
+        values = matcher.schedules[column]
+        if isinstance(values.dtype, pd.CategoricalDtype) or not pd.api.types.is_numeric_dtype(values):
+            codes, categories = pd.factorize(values) if not isinstance(values.dtype, pd.CategoricalDtype) \
+                else (values.cat.codes.to_numpy(), values.cat.categories)
+            arrays[f'schedule_{column}'] = np.asarray(codes, dtype=np.int32)
+            for part, array in encode_strings([str(category) for category in categories]).items():
+                arrays[f'schedule_{column}_{part}'] = array
+            string_columns.append(column)
+        else:
+            arrays[f'schedule_{column}'] = values.to_numpy()
+
+    geometries = matcher.geometries
+    arrays['geometry_offsets'] = np.zeros(len(geometries) + 1, dtype=np.int64)
+    np.cumsum([len(geometry['coords']) for geometry in geometries], out=arrays['geometry_offsets'][1:])
+    arrays['geometry_coords'] = np.array([point for geometry in geometries for point in geometry['coords']],
+                                         dtype=np.float64).reshape(-1, 2)
+    arrays['geometry_points'] = np.array([point for geometry in geometries for point in geometry['points']],
+                                         dtype=np.float64).reshape(-1, 2)
+    street_codes, streets = pd.factorize(pd.Series([geometry['normalized_corridor'] for geometry in geometries],
+                                                   dtype=object))
+    arrays['geometry_street_ids'] = street_codes.astype(np.int32)
+    for part, array in encode_strings(list(streets)).items():
+        arrays[f'streets_{part}'] = array
+    arrays['geometry_schedule_offsets'] = np.zeros(len(geometries) + 1, dtype=np.int64)
+    np.cumsum([len(geometry['schedules']) for geometry in geometries], out=arrays['geometry_schedule_offsets'][1:])
+    arrays['geometry_schedules'] = np.array([idx for geometry in geometries for idx in geometry['schedules']],
+                                            dtype=np.int32)
+
+    cells = sorted(matcher.spatial_grid, key=lambda cell: grid_keys([cell])[0])
+    arrays['grid_keys'] = grid_keys(cells)
+    arrays['grid_offsets'] = np.zeros(len(cells) + 1, dtype=np.int64)
+    np.cumsum([len(matcher.spatial_grid[cell]) for cell in cells], out=arrays['grid_offsets'][1:])
+    arrays['grid_geometries'] = np.array([geometry_id for cell in cells for geometry_id in matcher.spatial_grid[cell]],
+                                         dtype=np.int32)
+
+    header = {'schedule_columns': list(matcher.schedules.columns), 'schedule_string_columns': string_columns,
+              'schedules': len(matcher.schedules), 'geometries': len(geometries),
+              'grid_size_meters': matcher.grid_size_meters}
+    return arrays, header
+
+def build_index(schedule_file: str, output: str, grid_size: float = 100) -> Dict:
+    """Build the matcher index from a cleaned schedule CSV and write it; returns build statistics"""
+    from data_loader import read_table
+    from production_hybrid_matcher_day_specific import DaySpecificHybridMatcher, SCHEDULE_COLUMNS
+    from stage_cache import file_sha256
+
+    matcher = DaySpecificHybridMatcher(grid_size_meters=grid_size, output_dir=str(Path(output).parent))
+    start = time.perf_counter()
+    matcher.build_hybrid_index(read_table(schedule_file, 'schedule_clean', SCHEDULE_COLUMNS))
+    build_seconds = time.perf_counter() - start
+
+    arrays, header = index_arrays(matcher)
+    header['source'] = {'schedules': str(schedule_file), 'schedules_sha256': file_sha256(schedule_file)}
+    header['code_sha256'] = code_sha256()
+    file_bytes = ScheduleIndex.write(output, arrays, header)
+    return {'build_seconds': round(build_seconds, 3), 'file_mb': round(file_bytes / 1024 / 1024, 2),
+            'schedules': header['schedules'], 'geometries': header['geometries']}
+
+def main():
+    parser = argparse.ArgumentParser(description='Prebuilt, memory-mapped schedule index for the matcher')
+    commands = parser.add_subparsers(dest='command', required=True)
+    build = commands.add_parser('build-index', help='Build an index file from a cleaned schedule CSV')
+    build.add_argument('--schedules', required=True, help='Cleaned day-specific schedules CSV')
+    build.add_argument('--output', required=True, help='Index file to write')
+    build.add_argument('--grid-size', type=float, default=100, help='Spatial grid cell size in meters')
+    info = commands.add_parser('info', help='Show an index file header and load time')
+    info.add_argument('index', help='Index file')
+
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    logger = logging.getLogger(__name__)
+
+    if args.command == 'build-index':
+        result = build_index(args.schedules, args.output, args.grid_size)
+        logger.info(f"📦 Wrote {args.output}: {result['schedules']:,} schedules, {result['geometries']:,} geometries, "
+                    f"{result['file_mb']} MB (index build {result['build_seconds']}s)")
+        return
+
+    start = time.perf_counter()
+    index = ScheduleIndex.load(args.index)
+    load_ms = (time.perf_counter() - start) * 1000
+    header = index.header
+    logger.info(f"📦 {args.index}: format {header['format_version']}, {header['schedules']:,} schedules, "
+                f"{header['geometries']:,} geometries, grid {header['grid_size_meters']:g}m, "
+                f"built from {header['source']['schedules']} (loaded in {load_ms:.1f} ms)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+"""
+Nearest-Segment Raster Index
+
+Precomputes, for every cell of a fixed raster (5 m by default) over the
+schedule geometries, the IDs of the geometries whose centerline comes within
+`radius_meters` of the cell. Resolving a point is then one array index plus an
+exact-distance refine over a handful of candidates, instead of scanning the
+matcher's 3x3 grid cells.
+
+The raster is stored as memory-mappable .npy arrays in a directory:
+- cell_lists.npy   per cell, the index of its candidate list (0 = no candidates)
+- list_offsets.npy CSR offsets into list_ids; identical lists are stored once
+- list_ids.npy     geometry IDs (uint16 when they fit)
+- raster.json      origin, shape, cell size, radius and the schedule file it was built from
+
+Geometry IDs are those of DaySpecificHybridMatcher.build_hybrid_index for the
+same schedule file. Size grows with radius^2 / cell^2: at 5 m cells, a 50 m
+radius is ~20M cell-geometry pairs for SF, while the matcher's 200 m default
+would be ~500M, so large radii need coarser cells.
+
+Usage:
+python3 segment_raster.py --schedules cleaned_schedules.csv --output segment_raster/ --radius 50
+python3 segment_raster.py --schedules cleaned_schedules.csv --output segment_raster/ --radius 50 \\
+  --compare geocoded_citations.csv
+"""
+
+import argparse
+import json
+import logging
+import math
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+RASTER_FILES = ('cell_lists.npy', 'list_offsets.npy', 'list_ids.npy', 'raster.json')
+
+class SegmentRaster:
+    """Per-cell candidate geometry lists over a fixed raster in local meters"""
+
+    def __init__(self, origin: Tuple[float, float], shape: Tuple[int, int], cell_meters: float, radius_meters: float,
+                 cell_lists: np.ndarray, list_offsets: np.ndarray, list_ids: np.ndarray, source: Optional[Dict] = None):
+        self.origin = origin
+        self.shape = shape
+        self.cell_meters = cell_meters
+        self.radius_meters = radius_meters
+        self.cell_lists = cell_lists
+        self.list_offsets = list_offsets
+        self.list_ids = list_ids
+        self.source = source or {}
+
+    @classmethod
+    def build(cls, geometry_points: List[List[Tuple[float, float]]], cell_meters: float = 5.0,
+              radius_meters: float = 50.0, tile_cells: int = 64) -> 'SegmentRaster':
+        """Raster over [(x, y), ...] polylines in local meters (the matcher's geometry 'points')"""
+        segments = []
+        for geometry_id, points in enumerate(geometry_points):
+            points = points if len(points) > 1 else points * 2
+            segments.extend((ax, ay, bx, by, geometry_id) for (ax, ay), (bx, by) in zip(points, points[1:]))
+        ax, ay, bx, by, segment_geometry = np.array(segments, dtype=float).reshape(-1, 5).T
+        segment_geometry = segment_geometry.astype(np.int64)
+        min_x, max_x = np.minimum(ax, bx), np.maximum(ax, bx)
+        min_y, max_y = np.minimum(ay, by), np.maximum(ay, by)
+
+        origin = (float(min_x.min() - radius_meters), float(min_y.min() - radius_meters))
+        shape = (int((max_x.max() + radius_meters - origin[0]) // cell_meters) + 1,
+                 int((max_y.max() + radius_meters - origin[1]) // cell_meters) + 1)
+        # Distances are taken from cell centers, so widen by half a diagonal: no point in the cell is missed
+        reach = radius_meters + cell_meters * math.sqrt(2) / 2
+        id_dtype = np.uint16 if len(geometry_points) <= np.iinfo(np.uint16).max else np.uint32
+
+        cell_lists = np.zeros(shape[0] * shape[1], dtype=np.uint32)
+        list_index = {b'': 0}
+        lists = [np.empty(0, dtype=id_dtype)]
+        for tile_x in range(0, shape[0], tile_cells):
+            for tile_y in range(0, shape[1], tile_cells):
+                x0 = origin[0] + tile_x * cell_meters
+                y0 = origin[1] + tile_y * cell_meters
+                x1 = x0 + tile_cells * cell_meters
+                y1 = y0 + tile_cells * cell_meters
+                near = (max_x >= x0 - reach) & (min_x <= x1 + reach) & (max_y >= y0 - reach) & (min_y <= y1 + reach)
+                if not near.any():
+                    continue
+
+                cells_x = np.arange(tile_x, min(tile_x + tile_cells, shape[0]))
+                cells_y = np.arange(tile_y, min(tile_y + tile_cells, shape[1]))
+                grid_x, grid_y = np.meshgrid(cells_x, cells_y, indexing='ij')
+                px = (origin[0] + (grid_x.ravel() + 0.5) * cell_meters)[:, None]
+                py = (origin[1] + (grid_y.ravel() + 0.5) * cell_meters)[:, None]
+                sax, say = ax[near], ay[near]
+                dx, dy = bx[near] - sax, by[near] - say
+                length_sq = np.where(dx * dx + dy * dy > 0, dx * dx + dy * dy, 1.0)
+                t = np.clip(((px - sax) * dx + (py - say) * dy) / length_sq, 0.0, 1.0)
+                cell_hits, segment_hits = np.nonzero(np.hypot(px - sax - t * dx, py - say - t * dy) <= reach)
+                if not len(cell_hits):
+                    continue
+
+                # Unique (cell, geometry) pairs, sorted by cell then geometry
+                cells = (grid_x.ravel() * shape[1] + grid_y.ravel())[cell_hits]
+                pairs = np.unique(cells * len(geometry_points) + segment_geometry[near][segment_hits])
+                cells, geometry_ids = np.divmod(pairs, len(geometry_points))
+                starts = np.flatnonzero(np.r_[True, cells[1:] != cells[:-1]])
+                for cell, ids in zip(cells[starts], np.split(geometry_ids.astype(id_dtype), starts[1:])):
+                    key = ids.tobytes()
+                    index = list_index.get(key)
+                    if index is None:
+                        index = list_index[key] = len(lists)
+                        lists.append(ids)
+                    cell_lists[cell] = index
+
+        list_offsets = np.zeros(len(lists) + 1, dtype=np.uint32)
+        np.cumsum([len(ids) for ids in lists], out=list_offsets[1:])
+        cell_lists = cell_lists.astype(np.uint32 if len(lists) > np.iinfo(np.uint16).max else np.uint16)
+        return cls(origin, shape, cell_meters, radius_meters, cell_lists, list_offsets, np.concatenate(lists))
+
+    def candidates(self, x: float, y: float) -> np.ndarray:
+        """Geometry IDs within radius_meters of the cell containing local-meter point (x, y)"""
+        cell_x = int((x - self.origin[0]) // self.cell_meters)
+        cell_y = int((y - self.origin[1]) // self.cell_meters)
+        if not (0 <= cell_x < self.shape[0] and 0 <= cell_y < self.shape[1]):
+            return self.list_ids[:0]
+        index = self.cell_lists[cell_x * self.shape[1] + cell_y]
+        return self.list_ids[self.list_offsets[index]:self.list_offsets[index + 1]]
+
+    def save(self, directory) -> int:
+        """Write the arrays and metadata; returns total bytes on disk"""
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        np.save(directory / 'cell_lists.npy', self.cell_lists)
+        np.save(directory / 'list_offsets.npy', self.list_offsets)
+        np.save(directory / 'list_ids.npy', self.list_ids)
+        (directory / 'raster.json').write_text(json.dumps({
+            'origin': self.origin, 'shape': self.shape, 'cell_meters': self.cell_meters,
+            'radius_meters': self.radius_meters, 'lists': len(self.list_offsets) - 1, 'source': self.source
+        }, indent=2))
+        return sum((directory / name).stat().st_size for name in RASTER_FILES)
+
+    @classmethod
+    def load(cls, directory) -> 'SegmentRaster':
+        """Memory-map a saved raster (pages are read on first lookup and shared between processes)"""
+        directory = Path(directory)
+        meta = json.loads((directory / 'raster.json').read_text())
+        arrays = [np.load(directory / name, mmap_mode='r') for name in RASTER_FILES[:3]]
+        return cls(tuple(meta['origin']), tuple(meta['shape']), meta['cell_meters'], meta['radius_meters'],
+                   *arrays, source=meta['source'])
+
+def compare_with_grid(matcher, raster: SegmentRaster, points: np.ndarray) -> Dict:
+    """Lookup latency and candidate counts of the matcher's 3x3 grid scan vs the raster for the same points,
+    plus geometries within the raster radius that the grid (indexed by first vertex) misses"""
+    from geo_utils import SF_ORIGIN, point_polyline_side, to_local_meters
+
+    local = [to_local_meters([(lat, lon)], SF_ORIGIN[0])[0] for lat, lon in points]
+    radius = matcher.grid_search_radius
+
+    def grid_candidates(lat, lon):
+        grid_x, grid_y = matcher.lat_lon_to_grid(lat, lon)
+        found = set()
+        for dx in range(-radius, radius + 1):
+            for dy in range(-radius, radius + 1):
+                found.update(matcher.spatial_grid.get((grid_x + dx, grid_y + dy), []))
+        return found
+
+    start = time.perf_counter()
+    grid_sets = [grid_candidates(lat, lon) for lat, lon in points]
+    grid_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    raster_sets = [raster.candidates(x, y).tolist() for x, y in local]
+    raster_seconds = time.perf_counter() - start
+
+    grid_missed = 0
+    raster_missed = 0
+    for (x, y), grid_set, raster_list in zip(local, grid_sets, raster_sets):
+        raster_set = set(raster_list)
+        for geometry_id in grid_set | raster_set:
+            if point_polyline_side(x, y, matcher.geometries[geometry_id]['points'])[0] <= raster.radius_meters:
+                grid_missed += geometry_id not in grid_set
+                raster_missed += geometry_id not in raster_set
+
+    return {
+        'points': len(points),
+        'grid_us_per_lookup': round(grid_seconds / len(points) * 1e6, 2),
+        'raster_us_per_lookup': round(raster_seconds / len(points) * 1e6, 2),
+        'grid_avg_candidates': round(sum(map(len, grid_sets)) / len(points), 1),
+        'raster_avg_candidates': round(sum(map(len, raster_sets)) / len(points), 1),
+        'within_radius_missed_by_grid': grid_missed,
+        'within_radius_missed_by_raster': raster_missed
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='Build a nearest-segment raster index for the matcher')
+    parser.add_argument('--schedules', required=True, help='Cleaned day-specific schedules CSV')
+    parser.add_argument('--output', required=True, help='Directory to write the raster to')
+    parser.add_argument('--cell', type=float, default=5.0, help='Raster cell size in meters')
+    parser.add_argument('--radius', type=float, default=50.0,
+                        help='Candidate radius in meters (the matcher can use it for --max-distance up to this)')
+    parser.add_argument('--compare', metavar='CITATIONS', help='Geocoded citations CSV: compare lookups against the grid index')
+    parser.add_argument('--sample', type=int, default=20000, help='Citations to sample for --compare')
+
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    logger = logging.getLogger(__name__)
+
+    from data_loader import read_table
+    from production_hybrid_matcher_day_specific import DaySpecificHybridMatcher, SCHEDULE_COLUMNS, CITATION_COLUMNS
+    from stage_cache import file_sha256
+
+    matcher = DaySpecificHybridMatcher(max_distance_meters=args.radius, output_dir=args.output)
+    start = time.perf_counter()
+    matcher.build_hybrid_index(read_table(args.schedules, 'schedule_clean', SCHEDULE_COLUMNS))
+    index_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    raster = SegmentRaster.build([geometry['points'] for geometry in matcher.geometries], args.cell, args.radius)
+    raster_seconds = time.perf_counter() - start
+    raster.source = {'schedules': str(args.schedules), 'schedules_sha256': file_sha256(args.schedules),
+                     'geometries': len(matcher.geometries)}
+    file_bytes = raster.save(args.output)
+
+    grid_entries = sum(len(ids) for ids in matcher.spatial_grid.values())
+    logger.info(f"🗺️  Raster: {raster.shape[0]:,} x {raster.shape[1]:,} cells of {args.cell:g}m, radius {args.radius:g}m, "
+                f"{len(raster.list_offsets) - 1:,} distinct candidate lists, {len(raster.list_ids):,} IDs")
+    logger.info(f"   Build: raster {raster_seconds:.1f}s vs grid index {index_seconds:.1f}s (incl. parsing)")
+    logger.info(f"   Size: raster {file_bytes / 1024 / 1024:.1f} MB on disk vs grid "
+                f"{len(matcher.spatial_grid):,} cells / {grid_entries:,} entries in memory")
+
+    report = {'cell_meters': args.cell, 'radius_meters': args.radius, 'raster_build_seconds': round(raster_seconds, 2),
+              'grid_build_seconds': round(index_seconds, 2), 'raster_file_mb': round(file_bytes / 1024 / 1024, 2),
+              'raster_lists': len(raster.list_offsets) - 1, 'raster_ids': len(raster.list_ids),
+              'grid_cells': len(matcher.spatial_grid), 'grid_entries': grid_entries}
+
+    if args.compare:
+        citations = read_table(args.compare, 'citations_geocoded', CITATION_COLUMNS).dropna(subset=['latitude', 'longitude'])
+        sample = citations.sample(min(args.sample, len(citations)), random_state=42)
+        comparison = compare_with_grid(matcher, SegmentRaster.load(args.output),
+                                       sample[['latitude', 'longitude']].to_numpy())
+        report['lookup'] = comparison
+        logger.info(f"   Lookup: raster {comparison['raster_us_per_lookup']}µs vs grid {comparison['grid_us_per_lookup']}µs, "
+                    f"{comparison['raster_avg_candidates']} vs {comparison['grid_avg_candidates']} candidates")
+        logger.info(f"   Within {args.radius:g}m: {comparison['within_radius_missed_by_grid']:,} geometries missed by the grid, "
+                    f"{comparison['within_radius_missed_by_raster']:,} by the raster")
+
+    report_file = Path(args.output) / 'raster_report.json'
+    report_file.write_text(json.dumps(report, indent=2))
+    logger.info(f"📄 Report saved to {report_file}")
+
+if __name__ == "__main__":
+    main()
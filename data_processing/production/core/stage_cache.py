@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Content-Addressed Stage Cache for the Production Pipeline
+
+A stage's outputs are stored under a key hashed from:
+- the SHA-256 of each input file (e.g. raw schedules, geocoded citations)
+- the stage parameters (e.g. max_distance, grid_size, geometry encoding)
+- the SHA-256 of the scripts that implement the stage
+
+A rerun with the same inputs, parameters and code copies the stored outputs
+into the new run directory instead of recomputing them, so a matcher
+parameter sweep doesn't re-clean schedules or re-geocode citations.
+
+Layout: <cache_dir>/<stage>/<key>/<output name> plus entry.json
+"""
+
+import hashlib
+import json
+import shutil
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, Optional
+
+def file_sha256(path, chunk_size: int = 1 << 20) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class StageCache:
+    def __init__(self, cache_dir: Path, logger=None):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.logger = logger
+        self.lock = threading.Lock()
+        self.hashes: Dict[tuple, str] = {}
+
+    def hash_file(self, path) -> str:
+        """SHA-256 of a file, memoized by path, size and mtime"""
+        stat = Path(path).stat()
+        memo_key = (str(path), stat.st_size, stat.st_mtime_ns)
+        with self.lock:
+            if memo_key in self.hashes:
+                return self.hashes[memo_key]
+        digest = file_sha256(path)
+        with self.lock:
+            self.hashes[memo_key] = digest
+        return digest
+
+    def key(self, stage: str, inputs: Iterable, params: Dict, code: Iterable) -> str:
+        """Cache key from input file contents, parameters and stage code"""
+        material = {
+            'stage': stage,
+            'inputs': [self.hash_file(path) for path in inputs],
+            'params': params,
+            'code': {Path(path).name: self.hash_file(path) for path in code}
+        }
+        return hashlib.sha256(json.dumps(material, sort_keys=True, default=str).encode()).hexdigest()[:24]
+
+    def entry_dir(self, stage: str, key: str) -> Path:
+        return self.cache_dir / stage / key
+
+    def restore(self, stage: str, key: str, outputs: Dict[str, Path]) -> bool:
+        """Copy a cached entry's outputs to their destinations; False on a miss"""
+        entry = self.entry_dir(stage, key)
+        if not (entry / 'entry.json').exists():
+            return False
+
+        # Optional outputs (e.g. a report only written with some flags) may be absent from the entry
+        for name, destination in outputs.items():
+            if not (entry / name).exists():
+                continue
+            destination = Path(destination)
+            destination.parent.mkdir(parents=True, exist_ok=True)
+            if (entry / name).is_dir():
+                shutil.copytree(entry / name, destination, dirs_exist_ok=True)
+            else:
+                shutil.copy2(entry / name, destination)
+
+        if self.logger:
+            self.logger.info(f"   ♻️  {stage}: reusing cached outputs ({key})")
+        return True
+
+    def store(self, stage: str, key: str, outputs: Dict[str, Optional[Path]]):
+        """Save a stage's outputs under its key (written to a temp dir, then renamed into place)"""
+        entry = self.entry_dir(stage, key)
+        if entry.exists():
+            return
+        staging = entry.with_name(f"{key}.tmp")
+        shutil.rmtree(staging, ignore_errors=True)
+        staging.mkdir(parents=True)
+
+        for name, source in outputs.items():
+            if source is None or not Path(source).exists():
+                continue
+            if Path(source).is_dir():
+                shutil.copytree(source, staging / name)
+            else:
+                shutil.copy2(source, staging / name)
+
+        with open(staging / 'entry.json', 'w') as f:
+            json.dump({'stage': stage, 'key': key, 'created': datetime.now().isoformat(),
+                       'outputs': sorted(name for name in outputs if (staging / name).exists())}, f, indent=2)
+        try:
+            staging.rename(entry)
+        except OSError:
+            # Another run stored the same entry first
+            shutil.rmtree(staging, ignore_errors=True)
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Stage DAG Scheduler for the Production Pipeline
+
+Each stage declares the artifacts it consumes and produces. A stage starts as
+soon as every stage producing its inputs has finished, so independent branches
+(e.g. schedule fetch/clean vs. citation fetch/geocode) run concurrently.
+
+Stages run in threads: the heavy steps are subprocesses or network I/O, so
+they don't contend for the GIL.
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Callable, Dict, Iterable, List
+
+class PipelineStage:
+    def __init__(self, name: str, run: Callable[..., Dict], inputs: Iterable[str] = (), outputs: Iterable[str] = ()):
+        """`run` is called with the input artifacts as keyword arguments and returns a dict of its outputs"""
+        self.name = name
+        self.run = run
+        self.inputs = tuple(inputs)
+        self.outputs = tuple(outputs)
+
+class StageDAG:
+    def __init__(self, stages: List[PipelineStage], max_workers: int = 4, logger=None):
+        self.stages = {stage.name: stage for stage in stages}
+        self.max_workers = max_workers
+        self.logger = logger
+        self.timeline: Dict[str, Dict] = {}
+        self.dependencies = self.resolve_dependencies()
+
+    def resolve_dependencies(self) -> Dict[str, set]:
+        """Map each stage to the stages producing its inputs, rejecting unknown inputs and cycles"""
+        producers = {}
+        for stage in self.stages.values():
+            for output in stage.outputs:
+                if output in producers:
+                    raise ValueError(f"Artifact '{output}' produced by both {producers[output]} and {stage.name}")
+                producers[output] = stage.name
+
+        dependencies = {}
+        for stage in self.stages.values():
+            missing = [name for name in stage.inputs if name not in producers]
+            if missing:
+                raise ValueError(f"Stage {stage.name} needs {missing}, which no stage produces")
+            dependencies[stage.name] = {producers[name] for name in stage.inputs}
+
+        # Kahn's algorithm: anything left over sits on a cycle
+        remaining = {name: set(deps) for name, deps in dependencies.items()}
+        while remaining:
+            ready = [name for name, deps in remaining.items() if not deps]
+            if not ready:
+                raise ValueError(f"Stage dependency cycle among {sorted(remaining)}")
+            for name in ready:
+                del remaining[name]
+            for deps in remaining.values():
+                deps.difference_update(ready)
+
+        return dependencies
+
+    def run(self) -> Dict:
+        """Run every stage once its dependencies finish; returns all artifacts"""
+        artifacts = {}
+        done = set()
+        running = {}
+        lock = threading.Lock()
+        start = time.perf_counter()
+
+        def execute(stage: PipelineStage):
+            stage_start = time.perf_counter()
+            if self.logger:
+                self.logger.info(f"▶️  Starting stage {stage.name}")
+            outputs = stage.run(**{name: artifacts[name] for name in stage.inputs}) or {}
+            missing = [name for name in stage.outputs if name not in outputs]
+            if missing:
+                raise RuntimeError(f"Stage {stage.name} did not produce {missing}")
+            with lock:
+                artifacts.update(outputs)
+            self.timeline[stage.name] = {
+                'start_seconds': round(stage_start - start, 3),
+                'end_seconds': round(time.perf_counter() - start, 3),
+                'after': sorted(self.dependencies[stage.name])
+            }
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='stage') as executor:
+            while len(done) < len(self.stages):
+                for name, stage in self.stages.items():
+                    if name not in done and name not in running and self.dependencies[name] <= done:
+                        running[name] = executor.submit(execute, stage)
+
+                finished, _ = wait(running.values(), return_when=FIRST_COMPLETED)
+                for name, future in list(running.items()):
+                    if future not in finished:
+                        continue
+                    del running[name]
+                    error = future.exception()
+                    if error:
+                        # Let stages already in flight finish, but don't start new ones
+                        wait(running.values())
+                        raise error
+                    done.add(name)
+
+        return artifacts
+
+    def critical_path_seconds(self) -> float:
+        """Wall time if every stage ran back to back in dependency order along its longest chain"""
+        finish = {}
+        for name in sorted(self.timeline, key=lambda n: self.timeline[n]['end_seconds']):
+            duration = self.timeline[name]['end_seconds'] - self.timeline[name]['start_seconds']
+            finish[name] = duration + max((finish.get(dep, 0.0) for dep in self.dependencies[name]), default=0.0)
+        return round(max(finish.values(), default=0.0), 3)
@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+"""
+Stage-Level Profiling for the Production Pipeline
+
+Measures each pipeline stage (fetch, clean, geocode, match, aggregate, ...):
+- Wall and CPU time, including CPU of the stage's subprocess
+- Peak RSS of the stage's subprocess, and the pipeline process's lifetime peak
+  RSS when the stage ended (ru_maxrss never resets, so for in-process stages
+  this is an upper bound, not a per-stage peak)
+- Rows in/out and bytes read/written
+- API calls with error counts and a latency histogram
+
+With profiling enabled, each stage also gets a cProfile dump
+(profiles/<stage>.prof) and a text summary (profiles/<stage>.txt).
+
+Stages may run concurrently in separate threads (see stage_dag.py): the
+current stage is tracked per thread, and in-process CPU time uses
+RUSAGE_THREAD where the platform has it.
+"""
+
+import cProfile
+import io
+import os
+import pstats
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Optional
+
+# Per-thread CPU where available (Linux), else whole process
+RUSAGE_STAGE = getattr(resource, 'RUSAGE_THREAD', resource.RUSAGE_SELF)
+
+# Upper bounds (ms) of the latency histogram buckets; the last bucket is open ended
+LATENCY_BUCKETS_MS = [50, 100, 250, 500, 1000, 2500, 5000, 10000]
+
+def max_rss_mb(usage) -> float:
+    """ru_maxrss in MB (Linux reports KB, macOS reports bytes)"""
+    divisor = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    return round(usage.ru_maxrss / divisor, 1)
+
+def process_hwm_mb(pid: int) -> Optional[float]:
+    """
+    Peak RSS (VmHWM) of a running process in MB, or None where /proc isn't available.
+    Unlike the child's ru_maxrss, it doesn't include the parent's peak carried over by fork/exec.
+    """
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    return None
+
+def file_bytes(*paths) -> int:
+    """Total size of the given files, ignoring ones that don't exist"""
+    return sum(Path(p).stat().st_size for p in paths if p and Path(p).exists())
+
+class ApiCallStats:
+    """Thread-safe API call counter with a fixed-bucket latency histogram"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls = 0
+        self.errors = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self.buckets = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+
+    def record(self, seconds: float, ok: bool = True):
+        milliseconds = seconds * 1000
+        bucket = next((i for i, bound in enumerate(LATENCY_BUCKETS_MS) if milliseconds <= bound),
+                      len(LATENCY_BUCKETS_MS))
+        with self.lock:
+            self.calls += 1
+            self.errors += 0 if ok else 1
+            self.total_seconds += seconds
+            self.max_seconds = max(self.max_seconds, seconds)
+            self.buckets[bucket] += 1
+
+    def merge(self, other: Dict):
+        """Add counts from another ApiCallStats.to_dict() (e.g. read from a subprocess report)"""
+        if not other or not other.get('calls'):
+            return
+        with self.lock:
+            self.calls += other['calls']
+            self.errors += other.get('errors', 0)
+            self.total_seconds += other.get('total_seconds', 0.0)
+            self.max_seconds = max(self.max_seconds, other.get('max_ms', 0) / 1000)
+            for i, count in enumerate(other.get('histogram_ms', {}).values()):
+                self.buckets[i] += count
+
+    def percentile_ms(self, fraction: float) -> Optional[float]:
+        """Approximate percentile: upper bound of the bucket containing it"""
+        if not self.calls:
+            return None
+        target = fraction * self.calls
+        running = 0
+        for i, count in enumerate(self.buckets):
+            running += count
+            if running >= target:
+                return float(LATENCY_BUCKETS_MS[i]) if i < len(LATENCY_BUCKETS_MS) else round(self.max_seconds * 1000, 1)
+        return round(self.max_seconds * 1000, 1)
+
+    def to_dict(self) -> Dict:
+        labels = [f"<={bound}" for bound in LATENCY_BUCKETS_MS] + [f">{LATENCY_BUCKETS_MS[-1]}"]
+        return {
+            'calls': self.calls,
+            'errors': self.errors,
+            'total_seconds': round(self.total_seconds, 3),
+            'mean_ms': round(self.total_seconds / self.calls * 1000, 1) if self.calls else None,
+            'p50_ms': self.percentile_ms(0.5),
+            'p95_ms': self.percentile_ms(0.95),
+            'max_ms': round(self.max_seconds * 1000, 1),
+            'histogram_ms': dict(zip(labels, self.buckets))
+        }
+
+class StageMetrics:
+    """Counters for one pipeline stage"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.rows_in = None
+        self.rows_out = None
+        self.bytes_read = 0
+        self.bytes_written = 0
+        self.api = ApiCallStats()
+        self.wall_seconds = 0.0
+        self.cpu_seconds = 0.0
+        self.child_cpu_seconds = 0.0
+        self.process_peak_rss_mb_at_end = 0.0
+        self.child_peak_rss_mb = 0.0
+        self.profile_file = None
+        self.cache = None  # 'hit' / 'miss' via the stage cache, 'resumed' when reloaded from an earlier attempt
+
+    def update(self, rows_in: int = None, rows_out: int = None, bytes_read: int = 0, bytes_written: int = 0):
+        if rows_in is not None:
+            self.rows_in = rows_in
+        if rows_out is not None:
+            self.rows_out = rows_out
+        self.bytes_read += bytes_read
+        self.bytes_written += bytes_written
+
+    def to_dict(self) -> Dict:
+        return {
+            'wall_seconds': round(self.wall_seconds, 3),
+            'cpu_seconds': round(self.cpu_seconds + self.child_cpu_seconds, 3),
+            'subprocess_cpu_seconds': round(self.child_cpu_seconds, 3),
+            'subprocess_peak_rss_mb': self.child_peak_rss_mb or None,
+            'process_peak_rss_mb_at_end': self.process_peak_rss_mb_at_end,
+            'rows_in': self.rows_in,
+            'rows_out': self.rows_out,
+            'rows_per_second': round((self.rows_in or self.rows_out) / self.wall_seconds, 1)
+                               if (self.rows_in or self.rows_out) and self.wall_seconds else None,
+            'bytes_read': self.bytes_read,
+            'bytes_written': self.bytes_written,
+            'api_calls': self.api.to_dict() if self.api.calls else None,
+            'profile': self.profile_file,
+            'cache': self.cache
+        }
+
+class StageProfiler:
+    def __init__(self, output_dir: Path, profile: bool = False, logger=None):
+        self.profile = profile
+        self.profile_dir = Path(output_dir) / 'profiles'
+        self.logger = logger
+        self.stages: Dict[str, StageMetrics] = {}
+        self.local = threading.local()
+
+    @property
+    def current(self) -> Optional[StageMetrics]:
+        """Stage running in the calling thread"""
+        return getattr(self.local, 'stage', None)
+
+    @contextmanager
+    def stage(self, name: str):
+        """Time a stage; subprocesses started via run() and API calls via api_call() are attributed to it"""
+        metrics = StageMetrics(name)
+        self.stages[name] = metrics
+        self.local.stage = metrics
+
+        profiler = cProfile.Profile() if self.profile else None
+        start_usage = resource.getrusage(RUSAGE_STAGE)
+        start = time.perf_counter()
+        if profiler:
+            try:
+                profiler.enable()
+            except ValueError:
+                # Python 3.12+ allows one active cProfile per process; a concurrent stage skips in-process profiling
+                profiler = None
+        try:
+            yield metrics
+        finally:
+            if profiler:
+                profiler.disable()
+            end_usage = resource.getrusage(RUSAGE_STAGE)
+            metrics.wall_seconds = time.perf_counter() - start
+            metrics.cpu_seconds = (end_usage.ru_utime - start_usage.ru_utime) + (end_usage.ru_stime - start_usage.ru_stime)
+            metrics.process_peak_rss_mb_at_end = max_rss_mb(resource.getrusage(resource.RUSAGE_SELF))
+            # Subprocess stages are profiled inside the child; only dump in-process work here
+            if profiler and not metrics.profile_file:
+                metrics.profile_file = self.write_profile(name, profiler)
+            self.local.stage = None
+
+            if self.logger:
+                summary = metrics.to_dict()
+                memory = (f"subprocess peak {summary['subprocess_peak_rss_mb']:.0f} MB" if summary['subprocess_peak_rss_mb']
+                          else f"process peak {summary['process_peak_rss_mb_at_end']:.0f} MB so far")
+                self.logger.info(f"   ⏱️  {name}: {summary['wall_seconds']:.1f}s wall, {summary['cpu_seconds']:.1f}s CPU, "
+                                 f"{memory}"
+                                 + (f", {metrics.api.calls:,} API calls" if metrics.api.calls else ""))
+
+    def api_call(self, seconds: float, ok: bool = True):
+        """Record one API request against the current stage"""
+        if self.current:
+            self.current.api.record(seconds, ok)
+
+    def run(self, cmd: List[str], timeout: float = None) -> subprocess.CompletedProcess:
+        """
+        subprocess.run(capture_output=True, text=True) replacement that also collects
+        the child's CPU time and peak RSS, and runs it under cProfile when profiling
+        """
+        metrics = self.current
+        if self.profile and metrics and cmd[0] == sys.executable:
+            self.profile_dir.mkdir(parents=True, exist_ok=True)
+            metrics.profile_file = str(self.profile_dir / f"{metrics.name}.prof")
+            cmd = [cmd[0], '-m', 'cProfile', '-o', metrics.profile_file] + list(cmd[1:])
+
+        with tempfile.TemporaryFile() as stdout_file, tempfile.TemporaryFile() as stderr_file:
+            process = subprocess.Popen(cmd, stdout=stdout_file, stderr=stderr_file)
+            deadline = time.monotonic() + timeout if timeout else None
+
+            # Poll with wait4 so the child's rusage is ours to read; track its own peak RSS while it runs
+            child_peak_mb = None
+            while True:
+                child_peak_mb = process_hwm_mb(process.pid) or child_peak_mb
+                pid, status, usage = os.wait4(process.pid, os.WNOHANG)
+                if pid:
+                    break
+                if deadline and time.monotonic() > deadline:
+                    process.kill()
+                    os.wait4(process.pid, 0)
+                    process.returncode = -9
+                    raise subprocess.TimeoutExpired(cmd, timeout)
+                time.sleep(0.05)
+
+            process.returncode = os.waitstatus_to_exitcode(status)
+            stdout_file.seek(0)
+            stderr_file.seek(0)
+            stdout = stdout_file.read().decode(errors='replace')
+            stderr = stderr_file.read().decode(errors='replace')
+
+        if metrics:
+            metrics.child_cpu_seconds += usage.ru_utime + usage.ru_stime
+            # ru_maxrss only when the child exited before its peak could be read
+            metrics.child_peak_rss_mb = max(metrics.child_peak_rss_mb, child_peak_mb or max_rss_mb(usage))
+            if metrics.profile_file and Path(metrics.profile_file).exists():
+                self.write_profile_summary(metrics.name, pstats.Stats(metrics.profile_file))
+            elif metrics.profile_file:
+                metrics.profile_file = None
+
+        return subprocess.CompletedProcess(cmd, process.returncode, stdout, stderr)
+
+    def write_profile(self, name: str, profiler: cProfile.Profile) -> str:
+        """Dump an in-process profile and its text summary"""
+        self.profile_dir.mkdir(parents=True, exist_ok=True)
+        profile_file = self.profile_dir / f"{name}.prof"
+        profiler.dump_stats(profile_file)
+        self.write_profile_summary(name, pstats.Stats(profiler))
+        return str(profile_file)
+
+    def write_profile_summary(self, name: str, stats: pstats.Stats, limit: int = 30):
+        """Top functions by cumulative time, readable without snakeviz"""
+        buffer = io.StringIO()
+        stats.stream = buffer
+        stats.sort_stats('cumulative').print_stats(limit)
+        (self.profile_dir / f"{name}.txt").write_text(buffer.getvalue())
+
+    def report(self) -> Dict:
+        return {name: metrics.to_dict() for name, metrics in self.stages.items()}